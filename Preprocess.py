@@ -1,23 +1,111 @@
-from sentence_transformers import SentenceTransformer
-import torch
 import pandas as pd
 import asyncio
 import numpy as np
 from tqdm.auto import tqdm
 import hashlib
+import gzip
+import json
+import zlib
+from glob import glob
+from web_scraper.web_scraper.language import detect_languages, index_language
+import os
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
 _model = None
+CRAWLED_COLUMNS = ("hash", "lang", "file_type")  # added by web_scraper's ContentPipeline
+LABEL_COLUMNS = ("changed",)  # added by ChangedItemsPipeline, missing from older feeds
+SPV_PAGES = "dataset/supervisor-dataset-pages.csv"  # written by `read_content.py --pages`, used instead of the per-file CSV when present
+
+def load_spv_pages(path: str = SPV_PAGES, chunksize: int = 10000) -> pd.DataFrame:
+    """
+    Read the page-level supervisor dataset in chunks of rows, dropping pages without text.
+
+    Every PDF page becomes its own row titled "<name> (page <n>)", so it gets its own
+    embedding instead of being averaged into one vector for the whole file.
+    """
+    parts = []
+    for chunk in pd.read_csv(path, chunksize=chunksize, dtype={"content": str}):
+        chunk = chunk.dropna(subset=["content"])
+        chunk = chunk[chunk["content"].str.strip() != ""].copy()
+        pdf = chunk["file_type"] == "pdf"
+        chunk.loc[pdf, "name"] = chunk.loc[pdf, "name"] + " (page " + chunk.loc[pdf, "page"].astype(str) + ")"
+        parts.append(chunk.drop(columns="page"))
+    return pd.concat(parts, ignore_index=True)
+
+def iter_jsonl(path: str, chunksize: int = 10000):
+    """
+    Stream scraped items from JSON Lines feeds as DataFrames of at most `chunksize` rows.
+
+    Args:
+        path(str): A .jsonl or .jsonl.gz file, or a directory of them (a spider's feed directory), read in name order
+        chunksize(int): Rows per DataFrame
+
+    A file cut short by a killed crawl is read up to its last complete line.
+    """
+    files = sorted(glob(os.path.join(path, "*.jsonl")) + glob(os.path.join(path, "*.jsonl.gz"))) \
+        if os.path.isdir(path) else [path]
+    rows = []
+    for file in files:
+        opener = gzip.open if file.endswith(".gz") else open
+        with opener(file, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        rows.append(json.loads(line))
+                    except json.JSONDecodeError:  # the last line of an unfinished file
+                        print(f"Skipping an incomplete line in {file}")
+                        continue
+                    if len(rows) >= chunksize:
+                        yield pd.DataFrame(rows)
+                        rows = []
+            except (EOFError, zlib.error, gzip.BadGzipFile) as e:  # gzip stream without its end marker
+                print(f"{file} is truncated, read up to the cut: {e}")
+    if rows:
+        yield pd.DataFrame(rows)
+
+def load_jsonl(path: str, chunksize: int = 10000) -> pd.DataFrame:
+    """
+    Read a JSON Lines feed chunk by chunk, dropping items without content before they are concatenated.
+
+    A feed directory can hold several crawls, e.g. incremental ones that only wrote the
+    pages that changed; files are read oldest first and only the last item of each URL is kept.
+    """
+    parts = []
+    for chunk in iter_jsonl(path, chunksize):
+        if "content" in chunk:
+            chunk = chunk[chunk["content"].notna() & (chunk["content"] != "")]
+        parts.append(chunk)
+    if not parts:
+        return pd.DataFrame(columns=["title", "url", "content"])
+    df = pd.concat(parts, ignore_index=True)
+    return df.drop_duplicates(subset="url", keep="last", ignore_index=True) if "url" in df else df
+
+def load_source(name: str) -> pd.DataFrame:
+    """
+    A scraped source from `dataset/`: the feed directory `<name>/` or `<name>.jsonl[.gz]`
+    the spiders write, falling back to the older `<name>.json` array.
+    """
+    for path in (f"dataset/{name}", f"dataset/{name}.jsonl.gz", f"dataset/{name}.jsonl"):
+        if os.path.exists(path):
+            return load_jsonl(path)
+    return pd.read_json(f"dataset/{name}.json")
 
 def load_dataset():
     try:
-        geeksforgeeks = pd.read_json("dataset/geeksforgeeks.json")
-        pytorch_cn = pd.read_json("dataset/pytorch-cn-merged.json")
-        pytorch = pd.read_json("dataset/pytorch.json")
-        scikit = pd.read_json("dataset/scikit-learn.json")
-        spv_dataset = pd.read_csv("dataset/supervisor-dataset-new.csv")
-        tensorflow = pd.read_json("dataset/tensorflow_merged-en.json")
-        tensorflow_cn = pd.read_json("dataset/tensorflow-zh-cn.json")
-        w3cschools = pd.read_json("dataset/w3cschools.json")
-        w3schools = pd.read_json("dataset/w3schools.json")
+        geeksforgeeks = load_source("geeksforgeeks")
+        pytorch_cn = load_source("pytorch-cn-merged")
+        pytorch = load_source("pytorch")
+        scikit = load_source("scikit-learn")
+        spv_dataset = load_spv_pages() if os.path.exists(SPV_PAGES) else pd.read_csv("dataset/supervisor-dataset-new.csv")
+        tensorflow = load_source("tensorflow_merged-en")
+        tensorflow_cn = load_source("tensorflow-zh-cn")
+        w3cschools = load_source("w3cschools")
+        w3schools = load_source("w3schools")
             
     except Exception as e:
         print(e)
@@ -26,8 +114,7 @@ def load_dataset():
 
 
 async def preprocess_spv_dataset(df) -> pd.DataFrame:
-    df['lang'] = df['lang'].str.lower()  # Normalize to lowercase
-    df.loc[~df['lang'].isin(['en', 'zh-cn']), 'lang'] = 'zh-cn'
+    df['lang'] = df['lang'].fillna('unknown').map(index_language)
     df =df.rename(columns={"name":"title"})
     return df
 
@@ -40,54 +127,82 @@ async def preprocess_dataframe(df:pd.DataFrame, column_to_drop: list, lang:str =
     Args:
         df(pd.Dataframe): Dataframe to be preprocessed
         column_to_drop(list): List of columns to be dropped
-        lang(str): Language of the dataframe, Either en or zh-cn
+        lang(str): Language of the dataframe, Either en or zh-cn, or 'auto' to detect it per row
         file_type(str): Type of the source of the dataframe
 
+    Rows the scraper's ContentPipeline already cleaned carry `hash`, `lang` and `file_type`;
+    those are kept instead of being computed again, so such a feed only goes through the
+    deduplication by hash.
+
     Return:
         df(pd.Dataframe): The cleaned dataframe
     """
-    df= df.dropna()
-    df= df[df['content'] != ""] # drop empty content rows
-    df['hash'] = df['content'].apply(generate_hash)
+    crawled = [column for column in CRAWLED_COLUMNS if column in df]
+    df= df.dropna(subset=df.columns.difference(crawled + [column for column in LABEL_COLUMNS if column in df]))
+    df= df[df['content'] != ""].copy() # drop empty content rows
+    for column in CRAWLED_COLUMNS:
+        if column not in df:
+            df[column] = None
+    missing = df['hash'].isna()
+    if missing.any():
+        df.loc[missing, 'hash'] = df.loc[missing, 'content'].apply(generate_hash)
     df = df.drop_duplicates(subset='hash', keep='first').drop(columns='hash')
-    df = df.drop(column_to_drop, axis=1)
-    df['lang']= lang
-    df['file_type'] = file_type
+    df = df.drop(column_to_drop, axis=1, errors='ignore') # feeds of newer crawls may lack older columns
+    missing = df['lang'].isna()
+    if missing.any():
+        df.loc[missing, 'lang'] = [index_language(code) for code in detect_languages(df.loc[missing, 'content'])] \
+            if lang == 'auto' else lang
+    df['file_type'] = df['file_type'].fillna(file_type)
     return df
 
-def load_model_once()-> SentenceTransformer:
+def load_model_once()-> "SentenceTransformer":
     global _model
     if _model is None:
         _model = load_model()  # Initialize only once
     return _model
 
-def load_model() -> SentenceTransformer:
+def load_model() -> "SentenceTransformer":
+    # Imported here so the pandas-only preprocessing steps don't pay for torch
+    import torch
+    from sentence_transformers import SentenceTransformer
     model = SentenceTransformer("sentence-transformers/paraphrase-multilingual-mpnet-base-v2")
     device = 'cuda' if torch.cuda.is_available() else 'cpu'
     model = model.to(device)
     return model
 
-def get_embeddings(df):
-    """Generate embeddings for text chunks with batching and progress tracking"""
-    model = load_model_once()
-    tokenizer = model.tokenizer
+CHUNK_TOKENS = 126  # leaves room for the two special tokens in a 128-token window
+
+def chunk_content(df, chunk_tokens: int = CHUNK_TOKENS):
+    """
+    Split every content string into chunks of at most `chunk_tokens` tokens.
+
+    Return:
+        (chunk_texts, content_indices, chunk_numbers): The decoded chunk texts, the
+        position of the source row in `df` and the position of the chunk in its row
+    """
+    tokenizer = load_model_once().tokenizer
     all_chunk_texts = []
     content_indices = []
-    
+    chunk_numbers = []
+
     print("Tokenizing content...")
     for idx, content in tqdm(enumerate(df['content']), total=len(df), desc="Tokenizing"):
         token_ids = tokenizer.encode(content, add_special_tokens=False)
-        chunks = [token_ids[i:i + 126] for i in range(0, len(token_ids), 126)]
+        chunks = [token_ids[i:i + chunk_tokens] for i in range(0, len(token_ids), chunk_tokens)]
         chunk_texts = [tokenizer.decode(chunk) for chunk in chunks]
         all_chunk_texts.extend(chunk_texts)
         content_indices.extend([idx] * len(chunk_texts))
+        chunk_numbers.extend(range(len(chunk_texts)))
+    return all_chunk_texts, content_indices, chunk_numbers
 
-    batch_size = 32 
+def encode_chunks(chunk_texts: list, batch_size: int = 32) -> np.ndarray:
+    """Encode chunk texts in batches, returning an array of shape (len(chunk_texts), dim)"""
+    model = load_model_once()
     all_embeddings = []
-    
+
     print("Generating embeddings...")
-    for i in tqdm(range(0, len(all_chunk_texts), batch_size), desc="Embedding"):
-        batch_texts = all_chunk_texts[i:i+batch_size]
+    for i in tqdm(range(0, len(chunk_texts), batch_size), desc="Embedding"):
+        batch_texts = chunk_texts[i:i+batch_size]
         batch_embeddings = model.encode(
             batch_texts,
             convert_to_tensor=False,
@@ -95,35 +210,64 @@ def get_embeddings(df):
             show_progress_bar=False  # Disable internal progress bar
         )
         all_embeddings.append(batch_embeddings)
-    
-    all_embeddings = np.concatenate(all_embeddings)
 
-    # Compute average embeddings with progress
+    if not all_embeddings:
+        return np.empty((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    return np.concatenate(all_embeddings)
+
+def average_embeddings(all_embeddings: np.ndarray, content_indices: list, n_rows: int) -> list:
+    """Average the chunk embeddings of each row into a single content embedding"""
+    dim = load_model_once().get_sentence_embedding_dimension()
     content_embeddings = []
     print("Aggregating results...")
-    for idx in tqdm(range(len(df)), desc="Averaging"):
+    for idx in tqdm(range(n_rows), desc="Averaging"):
         idx_mask = np.array(content_indices) == idx
         if idx_mask.any():
             content_embedding = np.mean(all_embeddings[idx_mask], axis=0)
         else:
-            content_embedding = np.zeros(model.get_sentence_embedding_dimension())
+            content_embedding = np.zeros(dim)
         content_embeddings.append(content_embedding)
-        
     return content_embeddings
 
+def get_embeddings(df):
+    """Generate embeddings for text chunks with batching and progress tracking"""
+    chunk_texts, content_indices, _ = chunk_content(df)
+    all_embeddings = encode_chunks(chunk_texts)
+    return average_embeddings(all_embeddings, content_indices, len(df))
+
+def get_chunk_embeddings(df) -> pd.DataFrame:
+    """
+    Generate one embedding per chunk instead of one per row.
+
+    Args:
+        df(pd.Dataframe): Preprocessed dataframe, in the order it is written to Embeddings.parquet
+
+    Return:
+        chunks(pd.Dataframe): One row per chunk with `doc_id` (row position in `df`),
+        `chunk_no`, the chunk `text` and its `embeddings`
+    """
+    chunk_texts, content_indices, chunk_numbers = chunk_content(df)
+    all_embeddings = encode_chunks(chunk_texts)
+    return pd.DataFrame({
+        "doc_id": np.asarray(content_indices, dtype=np.int32),
+        "chunk_no": np.asarray(chunk_numbers, dtype=np.int32),
+        "text": chunk_texts,
+        "embeddings": list(all_embeddings),
+    })
+
 
 async def load_and_preprocess():
     geeksforgeeks, pytorch_cn, pytorch, scikit, spv_dataset, tensorflow, tensorflow_cn, w3cschools, w3schools = load_dataset()
     results = await asyncio.gather(
-        preprocess_dataframe(geeksforgeeks, ['timestamp', "Source"]),
-        preprocess_dataframe(pytorch_cn, ['timestamp'], 'zh-cn'),
-        preprocess_dataframe(pytorch, ['timestamp']),
-        preprocess_dataframe(scikit, ['timestamp']),
+        preprocess_dataframe(geeksforgeeks, ['timestamp', "Source", 'source'], 'auto'),
+        preprocess_dataframe(pytorch_cn, ['timestamp'], 'auto'),
+        preprocess_dataframe(pytorch, ['timestamp'], 'auto'),
+        preprocess_dataframe(scikit, ['timestamp'], 'auto'),
         preprocess_spv_dataset(spv_dataset),
-        preprocess_dataframe(tensorflow, ['timestamp']),
-        preprocess_dataframe(tensorflow_cn, ['timestamp'], 'zh-cn'),
-        preprocess_dataframe(w3cschools, ['timestamp', 'section_titles'], 'zh-cn'),
-        preprocess_dataframe(w3schools, ['timestamp', 'Source']),
+        preprocess_dataframe(tensorflow, ['timestamp'], 'auto'),
+        preprocess_dataframe(tensorflow_cn, ['timestamp'], 'auto'),
+        preprocess_dataframe(w3cschools, ['timestamp', 'section_titles'], 'auto'),
+        preprocess_dataframe(w3schools, ['timestamp', 'Source'], 'auto'),
                                    )    
     return pd.concat(results)
     
@@ -131,9 +275,13 @@ if __name__ == "__main__":
     print("Preprocessing dataset...")
     Dataframe = asyncio.run(load_and_preprocess())
     print("Creating embeddings for dataset..")
-    Dataframe['embeddings'] = get_embeddings(Dataframe)
+    # Encode chunks once; the chunk table feeds the chunk-level index and the averages the document index
+    Chunks = get_chunk_embeddings(Dataframe)
+    Dataframe['embeddings'] = average_embeddings(np.vstack(Chunks['embeddings'].to_numpy()), Chunks['doc_id'].tolist(), len(Dataframe))
     # Convert embeddings to lists for Parquet compatibility
     Dataframe['embeddings'] = Dataframe['embeddings'].apply(lambda x: x.tolist())
     Dataframe.to_parquet("Embeddings.parquet", engine="pyarrow")
+    Chunks['embeddings'] = Chunks['embeddings'].apply(lambda x: x.tolist())
+    Chunks.to_parquet("ChunkEmbeddings.parquet", engine="pyarrow")
 
     
\ No newline at end of file
@@ -0,0 +1,459 @@
+"""Approximate nearest-neighbour index for the precomputed content embeddings.
+
+Implements an IVF-PQ index (inverted file lists over a k-means coarse
+quantizer, residuals compressed with product quantization) on plain NumPy
+arrays. One index is built per (language, file_type) partition so the same
+preference filters used by `Database.search` can be applied without scanning
+other partitions. Indexes are saved as `.npy` files and memory-mapped on load,
+so a server only pages in the inverted lists it actually probes.
+"""
+import json
+import os
+import numpy as np
+
+DEFAULT_N_LISTS = 1024
+DEFAULT_N_SUBQUANTIZERS = 16
+DEFAULT_NPROBE = 16
+PQ_CENTROIDS = 256  # one uint8 code per sub-vector
+MIN_POINTS_PER_LIST = 39  # below this k-means centroids are poorly trained
+TRAIN_SAMPLE_SIZE = 65536
+ASSIGN_BATCH_SIZE = 16384
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so inner product equals cosine similarity."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _nearest_centroid(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Return the index of the nearest (L2) centroid for each row, in batches."""
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    labels = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), ASSIGN_BATCH_SIZE):
+        batch = data[start:start + ASSIGN_BATCH_SIZE]
+        # |x - c|^2 = |x|^2 - 2x.c + |c|^2, and |x|^2 does not change the argmin
+        distances = centroid_norms - 2.0 * (batch @ centroids.T)
+        labels[start:start + ASSIGN_BATCH_SIZE] = distances.argmin(axis=1)
+    return labels
+
+
+def kmeans(data: np.ndarray, n_clusters: int, n_iter: int = 20, seed: int = 0) -> np.ndarray:
+    """
+    Lloyd's k-means on a (sub)sample of `data`.
+
+    Args:
+        data(np.ndarray): Training vectors of shape (n, d)
+        n_clusters(int): Number of centroids to learn
+        n_iter(int): Number of Lloyd iterations
+        seed(int): Seed for sampling and initialization
+
+    Return:
+        centroids(np.ndarray): Array of shape (n_clusters, d)
+    """
+    rng = np.random.default_rng(seed)
+    data = np.asarray(data, dtype=np.float32)
+    if len(data) > TRAIN_SAMPLE_SIZE:
+        data = data[rng.choice(len(data), TRAIN_SAMPLE_SIZE, replace=False)]
+    if len(data) < n_clusters:
+        raise ValueError(f"Need at least {n_clusters} points to train, got {len(data)}")
+
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = _nearest_centroid(data, centroids)
+        counts = np.bincount(labels, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, data)
+        non_empty = counts > 0
+        centroids[non_empty] = sums[non_empty] / counts[non_empty, None]
+        # Re-seed empty clusters with random points to keep all lists useful
+        empty = np.flatnonzero(~non_empty)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+    return centroids
+
+
+class FlatIndex:
+    """Exact inner-product search; used for small partitions and as ground truth."""
+    kind = "flat"
+
+    def __init__(self, vectors: np.ndarray | None = None, ids: np.ndarray | None = None):
+        self.vectors = vectors
+        self.ids = ids
+
+    def add(self, vectors: np.ndarray, ids: np.ndarray):
+        self.vectors = normalize(vectors)
+        self.ids = np.asarray(ids, dtype=np.int64)
+
+    def search(self, query: np.ndarray, k: int = 10, **kwargs) -> tuple[np.ndarray, np.ndarray]:
+        """Return (ids, scores) of the `k` most similar vectors, best first."""
+        scores = self.vectors @ normalize(query)
+        return _top_k(self.ids, scores, k)
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "vectors.npy"), self.vectors)
+        np.save(os.path.join(path, "ids.npy"), self.ids)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True):
+        mode = "r" if mmap else None
+        return cls(
+            np.load(os.path.join(path, "vectors.npy"), mmap_mode=mode),
+            np.load(os.path.join(path, "ids.npy"), mmap_mode=mode),
+        )
+
+    def __len__(self):
+        return 0 if self.ids is None else len(self.ids)
+
+
+class IVFPQIndex:
+    """
+    Inverted-file index with product-quantized residuals.
+
+    Vectors are normalized, assigned to the nearest of `n_lists` coarse
+    centroids, and the residual to that centroid is split into
+    `n_subquantizers` sub-vectors, each stored as a single uint8 code. Search
+    probes the `nprobe` closest lists and scores codes with per-query lookup
+    tables; raising `nprobe` trades latency for recall. When the raw vectors
+    are kept (`store_vectors=True`) the best `refine * k` candidates are
+    re-scored exactly.
+    """
+    kind = "ivfpq"
+
+    def __init__(self, n_lists: int = DEFAULT_N_LISTS, n_subquantizers: int = DEFAULT_N_SUBQUANTIZERS,
+                 store_vectors: bool = True):
+        self.n_lists = n_lists
+        self.n_subquantizers = n_subquantizers
+        self.store_vectors = store_vectors
+        self.coarse = None      # (n_lists, d) float32
+        self.codebooks = None   # (m, 256, d/m) float32
+        self.codes = None       # (n, m) uint8, grouped by list
+        self.ids = None         # (n,) int64, grouped by list
+        self.offsets = None     # (n_lists + 1,) int64, list boundaries into codes/ids
+        self.vectors = None     # (n, d) float32, optional, grouped by list
+
+    def train(self, vectors: np.ndarray, seed: int = 0):
+        """Learn the coarse centroids and the PQ codebooks."""
+        vectors = normalize(vectors)
+        dim = vectors.shape[1]
+        if dim % self.n_subquantizers:
+            raise ValueError(f"Dimension {dim} is not divisible by {self.n_subquantizers} subquantizers")
+        self.n_lists = max(1, min(self.n_lists, len(vectors) // MIN_POINTS_PER_LIST))
+        self.coarse = kmeans(vectors, self.n_lists, seed=seed)
+
+        residuals = vectors - self.coarse[_nearest_centroid(vectors, self.coarse)]
+        dsub = dim // self.n_subquantizers
+        self.codebooks = np.stack([
+            kmeans(residuals[:, j * dsub:(j + 1) * dsub], PQ_CENTROIDS, n_iter=10, seed=seed + j + 1)
+            for j in range(self.n_subquantizers)
+        ])
+
+    def _encode(self, residuals: np.ndarray) -> np.ndarray:
+        dsub = self.codebooks.shape[2]
+        codes = np.empty((len(residuals), self.n_subquantizers), dtype=np.uint8)
+        for j in range(self.n_subquantizers):
+            codes[:, j] = _nearest_centroid(residuals[:, j * dsub:(j + 1) * dsub], self.codebooks[j])
+        return codes
+
+    def add(self, vectors: np.ndarray, ids: np.ndarray):
+        """Encode `vectors` and store them grouped by inverted list."""
+        vectors = normalize(vectors)
+        ids = np.asarray(ids, dtype=np.int64)
+        labels = _nearest_centroid(vectors, self.coarse)
+        order = np.argsort(labels, kind="stable")
+        vectors, ids, labels = vectors[order], ids[order], labels[order]
+
+        self.codes = self._encode(vectors - self.coarse[labels])
+        self.ids = ids
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=self.n_lists))]).astype(np.int64)
+        if self.store_vectors:
+            self.vectors = vectors
+
+    def search(self, query: np.ndarray, k: int = 10, nprobe: int = DEFAULT_NPROBE,
+               refine: int = 4) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Args:
+            query(np.ndarray): Query embedding of shape (d,)
+            k(int): Number of results to return
+            nprobe(int): Number of inverted lists to scan
+            refine(int): Re-score the best `refine * k` candidates with the raw vectors, 0 disables
+
+        Return:
+            (ids, scores): Arrays of at most `k` ids and similarity scores, best first
+        """
+        query = normalize(query)
+        coarse_scores = self.coarse @ query
+        nprobe = min(nprobe, self.n_lists)
+        probes = np.argpartition(-coarse_scores, nprobe - 1)[:nprobe]
+
+        positions = np.concatenate([
+            np.arange(self.offsets[p], self.offsets[p + 1]) for p in probes
+        ]) if nprobe else np.empty(0, dtype=np.int64)
+        if not len(positions):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        # q.(c + r) = q.c + sum_j q_j.r_j, with q_j.r_j looked up per sub-code
+        dsub = self.codebooks.shape[2]
+        lut = np.einsum("jcd,jd->jc", self.codebooks, query.reshape(self.n_subquantizers, dsub))
+        codes = self.codes[positions]
+        scores = lut[np.arange(self.n_subquantizers), codes].sum(axis=1)
+        list_sizes = np.diff(self.offsets)[probes]
+        scores += np.repeat(coarse_scores[probes], list_sizes)
+
+        if refine and self.vectors is not None:
+            shortlist = min(len(positions), refine * k)
+            best = np.argpartition(-scores, shortlist - 1)[:shortlist]
+            positions = np.sort(positions[best])  # sorted reads are friendlier to the memory map
+            scores = self.vectors[positions] @ query
+        return _top_k(self.ids[positions], scores, k)
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        for name in ("coarse", "codebooks", "codes", "ids", "offsets", "vectors"):
+            value = getattr(self, name)
+            if value is not None:
+                np.save(os.path.join(path, f"{name}.npy"), value)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True):
+        mode = "r" if mmap else None
+        index = cls()
+        for name in ("coarse", "codebooks", "codes", "ids", "offsets", "vectors"):
+            file = os.path.join(path, f"{name}.npy")
+            if os.path.exists(file):
+                # Centroids and codebooks are small and touched by every query
+                small = name in ("coarse", "codebooks", "offsets")
+                setattr(index, name, np.load(file, mmap_mode=None if small else mode))
+        index.n_lists, index.n_subquantizers = len(index.coarse), len(index.codebooks)
+        index.store_vectors = index.vectors is not None
+        return index
+
+    def __len__(self):
+        return 0 if self.ids is None else len(self.ids)
+
+
+def _top_k(ids: np.ndarray, scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    k = min(k, len(scores))
+    if k == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return np.asarray(ids[top]), np.asarray(scores[top])
+
+
+def partition_key(language: str, file_type: str) -> str:
+    return f"{language}__{file_type}"
+
+
+class PartitionedIndex:
+    """A set of per-(language, file_type) indexes sharing one id space."""
+    INDEX_CLASSES = {FlatIndex.kind: FlatIndex, IVFPQIndex.kind: IVFPQIndex}
+
+    def __init__(self, partitions: dict | None = None):
+        self.partitions = partitions or {}
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, languages, file_types, ids: np.ndarray | None = None,
+              n_lists: int = DEFAULT_N_LISTS, n_subquantizers: int = DEFAULT_N_SUBQUANTIZERS,
+              store_vectors: bool = True, seed: int = 0):
+        """
+        Args:
+            vectors(np.ndarray): Embeddings of shape (n, d)
+            languages: Language of each row
+            file_types: File type of each row
+            ids(np.ndarray): Id of each row, defaults to the row number
+            n_lists(int): Upper bound on inverted lists per partition
+            n_subquantizers(int): Number of PQ sub-vectors
+            store_vectors(bool): Keep raw vectors for exact re-scoring
+
+        Return:
+            index(PartitionedIndex): The built index
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        ids = np.arange(len(vectors), dtype=np.int64) if ids is None else np.asarray(ids, dtype=np.int64)
+        keys = np.array([partition_key(lang, ft) for lang, ft in zip(languages, file_types)])
+
+        partitions = {}
+        for key in np.unique(keys):
+            mask = keys == key
+            # PQ codebooks need PQ_CENTROIDS training points; small partitions are cheap to scan anyway
+            if mask.sum() < max(PQ_CENTROIDS, 4 * MIN_POINTS_PER_LIST):
+                index = FlatIndex()
+            else:
+                index = IVFPQIndex(n_lists, n_subquantizers, store_vectors)
+                index.train(vectors[mask], seed=seed)
+            index.add(vectors[mask], ids[mask])
+            partitions[str(key)] = index
+            print(f"Built {index.kind} partition {key} with {len(index)} vectors")
+        return cls(partitions)
+
+    def search(self, query: np.ndarray, property: dict | None = None, k: int = 10,
+               nprobe: int = DEFAULT_NPROBE, refine: int = 4) -> tuple[np.ndarray, np.ndarray]:
+        """Search the partitions matching `property` ({"language", "file_type"}, either may be omitted)."""
+        property = property or {}
+        results = [
+            index.search(query, k=k, nprobe=nprobe, refine=refine)
+            for key, index in self.partitions.items()
+            if _matches(key, property)
+        ]
+        if not results:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        ids = np.concatenate([r[0] for r in results])
+        scores = np.concatenate([r[1] for r in results])
+        return _top_k(ids, scores, k)
+
+    def save(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        meta = {"partitions": {}}
+        for key, index in self.partitions.items():
+            index.save(os.path.join(path, key))
+            meta["partitions"][key] = index.kind
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        return cls({
+            key: cls.INDEX_CLASSES[kind].load(os.path.join(path, key), mmap=mmap)
+            for key, kind in meta["partitions"].items()
+        })
+
+    def __len__(self):
+        return sum(len(index) for index in self.partitions.values())
+
+
+def _matches(key: str, property: dict) -> bool:
+    language, file_type = key.split("__", 1)
+    return (property.get("language") in (None, language)
+            and property.get("file_type") in (None, file_type))
+
+
+def aggregate_chunks(doc_ids: np.ndarray, scores: np.ndarray, k: int, mode: str = "max",
+                     top_m: int = 3) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Collapse chunk hits into document scores.
+
+    Args:
+        doc_ids(np.ndarray): Document id of each chunk hit
+        scores(np.ndarray): Similarity of each chunk hit
+        k(int): Number of documents to return
+        mode(str): "max" keeps each document's best chunk, "sum" adds its `top_m` best chunks
+        top_m(int): Number of chunks summed per document in "sum" mode
+
+    Return:
+        (doc_ids, scores): Arrays of at most `k` document ids and scores, best first
+    """
+    if mode not in ("max", "sum"):
+        raise ValueError(f"Unknown aggregation mode {mode!r}")
+    if not len(doc_ids):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    # Sort by document, then by descending score, so each document's hits are contiguous and ranked
+    order = np.lexsort((-scores, doc_ids))
+    doc_ids, scores = doc_ids[order], scores[order]
+    starts = np.flatnonzero(np.r_[True, doc_ids[1:] != doc_ids[:-1]])
+    if mode == "max":
+        doc_scores = scores[starts]
+    else:
+        rank = np.arange(len(doc_ids)) - np.repeat(starts, np.diff(np.r_[starts, len(doc_ids)]))
+        doc_scores = np.add.reduceat(np.where(rank < top_m, scores, 0), starts)
+    return _top_k(doc_ids[starts], doc_scores, k)
+
+
+class ChunkIndex:
+    """
+    Chunk-level index: every 126-token chunk keeps its own vector instead of
+    being averaged into its document. Chunk rows map back to documents through
+    a compact int32 (doc_id, chunk_no) array; `doc_id` is the row of the
+    document in Embeddings.parquet.
+    """
+
+    def __init__(self, index: PartitionedIndex, chunk_map: np.ndarray):
+        self.index = index
+        self.chunk_map = chunk_map
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, chunk_map: np.ndarray, languages, file_types, **kwargs):
+        """`languages`/`file_types` are given per document and broadcast to its chunks."""
+        chunk_map = np.asarray(chunk_map, dtype=np.int32)
+        doc_ids = chunk_map[:, 0]
+        languages, file_types = np.asarray(languages)[doc_ids], np.asarray(file_types)[doc_ids]
+        return cls(PartitionedIndex.build(vectors, languages, file_types, **kwargs), chunk_map)
+
+    def search(self, query: np.ndarray, property: dict | None = None, k: int = 10, chunk_k: int = 100,
+               mode: str = "max", top_m: int = 3, **kwargs) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Retrieve the best `chunk_k` chunks and aggregate them to `k` documents.
+
+        Return:
+            (doc_ids, scores, chunk_rows): Document ids and scores, best first, and the
+            row of each document's best chunk (whose text can be sent to the reranker)
+        """
+        rows, scores = self.index.search(query, property, k=chunk_k, **kwargs)
+        chunk_doc_ids = self.chunk_map[rows, 0].astype(np.int64)
+        doc_ids, doc_scores = aggregate_chunks(chunk_doc_ids, scores, k, mode, top_m)
+        # rows are ordered best first, so the first hit of a document is its best chunk
+        first_hit = {}
+        for row, doc_id in zip(rows.tolist(), chunk_doc_ids.tolist()):
+            first_hit.setdefault(doc_id, row)
+        best_chunks = np.array([first_hit[d] for d in doc_ids.tolist()], dtype=np.int64)
+        return doc_ids, doc_scores, best_chunks
+
+    def save(self, path: str):
+        self.index.save(path)
+        np.save(os.path.join(path, "chunk_map.npy"), self.chunk_map)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True):
+        return cls(PartitionedIndex.load(path, mmap=mmap),
+                   np.load(os.path.join(path, "chunk_map.npy"), mmap_mode="r" if mmap else None))
+
+    def __len__(self):
+        return len(self.chunk_map)
+
+
+def build_from_parquet(parquet_path: str = "Embeddings.parquet", index_path: str = "ann_index", **kwargs) -> PartitionedIndex:
+    """Build a partitioned index from the output of Preprocess.py and save it to `index_path`."""
+    import pandas as pd
+    df = pd.read_parquet(parquet_path, columns=["lang", "file_type", "embeddings"])
+    vectors = np.vstack(df["embeddings"].to_numpy()).astype(np.float32)
+    index = PartitionedIndex.build(vectors, df["lang"], df["file_type"], **kwargs)
+    index.save(index_path)
+    return index
+
+
+def build_chunk_index_from_parquet(chunk_parquet_path: str = "ChunkEmbeddings.parquet",
+                                   parquet_path: str = "Embeddings.parquet",
+                                   index_path: str = "ann_chunk_index", **kwargs) -> ChunkIndex:
+    """Build a chunk-level index from the chunk table written by Preprocess.py."""
+    import pandas as pd
+    chunks = pd.read_parquet(chunk_parquet_path, columns=["doc_id", "chunk_no", "embeddings"])
+    documents = pd.read_parquet(parquet_path, columns=["lang", "file_type"])
+    vectors = np.vstack(chunks["embeddings"].to_numpy()).astype(np.float32)
+    chunk_map = chunks[["doc_id", "chunk_no"]].to_numpy(dtype=np.int32)
+    index = ChunkIndex.build(vectors, chunk_map, documents["lang"].to_numpy(), documents["file_type"].to_numpy(), **kwargs)
+    index.save(index_path)
+    return index
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Build an IVF-PQ index from Embeddings.parquet")
+    parser.add_argument("--parquet", default="Embeddings.parquet")
+    parser.add_argument("--chunks", help="Build a chunk-level index from this chunk parquet (e.g. ChunkEmbeddings.parquet)")
+    parser.add_argument("--out", default="ann_index")
+    parser.add_argument("--n-lists", type=int, default=DEFAULT_N_LISTS)
+    parser.add_argument("--subquantizers", type=int, default=DEFAULT_N_SUBQUANTIZERS)
+    parser.add_argument("--no-vectors", action="store_true", help="Store PQ codes only, without exact re-scoring")
+    args = parser.parse_args()
+
+    options = dict(n_lists=args.n_lists, n_subquantizers=args.subquantizers, store_vectors=not args.no_vectors)
+    if args.chunks:
+        index = build_chunk_index_from_parquet(args.chunks, args.parquet, args.out, **options)
+    else:
+        index = build_from_parquet(args.parquet, args.out, **options)
+    print(f"Saved index with {len(index)} vectors to {args.out}")
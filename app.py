@@ -1,22 +1,44 @@
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
-import torch
 from weaviate_db import Database
-from fastapi import FastAPI, Depends, Cookie, HTTPException, Request
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse, RedirectResponse
+from fastapi import FastAPI, Depends, Cookie, Header, HTTPException, Request, Response
+from fastapi.responses import HTMLResponse, RedirectResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from models import SessionLocal, User, UserSession, Preference
-from contextlib import asynccontextmanager 
-from security import *
+from sqlalchemy import func
+from contextlib import asynccontextmanager, ExitStack
+from security import verify_password, get_password_hash, create_session_token, validate_session
 from pydantic import BaseModel
-from pathlib import Path
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
+import metrics
+import profiling
+import serialization
+from static_cache import StaticCache
+import asyncio
+import json
+import secrets
+import time
+from os import getenv
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
 
 weaviate_db: Database | None = None
-_model: SentenceTransformer | None = None
+_model: "SentenceTransformer | None" = None
 DEFAULT_ALPHA_VALUE = 0.7
+DEFAULT_MMR_LAMBDA = 1.0 # plain relevance ordering; send a lower mmr_lambda (e.g. 0.7) to diversify results
+WARMUP_BATCH_SIZES = (1, 8, 32)
+# Queries primed at startup; defaults to the presets on the home page
+WARMUP_QUERIES = [q.strip() for q in getenv("WARMUP_QUERIES", "Python Tutorial,Machine Learning Tutorial").split(",") if q.strip()]
+WARMUP_PREFERENCES = 3 # most common (language, file_type) preferences to prime
+MAX_BATCH_SIZE = int(getenv("MAX_BATCH_SIZE", 32)) # queries per /recommendation/batch request
+BATCH_CONCURRENCY = int(getenv("BATCH_CONCURRENCY", 8)) # concurrent backend searches per batch
+# Caps on the per-request k1/k2/k overrides; k2 documents go to the reranker for every query
+SEARCH_MAX_K = {"k1": int(getenv("SEARCH_MAX_K1", 100)), "k2": int(getenv("SEARCH_MAX_K2", 50))}
+SEARCH_MAX_K["k"] = SEARCH_MAX_K["k2"] # no more results than reranked candidates
+ready = False
+startup_timings = {}
+static_files = StaticCache("static")
 
 # Models
 class UserCreate(BaseModel):
@@ -31,15 +53,62 @@ class UpdateModel(BaseModel):
     file_type: str
     language: str
 
+def warm_up_encoder(model):
+    """Run encodes at representative batch sizes so lazy kernel initialization happens before traffic."""
+    for batch_size in WARMUP_BATCH_SIZES:
+        model.encode([f"warm up query {i}" for i in range(batch_size)], batch_size=batch_size)
+
+def prime_caches(model, db: Session):
+    """Touch the session/preference tables and run the popular queries for the common preferences."""
+    db.query(UserSession).count()
+    preferences = (
+        db.query(Preference.language, Preference.file_type)
+        .group_by(Preference.language, Preference.file_type)
+        .order_by(func.count().desc())
+        .limit(WARMUP_PREFERENCES)
+        .all()
+    ) or [("en", "html")]
+    embeddings = model.encode(WARMUP_QUERIES) if WARMUP_QUERIES else []
+    for language, file_type in preferences:
+        for query, embedding in zip(WARMUP_QUERIES, embeddings):
+            weaviate_db.search(query, embedding.tolist(), {"language": language, "file_type": file_type})
+
 @asynccontextmanager
 async def lifespan(app:FastAPI):
+    global weaviate_db, ready
+    ready = False
+    startup_timings.clear()
+    start = time.perf_counter()
     load_dotenv(dotenv_path=".env")
-    load_model()
-
-    global weaviate_db
-    with Database() as weaviate_db:
+    profiling.install_signal_handler() # `kill -USR2 <pid>` writes a profile to profiles/
+
+    with metrics.span("startup_load_static", startup_timings):
+        static_files.load()
+    with metrics.span("startup_load_model", startup_timings):
+        model = load_model()
+    with metrics.span("startup_warm_up_encoder", startup_timings):
+        warm_up_encoder(model)
+    with ExitStack() as stack:
+        # Database() raises if Weaviate is not ready, which aborts startup
+        with metrics.span("startup_connect_backend", startup_timings):
+            weaviate_db = stack.enter_context(Database())
+        with metrics.span("startup_prime_caches", startup_timings):
+            db = SessionLocal()
+            try:
+                prime_caches(model, db)
+            except Exception as e:
+                # Priming is best effort; serving still works with cold caches
+                metrics.ERRORS.inc(where="startup_prime_caches")
+                print(f"Cache priming failed: {e}")
+            finally:
+                db.close()
+
+        for phase, ms in startup_timings.items():
+            print(f"{phase}: {ms:.0f} ms")
+        print(f"Startup completed in {(time.perf_counter() - start) * 1000:.0f} ms")
+        ready = True
         yield
-    yield
+        ready = False
 
 app = FastAPI(lifespan=lifespan)
 
@@ -72,7 +141,54 @@ def get_current_user(db: Session = Depends(get_db), token: str = Cookie(None, al
         return None
     return user_id
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    if not metrics.ENABLED:
+        return await call_next(request)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    except Exception:
+        metrics.ERRORS.inc(where="unhandled")
+        raise
+    finally:
+        # Label by route template (e.g. /vote/{result_id}) to keep label cardinality bounded
+        route = request.scope.get("route")
+        path = route.path if route else "unmatched"
+        metrics.REQUEST_LATENCY.observe(time.perf_counter() - start, route=path)
+        metrics.REQUESTS.inc(route=path, status=status)
+
+def is_admin(token: str | None) -> bool:
+    admin_token = getenv("ADMIN_TOKEN")
+    return bool(admin_token and token and secrets.compare_digest(token, admin_token))
+
+def require_admin(x_admin_token: str = Header(None)):
+    # Hide admin endpoints entirely unless ADMIN_TOKEN is configured and matches
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    """Attach a cProfile summary to JSON responses of admin requests sent with `X-Profile: 1`."""
+    if request.headers.get("x-profile") != "1" or not is_admin(request.headers.get("x-admin-token")):
+        return await call_next(request)
+
+    with profiling.RequestProfiler() as profiler:
+        response = await call_next(request)
+        body = b"".join([chunk async for chunk in response.body_iterator])
+    summary = profiler.summary()
+    headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+    if summary is None:
+        headers["x-profile"] = "busy"
+    elif response.media_type == "application/json" or headers.get("content-type") == "application/json":
+        content = json.loads(body)
+        if isinstance(content, dict):
+            content["profile"] = summary
+            body = json.dumps(content).encode("utf-8")
+    return Response(body, status_code=response.status_code, headers=headers)
 
 # GET request
 @app.get("/", response_class=HTMLResponse)
@@ -80,34 +196,34 @@ async def get_page(request: Request, user_id: int = Depends(get_current_user)):
     if user_id:
         return RedirectResponse("static/home.html")
     else:
-        return FileResponse("static/login.html")
+        return static_files.response(request, "login.html")
 
 @app.get("/login", response_class=HTMLResponse)
-async def get_login_page(user_id: Optional[int] = Depends(get_current_user)):
+async def get_login_page(request: Request, user_id: Optional[int] = Depends(get_current_user)):
     if user_id:
         return RedirectResponse("static/home.html")
     else:
-        return FileResponse("static/login.html")
+        return static_files.response(request, "login.html")
 
 @app.get("/signup", response_class=HTMLResponse)
-async def get_signup_page(user_id: Optional[int] = Depends(get_current_user)):
+async def get_signup_page(request: Request, user_id: Optional[int] = Depends(get_current_user)):
     if user_id:
         return RedirectResponse("static/home.html")
     else:
-        return FileResponse("static/signup.html")
+        return static_files.response(request, "signup.html")
 
 @app.get("/home", response_class=HTMLResponse)
-async def get_home_page(user_id: int = Depends(get_current_user)):
+async def get_home_page(request: Request, user_id: int = Depends(get_current_user)):
     if user_id:
-        return FileResponse("static/home.html")
+        return static_files.response(request, "home.html")
     else:
         return RedirectResponse("static/login.html")
 
 @app.get("/profile", response_class=HTMLResponse)
-async def get_profile_page(user_id: int = Depends(get_current_user)):
+async def get_profile_page(request: Request, user_id: int = Depends(get_current_user)):
     if not user_id:
         return RedirectResponse("static/login.html")
-    return FileResponse("static/profile.html")
+    return static_files.response(request, "profile.html")
 
 @app.get("/profile/preferences")
 async def get_profile_preferences(user_id: int = Depends(get_current_user), db: Session = Depends(get_db)):
@@ -119,16 +235,14 @@ async def get_profile_preferences(user_id: int = Depends(get_current_user), db:
             }
         return results
     except Exception as e:
+        metrics.ERRORS.inc(where="profile_preferences")
         raise HTTPException(400, e)
 
 
-# Static files handler
-@app.get("/static/{file_path:path}")
-async def serve_static(file_path: str):
-    static_path = Path("static") / file_path
-    if not static_path.exists():
-        raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(static_path)
+# Static files handler, served from memory
+@app.api_route("/static/{file_path:path}", methods=["GET", "HEAD"])
+async def serve_static(file_path: str, request: Request):
+    return static_files.response(request, file_path)
 
 # POST request
 @app.post("/login")
@@ -188,31 +302,179 @@ async def signup(user: UserCreate, db: Session = Depends(get_db)):
     
     return {"token": session_token}
 
+def _parse_float(payload: dict, key: str, default: float) -> float:
+    try:
+        return float(payload.get(key, default))
+    except (TypeError, ValueError):
+        metrics.ERRORS.inc(where=f"invalid_{key}")
+        print(f"Invalid {key} value, using default {default}")
+        return default
+
+def _parse_fields(fields: str | None) -> tuple:
+    try:
+        return serialization.parse_fields(fields)
+    except ValueError as e:
+        metrics.ERRORS.inc(where="invalid_fields")
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _search_options(payload: dict):
+    """Parse alpha, mmr_lambda and the optional, capped k1/k2/k retrieval budget from a request payload."""
+    alpha = _parse_float(payload, 'alpha', DEFAULT_ALPHA_VALUE)
+    mmr_lambda = _parse_float(payload, 'mmr_lambda', DEFAULT_MMR_LAMBDA)
+    # Optional per-request retrieval budget; unset values fall back to SEARCH_K1/SEARCH_K2/SEARCH_K,
+    # larger ones are clamped to SEARCH_MAX_K1/SEARCH_MAX_K2
+    budget = {}
+    for key in ("k1", "k2", "k"):
+        try:
+            if payload.get(key) is not None:
+                budget[key] = max(1, int(payload[key]))
+        except (TypeError, ValueError):
+            metrics.ERRORS.inc(where=f"invalid_{key}")
+            print(f"Invalid {key} value, using server default")
+            continue
+        if budget.get(key, 0) > SEARCH_MAX_K[key]:
+            metrics.ERRORS.inc(where=f"clamped_{key}")
+            print(f"{key}={budget[key]} is above the server maximum, using {SEARCH_MAX_K[key]}")
+            budget[key] = SEARCH_MAX_K[key]
+    return alpha, mmr_lambda, budget
+
 @app.post("/recommendation")
-async def recommendation_page(request: Request, payload: dict, user_id: Optional[int] = Depends(get_current_user), db: Session = Depends(get_db)):
+async def recommendation_page(request: Request, payload: dict, fields: Optional[str] = None, user_id: Optional[int] = Depends(get_current_user), db: Session = Depends(get_db)):
     global weaviate_db
 
     query = payload['input']
-    try:
-        alpha = float(payload.get('alpha', DEFAULT_ALPHA_VALUE)) 
-    except ValueError:
-        print(f"Invalid alpha value, using default {DEFAULT_ALPHA_VALUE}")
-        alpha = DEFAULT_ALPHA_VALUE
+    alpha, mmr_lambda, budget = _search_options(payload)
+    fields = _parse_fields(fields)
 
     if not user_id:
         return RedirectResponse(url="static/login.html", status_code=303)
 
     model = load_model()
     try:
-        query_embedding = model.encode(query).tolist()
+        timings = {}
+        with metrics.span("encode", timings):
+            query_embedding = model.encode(query).tolist()
         # Get user preferences
-        user_preference = db.query(Preference).filter_by(user_id=user_id).first()
+        with metrics.span("preference_lookup", timings):
+            user_preference = db.query(Preference).filter_by(user_id=user_id).first()
         property = {"language": user_preference.language, "file_type": user_preference.file_type}
-        results = weaviate_db.search(query, query_embedding, property, alpha)
-        return {"message": f"Searching for: {query}", "results": results}
+        results = weaviate_db.search(query, query_embedding, property, alpha, mmr_lambda, timings=timings, **budget)
+        return serialization.FastJSONResponse({
+            "message": f"Searching for: {query}",
+            "results": serialization.serialize_results(results, fields, query),
+            "timings": timings,
+        })
     except ValueError:
+        metrics.ERRORS.inc(where="empty_query")
         raise HTTPException(status_code=404, detail="Query cannot be empty or whitespace.")
 
+@app.post("/recommendation/batch")
+async def recommendation_batch(payload: dict, fields: Optional[str] = None, user_id: Optional[int] = Depends(get_current_user), db: Session = Depends(get_db)):
+    """
+    Run several queries in one request.
+
+    Payload: {"queries": ["...", {"input": "...", "alpha": 0.5}, ...]} plus the
+    same optional alpha/mmr_lambda/k1/k2/k as /recommendation, which apply to
+    every query without its own alpha. Authentication, the preference lookup
+    and encoding happen once for the whole batch; the searches run
+    concurrently. Results come back in query order, with an "error" entry for
+    queries that failed instead of failing the batch.
+    """
+    if not user_id:
+        return RedirectResponse(url="static/login.html", status_code=303)
+
+    queries = payload.get('queries')
+    if not isinstance(queries, list) or not queries:
+        raise HTTPException(status_code=400, detail="queries must be a non-empty list")
+    if len(queries) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SIZE} queries per batch")
+    alpha, mmr_lambda, budget = _search_options(payload)
+    fields = _parse_fields(fields)
+    items = []
+    for item in queries:
+        if isinstance(item, dict):
+            items.append((str(item.get('input', '')), _parse_float(item, 'alpha', alpha)))
+        else:
+            items.append((str(item), alpha))
+
+    timings = {}
+    with metrics.span("preference_lookup", timings):
+        user_preference = db.query(Preference).filter_by(user_id=user_id).first()
+    property = {"language": user_preference.language, "file_type": user_preference.file_type}
+    # Empty queries are rejected by search() anyway, keep them out of the forward pass
+    to_encode = [i for i, (query, _) in enumerate(items) if query.strip()]
+    model = load_model()
+    with metrics.span("encode", timings):
+        embeddings = model.encode([items[i][0] for i in to_encode], batch_size=len(to_encode)) if to_encode else []
+    query_embeddings = dict(zip(to_encode, embeddings))
+
+    limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run(i: int):
+        query, query_alpha = items[i]
+        if i not in query_embeddings:
+            metrics.ERRORS.inc(where="empty_query")
+            return {"query": query, "error": "Query cannot be empty or whitespace."}
+        query_timings = {}
+        async with limit:
+            try:
+                results = await asyncio.to_thread(
+                    weaviate_db.search, query, query_embeddings[i].tolist(), property, query_alpha, mmr_lambda,
+                    timings=query_timings, **budget)
+            except Exception as e:
+                metrics.ERRORS.inc(where="batch_search")
+                print(f"Batch search failed for {query!r}: {e}")
+                return {"query": query, "error": "Search failed"}
+        return {"query": query, "results": serialization.serialize_results(results, fields, query), "timings": query_timings}
+
+    with metrics.span("batch_search", timings):
+        responses = await asyncio.gather(*(run(i) for i in range(len(items))))
+    return serialization.FastJSONResponse({"responses": responses, "timings": timings})
+
+@app.post("/recommendation/stream")
+async def recommendation_stream(payload: dict, fields: Optional[str] = None, user_id: Optional[int] = Depends(get_current_user), db: Session = Depends(get_db)):
+    """
+    Stream results as NDJSON while the ranking stages complete.
+
+    The first line holds the hybrid-search results ({"stage": "first_stage"}),
+    the second the reranked and vote-scored results ({"stage": "ranked"}) with
+    the stage timings. A failure after streaming started is reported as a
+    final {"stage": "error"} line.
+    """
+    if not user_id:
+        return RedirectResponse(url="static/login.html", status_code=303)
+    query = str(payload.get('input', ''))
+    if not query.strip():
+        metrics.ERRORS.inc(where="empty_query")
+        raise HTTPException(status_code=404, detail="Query cannot be empty or whitespace.")
+    alpha, mmr_lambda, budget = _search_options(payload)
+    fields = _parse_fields(fields)
+
+    model = load_model()
+    timings = {}
+    with metrics.span("encode", timings):
+        query_embedding = model.encode(query).tolist()
+    with metrics.span("preference_lookup", timings):
+        user_preference = db.query(Preference).filter_by(user_id=user_id).first()
+    property = {"language": user_preference.language, "file_type": user_preference.file_type}
+    stages = weaviate_db.search_stages(query, query_embedding, property, alpha, mmr_lambda,
+                                       timings=timings, early=True, **budget)
+
+    # A sync generator: Starlette iterates it in the threadpool, so the blocking stages don't stall the event loop
+    def lines():
+        try:
+            for stage, results in stages:
+                message = {"stage": stage, "results": serialization.serialize_results(results, fields, query)}
+                if stage == "ranked":
+                    message["timings"] = timings
+                yield serialization.dumps(message) + b"\n"
+        except Exception as e:
+            metrics.ERRORS.inc(where="stream_search")
+            print(f"Streaming search failed for {query!r}: {e}")
+            yield serialization.dumps({"stage": "error", "detail": "Search failed"}) + b"\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 # Endpoint to handle voting
 @app.post("/vote/{result_id}")
 async def vote(result_id: str, vote: str, request: Request, user_id: int = Depends(get_current_user)):
@@ -222,8 +484,10 @@ async def vote(result_id: str, vote: str, request: Request, user_id: int = Depen
 
     global weaviate_db
     try:
-        response = weaviate_db.update_vote(result_id, user_id, vote)
+        with metrics.span("update_vote"):
+            response = weaviate_db.update_vote(result_id, user_id, vote)
     except LookupError:
+        metrics.ERRORS.inc(where="vote_lookup")
         return {"message": f"No object found with UUID {result_id}"}
 
     if response == (-1,-1):
@@ -256,9 +520,37 @@ def update_profile(preference: UpdateModel, db: Session = Depends(get_db), user_
     else:
         return {"status_code": 404, "message": "User not found"}
 
+@app.get("/live")
+async def liveness():
+    return {"status": "alive"}
+
+@app.get("/ready")
+async def readiness():
+    # Only report ready once the model is warm, the backend is reachable and caches are primed
+    if not ready:
+        raise HTTPException(status_code=503, detail="Starting up")
+    return {"status": "ready", "startup_ms": startup_timings}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/admin/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def capture_profile(seconds: float = 10, interval_ms: float = 5):
+    """Sample all threads for `seconds` and return flamegraph-ready collapsed stacks."""
+    try:
+        counts = await asyncio.to_thread(profiling.sample_stacks, seconds, interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(profiling.collapse(counts))
+
 def load_model():
     global _model
+    metrics.CACHE.inc(cache="model", result="hit" if _model is not None else "miss")
     if _model == None:
+        # torch and sentence_transformers take seconds to import, so only the encoder pays for them
+        import torch
+        from sentence_transformers import SentenceTransformer
         model = SentenceTransformer("sentence-transformers/paraphrase-multilingual-mpnet-base-v2")
         device = 'cuda' if torch.cuda.is_available() else 'cpu'
         model = model.to(device)
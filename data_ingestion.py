@@ -7,5 +7,7 @@ if __name__ == '__main__':
     dataset = pd.read_parquet("Embeddings.parquet")
     with Database() as db:
         db.ingest_data(dataset)
+        if db.chunks:
+            db.ingest_chunks(dataset, pd.read_parquet("ChunkEmbeddings.parquet"))
     print("Success ingesting data")
     
\ No newline at end of file
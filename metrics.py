@@ -0,0 +1,160 @@
+"""Lightweight in-process metrics exposed in the Prometheus text format.
+
+Stages are timed with `span`, which feeds the `stage_latency_seconds`
+histogram and, optionally, a per-request timings dict. Set
+METRICS_ENABLED=0 to turn collection off; spans then cost a single
+attribute lookup unless a timings dict is requested.
+"""
+import bisect
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from os import getenv
+
+ENABLED = getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+WINDOW_SIZE = 1024  # most recent observations kept per label set for percentiles
+
+_registry = []
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: tuple, extra: dict | None = None) -> str:
+    items = list(key) + list((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in items) + "}"
+
+
+class Counter:
+    """Monotonic counter, one value per label set."""
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        if not ENABLED:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram, one per label set. Percentiles over the last
+    WINDOW_SIZE observations are exported as a `<name>_window` gauge, since
+    bucket-interpolated quantiles are too coarse for a single replica.
+    """
+
+    def __init__(self, name: str, help: str, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, **labels):
+        if not ENABLED:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    "counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0,
+                    "window": deque(maxlen=WINDOW_SIZE),
+                }
+            series["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            series["sum"] += value
+            series["count"] += 1
+            series["window"].append(value)
+
+    def percentiles(self, **labels) -> dict:
+        """Return {quantile: value} over the recent window for one label set."""
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            window = sorted(series["window"]) if series else []
+        if not window:
+            return {}
+        return {q: window[min(len(window) - 1, int(q * len(window)))] for q in QUANTILES}
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        quantile_lines = [f"# HELP {self.name}_window Percentiles of the last {WINDOW_SIZE} observations",
+                          f"# TYPE {self.name}_window gauge"]
+        with self._lock:
+            snapshot = {key: (list(s["counts"]), s["sum"], s["count"], sorted(s["window"]))
+                        for key, s in self._series.items()}
+        for key, (counts, total, count, window) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(key, {'le': bound})} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, {'le': '+Inf'})} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+            for q in QUANTILES:
+                value = window[min(len(window) - 1, int(q * len(window)))]
+                quantile_lines.append(f"{self.name}_window{_format_labels(key, {'quantile': q})} {value}")
+        return lines + (quantile_lines if snapshot else [])
+
+
+STAGE_LATENCY = Histogram("stage_latency_seconds", "Latency of serving stages")
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "Latency of HTTP requests by route")
+REQUESTS = Counter("http_requests_total", "HTTP requests by route and status")
+ERRORS = Counter("errors_total", "Handled errors by location")
+CACHE = Counter("cache_requests_total", "Cache lookups by cache and result")
+
+_NULL_SPAN = nullcontext()
+
+
+@contextmanager
+def _span(stage: str, timings: dict | None):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.observe(elapsed, stage=stage)
+        if timings is not None:
+            timings[stage] = round(elapsed * 1000, 3)
+
+
+def span(stage: str, timings: dict | None = None):
+    """
+    Time a block as `stage`.
+
+    Args:
+        stage(str): Stage label in `stage_latency_seconds`
+        timings(dict): If given, the elapsed milliseconds are also stored under `stage`
+    """
+    if not ENABLED and timings is None:
+        return _NULL_SPAN
+    return _span(stage, timings)
+
+
+def render() -> str:
+    """Render every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
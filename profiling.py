@@ -0,0 +1,140 @@
+"""On-demand CPU profiling of the running server.
+
+`sample_stacks` is a statistical profiler: a background thread snapshots the
+stack of every thread (including the event loop) with `sys._current_frames`
+at a fixed interval and counts identical stacks. `collapse` renders the
+counts in the collapsed-stack format read by flamegraph.pl / speedscope.
+`RequestProfiler` wraps a single request in cProfile for a per-call summary.
+"""
+import cProfile
+import io
+import os
+import pstats
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+MAX_PROFILE_SECONDS = 60
+_sampling_lock = threading.Lock()  # one sampling session at a time
+_cprofile_lock = threading.Lock()  # cProfile can only be active once per process
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample_stacks(seconds: float, interval: float = 0.005) -> Counter:
+    """
+    Sample the stacks of all threads for `seconds`.
+
+    Args:
+        seconds(float): Capture duration, capped at MAX_PROFILE_SECONDS
+        interval(float): Time between samples in seconds
+
+    Return:
+        counts(Counter): Number of samples per stack, keyed by a root-to-leaf tuple of frame labels
+    """
+    if not _sampling_lock.acquire(blocking=False):
+        raise RuntimeError("A profile is already being captured")
+    try:
+        own_id = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        counts = Counter()
+        deadline = time.monotonic() + min(seconds, MAX_PROFILE_SECONDS)
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                counts[tuple(reversed(stack))] += 1
+            time.sleep(interval)
+        return counts
+    finally:
+        _sampling_lock.release()
+
+
+def collapse(counts: Counter) -> str:
+    """Render stack counts as collapsed stacks: `thread;outer;...;inner count` per line."""
+    return "".join(
+        f"{';'.join(label.replace(';', ':') for label in stack)} {count}\n"
+        for stack, count in counts.most_common()
+    )
+
+
+def install_signal_handler(seconds: float = 10, directory: str = "profiles", signum: int | None = None):
+    """
+    Capture a profile to `directory` whenever the process receives SIGUSR2.
+
+    The handler only starts a background thread, so the signalled thread
+    (usually the event loop) keeps serving while it is being sampled. Signal
+    handlers can only be set from the main thread; elsewhere (e.g. a TestClient
+    or an embedded server) the trigger is skipped and the app starts without it.
+    """
+    signum = signum or getattr(signal, "SIGUSR2", None)
+    if signum is None:  # not available on Windows
+        return
+    if threading.current_thread() is not threading.main_thread():
+        print("Profile signal trigger unavailable: not running on the main thread")
+        return
+
+    def capture():
+        try:
+            output = collapse(sample_stacks(seconds))
+        except RuntimeError as e:
+            print(f"Profile not captured: {e}")
+            return
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"profile-{os.getpid()}-{int(time.time())}.collapsed")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"Saved profile to {path}")
+
+    try:
+        signal.signal(signum, lambda *_: threading.Thread(target=capture, name="profiler", daemon=True).start())
+    except ValueError as e:  # e.g. a subinterpreter
+        print(f"Profile signal trigger unavailable: {e}")
+
+
+class RequestProfiler:
+    """
+    cProfile around one request.
+
+    cProfile only sees the thread it is enabled in: for `async def` endpoints
+    that is the event loop, so coroutines of concurrent requests may appear
+    too, and work handed to the threadpool (sync endpoints) does not.
+    """
+
+    def __init__(self):
+        self.profile = None
+
+    def __enter__(self):
+        if _cprofile_lock.acquire(blocking=False):
+            self.profile = cProfile.Profile()
+            try:
+                self.profile.enable()
+            except ValueError:  # another profiler (e.g. a debugger) is active
+                self.profile = None
+                _cprofile_lock.release()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.profile is not None:
+            self.profile.disable()
+            _cprofile_lock.release()
+
+    def summary(self, limit: int = 30) -> str | None:
+        """Top `limit` functions by cumulative time, or None if profiling was busy."""
+        if self.profile is None:
+            return None
+        output = io.StringIO()
+        pstats.Stats(self.profile, stream=output).strip_dirs().sort_stats("cumulative").print_stats(limit)
+        return output.getvalue()
@@ -0,0 +1,46 @@
+"""Post-ranking stages applied to search candidates after scoring."""
+import numpy as np
+from ann_index import normalize
+
+
+def mmr(relevance, vectors, k: int, lambda_: float = 0.7) -> list:
+    """
+    Maximal marginal relevance selection.
+
+    Greedily picks the candidate maximizing
+    `lambda_ * relevance - (1 - lambda_) * max similarity to already picked candidates`,
+    so near-identical pages (e.g. the same tutorial on mirror sites) do not fill the results.
+
+    Args:
+        relevance: Relevance score of each candidate, any scale
+        vectors: Embedding of each candidate, shape (n, d)
+        k(int): Number of candidates to select
+        lambda_(float): 1.0 ranks by relevance only, 0.0 by diversity only
+
+    Return:
+        selected(list): Indices of the selected candidates, in selection order
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    n = len(relevance)
+    k = min(k, n)
+    if k == 0:
+        return []
+    # Rescale relevance to [0, 1] so it is comparable with cosine similarity
+    spread = relevance.max() - relevance.min()
+    relevance = (relevance - relevance.min()) / spread if spread > 0 else np.ones_like(relevance)
+
+    vectors = normalize(vectors)
+    similarity = vectors @ vectors.T  # all pairwise similarities in one matrix op
+
+    first = int(relevance.argmax())
+    selected = [first]
+    max_similarity = similarity[first].copy()
+    available = np.ones(n, dtype=bool)
+    available[first] = False
+    for _ in range(k - 1):
+        scores = np.where(available, lambda_ * relevance - (1 - lambda_) * max_similarity, -np.inf)
+        nxt = int(scores.argmax())
+        selected.append(nxt)
+        available[nxt] = False
+        np.maximum(max_similarity, similarity[nxt], out=max_similarity)
+    return selected
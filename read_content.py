@@ -1,13 +1,60 @@
+"""Extract text from the supervisor dataset (PPTX, DOCX, PDF, TXT/MD and images) into a CSV.
+
+Each file type has an `Extractor`; its heavy library is imported on first
+use. `extract_files` runs the extractors in a process pool whose workers
+create the EasyOCR reader once, at startup, instead of per file, and stops
+any single file after a timeout. Records are yielded in input order or as
+they complete, and `Progress` prints throughput while the pool runs.
+
+Images are OCRed in batches: each is decoded in grayscale, downscaled to
+`OCR_MAX_DIMENSION`, skipped if nearly blank, and images of similar size are
+padded to a common shape and detected in one `readtext_batched` call.
+
+PDFs are split into ranges of `PDF_PAGES_PER_TASK` pages extracted in
+parallel. With `--pages` every page is written as its own row (name, page,
+lang, file_type, content) as soon as its range finishes, so a 1000-page deck
+never has to be held in memory; otherwise the ranges are joined back into
+one row per file.
+
+`ExtractionCache` keeps every record in SQLite keyed by the file's path,
+size, mtime, content hash and extractor version, so a re-run only extracts
+new or modified files and rewrites the CSV from the cache.
+
+Usage:
+    python read_content.py --input dataset/ --output supervisor-dataset-new.csv --workers 8
+    python read_content.py --input dataset/ --output supervisor-dataset-pages.csv --pages
+"""
+import argparse
 import csv
-from pptx import Presentation
-import docx2txt
-from PyPDF2 import PdfReader
+import hashlib
+import json
 import os
-import cv2
-from langdetect import detect
-import easyocr
+import signal
+import sqlite3
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+import numpy as np
+from web_scraper.web_scraper.language import detect_language
+
+EXTRACT_TIMEOUT = 300  # seconds per file
+OCR_THRESHOLD = 0.25  # minimum confidence of an OCR detection
+OCR_LANGUAGES = ['en', 'ch_sim']
+OCR_MAX_DIMENSION = 1600  # longest side of an image after downscaling, in pixels
+OCR_BATCH_SIZE = 8  # images per OCR task
+OCR_BUCKET = 128  # images are padded to multiples of this so equal shapes can be batched
+BLANK_STD = 6.0  # images whose grayscale standard deviation is below this are skipped as blank
+PDF_PAGES_PER_TASK = 20  # pages of one PDF extracted per pool task
+TASKS_PER_WORKER = 2  # pool tasks queued or finished but not yet yielded, per worker
+CSV_COLUMNS = ["name", "lang", "file_type", "content"]
+PAGE_CSV_COLUMNS = ["name", "page", "lang", "file_type", "content"]
+RECORD_VERSION = 2  # bump when extract_file's output changes for every file type (e.g. language detection)
+
+_ocr_reader = None  # one EasyOCR reader per process
+
 
-def get_file_type(filename:str): 
+def get_file_type(filename:str):
     if filename.endswith('.pptx'):
         return "pptx"
     elif filename.endswith('.docx'):
@@ -27,80 +74,703 @@ def get_file_type(filename:str):
     return 'unknown'
 
 def get_lang(content:str):
-    return detect(content)
+    # Sampled and seeded, so long files are cheap and re-runs give the same label
+    return detect_language(content)
 
-if __name__ == "__main__":
-    reader = easyocr.Reader(['en', 'ch_sim'], gpu=False)
+def get_ocr_reader():
+    global _ocr_reader
+    if _ocr_reader is None:
+        import easyocr
+        _ocr_reader = easyocr.Reader(OCR_LANGUAGES, gpu=False)
+    return _ocr_reader
 
-    # get list of file in dir
-    path = "dataset/"
-    filename = 'supervisor-dataset-new.csv'
 
-    files = os.listdir(path)
+class Extractor:
+    """Turns one file into text. Bump `version` when the output of `extract` changes."""
+    file_types = ()
+    version = 1
 
-    # Open CSV file for writing
-    with open(filename, "w", newline='', encoding="utf-8") as dataset:
-        writer = csv.writer(dataset)
-        writer.writerow(["name", "lang", "file_type" ,"content"])
+    def extract(self, path: str) -> str:
+        raise NotImplementedError
 
-        for file in files:
-            text = ""  # Reset text for each file
-            file = file.encode('utf-8').decode('utf-8')
-            file_type = get_file_type(file)
 
-            if file_type == 'pptx':
-                try:
-                    presentation = Presentation(path + file)
-                    for slide in presentation.slides:
-                        for shape in slide.shapes:
-                            if hasattr(shape, "text"):
-                                text += shape.text
-                    text = text.replace('\n', ' ')
-                    
+class PptxExtractor(Extractor):
+    file_types = ("pptx",)
 
-                except Exception as e:
-                    print(f"Error processing PPTX {file}: {e}")
+    def extract(self, path: str) -> str:
+        from pptx import Presentation
+        texts = []
+        for slide in Presentation(path).slides:
+            for shape in slide.shapes:
+                if hasattr(shape, "text"):
+                    texts.append(shape.text)
+        return "".join(texts)
+
+
+class DocxExtractor(Extractor):
+    file_types = ("docx",)
+
+    def extract(self, path: str) -> str:
+        import docx2txt
+        return docx2txt.process(path)
+
+
+class PdfExtractor(Extractor):
+    file_types = ("pdf",)
+
+    @staticmethod
+    def pages(path: str, start: int = 0, stop: int | None = None):
+        """Yield (page number counted from 1, page) for the pages from `start` to `stop` (0-based, exclusive)."""
+        from PyPDF2 import PdfReader
+        pages = PdfReader(path).pages
+        for i in range(start, len(pages) if stop is None else min(stop, len(pages))):
+            yield i + 1, pages[i]
+
+    @staticmethod
+    def page_count(path: str) -> int:
+        from PyPDF2 import PdfReader
+        return len(PdfReader(path).pages)
+
+    def extract(self, path: str) -> str:
+        return "".join(page.extract_text() or '' for _, page in self.pages(path))
+
+
+class TextExtractor(Extractor):
+    file_types = ("txt", "md")
+
+    def extract(self, path: str) -> str:
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+
+
+class ImageExtractor(Extractor):
+    file_types = ("jpg", "jpeg", "png")
+    version = 2  # downscaled grayscale input
+
+    @staticmethod
+    def load(path: str, max_dimension: int = OCR_MAX_DIMENSION) -> np.ndarray:
+        """Decode as grayscale and shrink so the longest side is at most `max_dimension`."""
+        import cv2
+        img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            raise ValueError("unreadable image")
+        scale = max_dimension / max(img.shape)
+        if scale < 1:
+            img = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        return img
+
+    @staticmethod
+    def is_blank(img: np.ndarray) -> bool:
+        # Subsample: the variance of every 4th pixel is plenty to tell an empty scan from text
+        return float(img[::4, ::4].std()) < BLANK_STD
+
+    @staticmethod
+    def text(detections: list) -> str:
+        return "".join(text + " " for _, text, confidence in detections if confidence > OCR_THRESHOLD)
+
+    def extract(self, path: str) -> str:
+        img = self.load(path)
+        return "" if self.is_blank(img) else self.text(get_ocr_reader().readtext(img))
+
+    def extract_batch(self, images: list) -> list:
+        """
+        OCR decoded images, batching detection over images of similar size.
+
+        Return:
+            results(list): (detections, seconds) per image, seconds being its share of its batch's time
+        """
+        import cv2
+        reader = get_ocr_reader()
+        results = [None] * len(images)
+        buckets = {}
+        for i, img in enumerate(images):
+            shape = tuple(-(-side // OCR_BUCKET) * OCR_BUCKET for side in img.shape)
+            buckets.setdefault(shape, []).append(i)
+        for (height, width), indices in buckets.items():
+            start = time.perf_counter()
+            if len(indices) > 1 and hasattr(reader, "readtext_batched"):
+                # Pad with the median gray level so the border doesn't look like an edge
+                padded = [
+                    cv2.copyMakeBorder(images[i], 0, height - images[i].shape[0], 0, width - images[i].shape[1],
+                                       cv2.BORDER_CONSTANT, value=int(np.median(images[i])))
+                    for i in indices
+                ]
+                batch = reader.readtext_batched(padded, batch_size=len(indices))
+            else:
+                batch = [reader.readtext(images[i]) for i in indices]
+            seconds = (time.perf_counter() - start) / len(indices)
+            for i, detections in zip(indices, batch):
+                results[i] = (detections, seconds)
+        return results
+
+
+EXTRACTORS = {
+    file_type: extractor
+    for extractor in (PptxExtractor(), DocxExtractor(), PdfExtractor(), TextExtractor(), ImageExtractor())
+    for file_type in extractor.file_types
+}
+
+
+class ExtractionTimeout(Exception):
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise ExtractionTimeout()
+
+
+@contextmanager
+def _time_limit(seconds: float):
+    """Raise ExtractionTimeout in this thread after `seconds` (SIGALRM, so not on Windows)."""
+    if not seconds or not hasattr(signal, "setitimer"):
+        yield
+        return
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _record(path: str, text: str, error: str | None, start: float, detect_lang: bool = True, **extra) -> dict:
+    name = os.path.basename(path)
+    return {
+        "path": path,
+        "name": name,
+        "lang": get_lang(text) if detect_lang else None,
+        "file_type": get_file_type(name),
+        "content": text,
+        "error": error,
+        "seconds": time.perf_counter() - start,
+        "bytes": os.path.getsize(path),
+        **extra,
+    }
+
+
+def init_worker(ocr: bool = False, threads: int = 1):
+    """Process pool initializer: limit torch threads and load the OCR reader before the first file."""
+    if ocr:
+        import torch
+        torch.set_num_threads(threads)
+        get_ocr_reader()
+
+
+def extract_file(path: str, timeout: float = EXTRACT_TIMEOUT) -> dict:
+    """
+    Extract one file into a dataset record.
+
+    Args:
+        path(str): File to extract
+        timeout(float): Seconds before the extraction is abandoned. Uses SIGALRM,
+            so it only interrupts Python code (a long call into a C library ends first)
+            and is not enforced on Windows.
+
+    Return:
+        record(dict): name, lang, file_type and content as in the CSV, plus error and seconds
+    """
+    start = time.perf_counter()
+    extractor = EXTRACTORS.get(get_file_type(path))
+    text, error = "", None
+
+    if extractor is None:
+        error = "unsupported file type"
+    else:
+        try:
+            with _time_limit(timeout):
+                text = extractor.extract(path).replace('\n', ' ')
+        except ExtractionTimeout:
+            error = f"timed out after {timeout} s"
+        except UnicodeDecodeError:
+            error = "could not decode with UTF-8"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+
+    return _record(path, text, error, start)
+
+
+def extract_images(paths: list, timeout: float = EXTRACT_TIMEOUT, max_dimension: int = OCR_MAX_DIMENSION) -> list:
+    """
+    OCR a batch of images; records carry an `ocr` entry with per-image latency and confidence.
+
+    The timeout applies to the whole batch, scaled by its size.
+    """
+    extractor = EXTRACTORS["png"]
+    start = time.perf_counter()
+    records, images, image_paths = [], [], []
+    for path in paths:
+        try:
+            img = extractor.load(path, max_dimension)
+        except Exception as e:
+            records.append(_record(path, "", f"{type(e).__name__}: {e}", start))
+            continue
+        if extractor.is_blank(img):
+            records.append(_record(path, "", None, start, ocr={"blank": True}))
+        else:
+            images.append(img)
+            image_paths.append(path)
+    if not images:
+        return records
+
+    try:
+        with _time_limit(timeout * len(images)):
+            results = extractor.extract_batch(images)
+    except Exception as e:
+        error = f"timed out after {timeout * len(images)} s" if isinstance(e, ExtractionTimeout) else f"{type(e).__name__}: {e}"
+        return records + [_record(path, "", error, start) for path in image_paths]
+    for path, (detections, seconds) in zip(image_paths, results):
+        confidences = [confidence for _, _, confidence in detections]
+        records.append(_record(path, extractor.text(detections).replace('\n', ' '), None, start, ocr={
+            "blank": False,
+            "seconds": seconds,
+            "detections": len(detections),
+            "confidence": float(np.mean(confidences)) if confidences else None,
+        }))
+    return records
 
-            elif file_type == 'docx':
-                try:
-                    text = docx2txt.process(path+file)
-                    text = text.replace('\n', ' ')
-                except Exception as e:
-                    print(f"Error processing DOCX {file}: {e}")
 
-            elif file_type == 'pdf':
+def extract_pdf_pages(path: str, start: int, stop: int, page_count: int, timeout: float = EXTRACT_TIMEOUT,
+                      detect_lang: bool = True) -> list:
+    """
+    Extract pages `start` to `stop` (0-based, exclusive) of a PDF into one record per page.
+
+    Records carry the `page` number counted from 1 and, as `bytes`, the page's
+    share of the file size. A page that fails gets an error record and the
+    rest of the range continues; the timeout applies to the whole range.
+
+    Args:
+        page_count(int): Pages in the whole file
+        detect_lang(bool): Detect the language of every page; without it `lang` is None
+    """
+    share = os.path.getsize(path) / page_count
+    records = []
+    range_start = time.perf_counter()
+    try:
+        with _time_limit(timeout):
+            for number, page in EXTRACTORS["pdf"].pages(path, start, stop):
+                page_start = time.perf_counter()
                 try:
-                    pdf = PdfReader(path + file)
-                    for page in pdf.pages:
-                        text += page.extract_text() or ''
-                    text = text.replace('\n', ' ')
+                    text, error = (page.extract_text() or '').replace('\n', ' '), None
+                except ExtractionTimeout:
+                    raise
                 except Exception as e:
-                    print(f"Error processing PDF {file}: {e}")
+                    text, error = "", f"{type(e).__name__}: {e}"
+                records.append(_record(path, text, error, page_start, detect_lang, page=number, bytes=share))
+    except Exception as e:
+        error = f"timed out after {timeout} s" if isinstance(e, ExtractionTimeout) else f"{type(e).__name__}: {e}"
+        records.extend(_record(path, "", error, range_start, detect_lang, page=number, bytes=share)
+                       for number in range(start + len(records) + 1, stop + 1))
+    return records
 
-            elif file_type == 'txt' or file_type == 'md':
-                try:
-                    with open(path + file, encoding='utf-8') as txt:
-                        text = txt.read().replace('\n', ' ')
-                except UnicodeDecodeError:
-                    print(f"Could not decode {file} with UTF-8.")
 
-            elif file_type in ['jpg', 'jpeg', 'png']:
-                try:
-                    img = cv2.imread(path+file)
-                    text_detections = reader.readtext(img)
-                    threshold = 0.25
+def _merge_pages(records: list) -> dict:
+    """Join the page records of one PDF, in page order, into its document record."""
+    text = "".join(record["content"] for record in records)
+    errors = [f"page {record['page']}: {record['error']}" for record in records if record["error"]]
+    merged = {key: value for key, value in records[0].items() if key != "page"}
+    merged.update(
+        lang=get_lang(text),
+        content=text,
+        error=f"{len(errors)} of {len(records)} pages failed, {errors[0]}" if errors else None,
+        seconds=sum(record["seconds"] for record in records),
+        bytes=round(sum(record["bytes"] for record in records)),
+    )
+    return merged
 
-                    for texts in text_detections:
-                        if texts[2] > threshold:
-                            text+= texts[1] + " "
 
-                    text = text.replace('\n', ' ')
-                    
-                except Exception as e:
-                    print(f"Error processing img {file}: {e}")
+def _page_count(path: str) -> int:
+    try:
+        return EXTRACTORS["pdf"].page_count(path)
+    except Exception:  # extract_file reports the error
+        return 0
 
-            else:
-                print(f"Unsupported file type: {file}")
 
-            lang = get_lang(text)
-            writer.writerow([file, lang, file_type,text])
+def _tasks(paths: list, ocr_batch_size: int, pdf_pages_per_task: int = PDF_PAGES_PER_TASK) -> list:
+    """
+    Split paths into pool tasks of (paths, pages).
+
+    Images go in batches of up to `ocr_batch_size`, PDFs in ranges of
+    `pdf_pages_per_task` pages with pages = (start, stop, page count), every
+    other file (and a PDF whose pages can't be counted) alone with pages = None.
+    """
+    tasks, images = [], []
+    for path in paths:
+        extractor = EXTRACTORS.get(get_file_type(path))
+        if isinstance(extractor, ImageExtractor):
+            images.append(path)
+            if len(images) == ocr_batch_size:
+                tasks.append((images, None))
+                images = []
+        elif isinstance(extractor, PdfExtractor) and (count := _page_count(path)):
+            tasks.extend(([path], (start, min(start + pdf_pages_per_task, count), count))
+                         for start in range(0, count, pdf_pages_per_task))
+        else:
+            tasks.append(([path], None))
+    if images:
+        tasks.append((images, None))
+    return tasks
+
+
+def _run_task(task: tuple, timeout: float, ocr_max_dimension: int, detect_page_lang: bool) -> list:
+    paths, pages = task
+    if pages is not None:
+        return extract_pdf_pages(paths[0], *pages, timeout=timeout, detect_lang=detect_page_lang)
+    if isinstance(EXTRACTORS.get(get_file_type(paths[0])), ImageExtractor):
+        return extract_images(paths, timeout, ocr_max_dimension)
+    return [extract_file(paths[0], timeout)]
+
+
+def _by_path(records: list) -> dict:
+    grouped = {}
+    for record in records:
+        grouped.setdefault(record["path"], []).append(record)
+    return grouped
+
+
+class Progress:
+    """Counts finished records (files, or pages with `unit="records"`) and prints throughput every `interval` seconds."""
+
+    def __init__(self, total: int, interval: float = 5.0, unit: str = "files"):
+        self.total = total
+        self.interval = interval
+        self.unit = unit
+        self.done = 0
+        self.bytes = 0
+        self.errors = Counter()
+        self.seconds_by_type = Counter()
+        self.files_by_type = Counter()
+        self.ocr_seconds = []
+        self.ocr_confidences = []
+        self.blank_images = 0
+        self.start = self.last_print = time.perf_counter()
+
+    def update(self, record: dict):
+        self.done += 1
+        self.bytes += record["bytes"]
+        self.files_by_type[record["file_type"]] += 1
+        self.seconds_by_type[record["file_type"]] += record["seconds"]
+        if record["error"]:
+            self.errors[record["file_type"]] += 1
+        ocr = record.get("ocr")
+        if ocr and ocr["blank"]:
+            self.blank_images += 1
+        elif ocr:
+            self.ocr_seconds.append(ocr["seconds"])
+            if ocr["confidence"] is not None:
+                self.ocr_confidences.append(ocr["confidence"])
+        now = time.perf_counter()
+        if now - self.last_print >= self.interval or self.done == self.total:
+            self.last_print = now
+            elapsed = now - self.start
+            print(f"{self.done}/{self.total} {self.unit}, {self.done / elapsed:.1f} {self.unit}/s, "
+                  f"{self.bytes / 2**20 / elapsed:.1f} MB/s, {sum(self.errors.values())} errors")
+
+    def report(self) -> dict:
+        elapsed = time.perf_counter() - self.start
+        report = {
+            self.unit: self.done,
+            "seconds": round(elapsed, 2),
+            f"{self.unit}_per_sec": round(self.done / elapsed, 2) if elapsed else None,
+            "mb_per_sec": round(self.bytes / 2**20 / elapsed, 2) if elapsed else None,
+            "errors": dict(self.errors),
+            "mean_seconds_by_type": {
+                file_type: round(self.seconds_by_type[file_type] / count, 3)
+                for file_type, count in self.files_by_type.items()
+            },
+        }
+        if self.ocr_seconds or self.blank_images:
+            report["ocr"] = {
+                "images": len(self.ocr_seconds),
+                "blank_skipped": self.blank_images,
+                "p50_seconds": round(float(np.percentile(self.ocr_seconds, 50)), 3) if self.ocr_seconds else None,
+                "p95_seconds": round(float(np.percentile(self.ocr_seconds, 95)), 3) if self.ocr_seconds else None,
+                "mean_confidence": round(float(np.mean(self.ocr_confidences)), 3) if self.ocr_confidences else None,
+            }
+        return report
+
+
+def extract_files(paths: list, workers: int | None = None, timeout: float = EXTRACT_TIMEOUT,
+                  ordered: bool = True, progress: Progress | None = None, ocr_batch_size: int = OCR_BATCH_SIZE,
+                  ocr_max_dimension: int = OCR_MAX_DIMENSION, pages: bool = False,
+                  pdf_pages_per_task: int = PDF_PAGES_PER_TASK):
+    """
+    Extract `paths` in a process pool and yield one record per file, or per PDF page with `pages`.
+
+    At most `TASKS_PER_WORKER` tasks per worker are queued or waiting to be
+    yielded, so memory doesn't grow with the size of the input.
+
+    Args:
+        paths(list): Files to extract
+        workers(int): Pool size, defaults to the CPU count; 1 extracts in this process
+        timeout(float): Per-file timeout in seconds, per range for PDFs
+        ordered(bool): Yield in the order of `paths` (and pages) instead of as tasks complete
+        progress(Progress): Updated with every record; its total is set to the number of records
+        ocr_batch_size(int): Images OCRed together in one task
+        ocr_max_dimension(int): Longest image side before OCR
+        pages(bool): Yield a record per PDF page, with its `page` number (1 for other files)
+        pdf_pages_per_task(int): Pages of a PDF extracted in one task
+    """
+    if not paths:
+        return
+    workers = workers or os.cpu_count() or 1
+    ocr = any(isinstance(EXTRACTORS.get(get_file_type(path)), ImageExtractor) for path in paths)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    tasks = _tasks(paths, ocr_batch_size, pdf_pages_per_task)
+    tasks_of = {}
+    for i, (task_paths, _) in enumerate(tasks):
+        for path in task_paths:
+            tasks_of.setdefault(path, []).append(i)
+    if progress is not None and pages:
+        progress.total = sum(len(task_paths) if task_pages is None else task_pages[1] - task_pages[0]
+                             for task_paths, task_pages in tasks)
+
+    def finished(record):
+        if record["error"]:
+            print(f"Error processing {record['file_type']} {record['name']}: {record['error']}")
+        if progress is not None:
+            progress.update(record)
+        return record
+
+    remaining = {path: len(indices) for path, indices in tasks_of.items()}
+    split = {}  # page records of PDFs with tasks still running, joined once all are in
+
+    def emit(path, records):
+        # The records one task produced for `path`
+        remaining[path] -= 1
+        if pages:
+            for record in records:
+                record.setdefault("page", 1)
+                yield finished(record)
+        elif "page" in records[0]:
+            split.setdefault(path, []).extend(records)
+            if not remaining[path]:
+                yield finished(_merge_pages(sorted(split.pop(path), key=lambda record: record["page"])))
+        else:
+            yield from map(finished, records)
+
+    def in_order(run):
+        # Wait for the tasks of the next path, keep the rest of an image batch for later
+        results = {}
+        for path in paths:
+            for i in tasks_of[path]:
+                if i not in results:
+                    results[i] = _by_path(run(i))
+                yield from emit(path, results[i].pop(path))
+                if not results[i]:
+                    del results[i]
+
+    if workers == 1:
+        init_worker(ocr, threads)
+        run = lambda i: _run_task(tasks[i], timeout, ocr_max_dimension, pages)
+        if ordered:
+            yield from in_order(run)
+        else:
+            for i in range(len(tasks)):
+                for path, records in _by_path(run(i)).items():
+                    yield from emit(path, records)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(ocr, threads)) as pool:
+        futures = {}
+        next_task = 0
+
+        def submit(until=-1):
+            # Fill the window; `until` forces submitting up to that task, which in_order is waiting for
+            nonlocal next_task
+            while next_task < len(tasks) and (next_task <= until or len(futures) < workers * TASKS_PER_WORKER):
+                futures[next_task] = pool.submit(_run_task, tasks[next_task], timeout, ocr_max_dimension, pages)
+                next_task += 1
+
+        if ordered:
+            def run(i):
+                submit(i)
+                records = futures.pop(i).result()
+                submit()
+                return records
+            yield from in_order(run)
+        else:
+            submit()
+            while futures:
+                done, _ = wait(futures.values(), return_when=FIRST_COMPLETED)
+                for i in [i for i, future in futures.items() if future in done]:
+                    for path, records in _by_path(futures.pop(i).result()).items():
+                        yield from emit(path, records)
+                submit()
+
+
+def record_version(file_type: str) -> str:
+    """Version of the record a file of `file_type` gets; a cached record with another version is stale."""
+    extractor = EXTRACTORS.get(file_type)
+    if extractor is None:
+        return f"{RECORD_VERSION}:none"
+    return f"{RECORD_VERSION}:{type(extractor).__name__}:{extractor.version}"
+
+
+def file_sha256(path: str, block_size: int = 2**20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    SQLite store of extraction records, one row per file.
+
+    Args:
+        path(str): Database file, created if missing
+    """
+    RECORD_FIELDS = ("name", "lang", "file_type", "content", "error")
+
+    def __init__(self, path: str):
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS records (
+                key TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT, version TEXT,
+                name TEXT, lang TEXT, file_type TEXT, content TEXT, error TEXT
+            )""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS records_sha256 ON records (sha256, version)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.db.commit()
+        self.db.close()
+
+    def lookup(self, key: str) -> sqlite3.Row | None:
+        return self.db.execute("SELECT * FROM records WHERE key = ?", (key,)).fetchone()
+
+    def find_by_hash(self, sha256: str, version: str) -> sqlite3.Row | None:
+        """A record of identical content, e.g. of a renamed or copied file."""
+        return self.db.execute(
+            "SELECT * FROM records WHERE sha256 = ? AND version = ? LIMIT 1", (sha256, version)).fetchone()
+
+    def put(self, key: str, size: int, mtime_ns: int, sha256: str, version: str, record):
+        self.db.execute(
+            "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, size, mtime_ns, sha256, version, *(record[field] for field in self.RECORD_FIELDS)))
+
+    def touch(self, key: str, mtime_ns: int):
+        """Record a new mtime for a file whose content did not change."""
+        self.db.execute("UPDATE records SET mtime_ns = ? WHERE key = ?", (mtime_ns, key))
+
+    def prune(self, keys: set) -> int:
+        """Delete records of files not in `keys`; return how many were deleted."""
+        stale = [row["key"] for row in self.db.execute("SELECT key FROM records") if row["key"] not in keys]
+        self.db.executemany("DELETE FROM records WHERE key = ?", ((key,) for key in stale))
+        return len(stale)
+
+    def records(self):
+        """All records ordered by path, in the shape of `extract_file`'s output."""
+        fields = ", ".join(self.RECORD_FIELDS)
+        for row in self.db.execute(f"SELECT {fields} FROM records ORDER BY key"):
+            yield dict(row)
+
+
+def extract_incremental(input_dir: str, paths: list, cache: ExtractionCache, workers: int | None = None,
+                        timeout: float = EXTRACT_TIMEOUT, retry_errors: bool = False,
+                        progress_interval: float = 5.0, **options) -> dict:
+    """
+    Bring `cache` up to date with `paths` and return counts of what was done.
+
+    A file is unchanged if its size and mtime match the cached record (no
+    hashing); if only the mtime differs, its sha256 decides. New and modified
+    files are hashed first so that renamed or copied files reuse the record of
+    identical content. Everything else is extracted in the process pool.
+    Records of files no longer in `paths` are pruned.
+
+    Args:
+        retry_errors(bool): Extract files again whose cached record has an error (e.g. a timeout)
+        options: ocr_batch_size, ocr_max_dimension and pdf_pages_per_task for `extract_files`
+    """
+    stats = Counter()
+    keys = set()
+    pending = {}
+    for path in paths:
+        key = os.path.relpath(path, input_dir).replace(os.sep, "/")
+        keys.add(key)
+        stat = os.stat(path)
+        version = record_version(get_file_type(path))
+        row = cache.lookup(key)
+        usable = row is not None and row["version"] == version and not (retry_errors and row["error"])
+        if usable and row["size"] == stat.st_size:
+            if row["mtime_ns"] == stat.st_mtime_ns:
+                stats["unchanged"] += 1
+                continue
+            if file_sha256(path) == row["sha256"]:
+                cache.touch(key, stat.st_mtime_ns)
+                stats["unchanged"] += 1
+                continue
+        sha256 = file_sha256(path)
+        same_content = cache.find_by_hash(sha256, version)
+        if same_content is not None and not (retry_errors and same_content["error"]):
+            cache.put(key, stat.st_size, stat.st_mtime_ns, sha256, version,
+                      {**dict(same_content), "name": os.path.basename(path)})
+            stats["reused"] += 1
+            continue
+        pending[path] = (key, stat.st_size, stat.st_mtime_ns, sha256, version)
+
+    progress = Progress(len(pending), progress_interval)
+    for record in extract_files(list(pending), workers, timeout, ordered=False, progress=progress, **options):
+        cache.put(*pending[record["path"]], record)
+        stats["extracted"] += 1
+        if stats["extracted"] % 100 == 0:
+            cache.db.commit()  # keep finished work if the run is interrupted
+    stats["pruned"] = cache.prune(keys)
+    cache.db.commit()
+    return {**stats, "extraction": progress.report()}
+
+
+def write_csv(records, filename: str, columns: list = CSV_COLUMNS) -> int:
+    """Write records to the dataset CSV as they come; return the number of rows."""
+    rows = 0
+    with open(filename, "w", newline='', encoding="utf-8") as dataset:
+        writer = csv.writer(dataset)
+        writer.writerow(columns)
+        for record in records:
+            writer.writerow([record[column] for column in columns])
+            rows += 1
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", default="dataset/", help="Directory of files to extract")
+    parser.add_argument("--output", help="Defaults to supervisor-dataset-new.csv, or supervisor-dataset-pages.csv with --pages")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Extraction processes, 1 to run in-process")
+    parser.add_argument("--timeout", type=float, default=EXTRACT_TIMEOUT, help="Seconds per file")
+    parser.add_argument("--unordered", action="store_true", help="Write rows as files complete (without --cache only)")
+    parser.add_argument("--cache", default=".extraction_cache.sqlite", help="Extraction cache database")
+    parser.add_argument("--no-cache", action="store_true", help="Extract every file and don't touch the cache")
+    parser.add_argument("--retry-errors", action="store_true", help="Extract files again whose cached record failed")
+    parser.add_argument("--ocr-batch-size", type=int, default=OCR_BATCH_SIZE, help="Images OCRed together")
+    parser.add_argument("--ocr-max-dim", type=int, default=OCR_MAX_DIMENSION, help="Longest image side before OCR")
+    parser.add_argument("--pages", action="store_true", help="One row per PDF page (name, page, lang, file_type, "
+                                                             "content), streamed without the cache")
+    parser.add_argument("--pdf-pages-per-task", type=int, default=PDF_PAGES_PER_TASK, help="PDF pages per pool task")
+    args = parser.parse_args()
+    options = {"ocr_batch_size": args.ocr_batch_size, "ocr_max_dimension": args.ocr_max_dim,
+               "pdf_pages_per_task": args.pdf_pages_per_task}
+    output = args.output or ("supervisor-dataset-pages.csv" if args.pages else "supervisor-dataset-new.csv")
+
+    paths = [os.path.join(args.input, file) for file in sorted(os.listdir(args.input))
+             if os.path.isfile(os.path.join(args.input, file))]
+    if args.pages:
+        progress = Progress(len(paths), unit="records")
+        write_csv(extract_files(paths, args.workers, args.timeout, not args.unordered, progress, pages=True, **options),
+                  output, PAGE_CSV_COLUMNS)
+        print(json.dumps(progress.report(), indent=2))
+    elif args.no_cache:
+        progress = Progress(len(paths))
+        write_csv(extract_files(paths, args.workers, args.timeout, not args.unordered, progress, **options), output)
+        print(json.dumps(progress.report(), indent=2))
+    else:
+        with ExtractionCache(args.cache) as cache:
+            report = extract_incremental(args.input, paths, cache, args.workers, args.timeout, args.retry_errors,
+                                         **options)
+            report["rows"] = write_csv(cache.records(), output)
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,112 @@
+"""Compact serialization of search results for the recommendation endpoints.
+
+Every result keeps the shape the frontend reads,
+
+    {"object": {"uuid": str, "properties": {...}}, "combined_score": float, "vote_used": bool[, "chunk": str]}
+
+but `properties` only holds the requested fields instead of every property
+of the Weaviate object, and `snippet` replaces the full `content` body with a
+short window around the query terms. orjson is used when installed.
+"""
+import json
+import re
+from os import getenv
+from fastapi import Response
+import metrics
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to the standard library
+    orjson = None
+
+# Fields returned when the request does not ask for any; what the result cards show
+DEFAULT_FIELDS = ("name", "url", "file_type", "language", "upvote", "downvote", "snippet")
+ALLOWED_FIELDS = DEFAULT_FIELDS + ("content", "last_interaction")
+SNIPPET_CHARS = int(getenv("SNIPPET_CHARS", 240))
+TERM_PATTERN = re.compile(r"\w+")
+
+
+def parse_fields(fields: str | None) -> tuple:
+    """
+    Parse a `fields=name,url,...` selection.
+
+    Raise:
+        ValueError: If a field is not in ALLOWED_FIELDS
+    """
+    if not fields:
+        return DEFAULT_FIELDS
+    selected = tuple(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    unknown = [field for field in selected if field not in ALLOWED_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(ALLOWED_FIELDS)}")
+    return selected or DEFAULT_FIELDS
+
+
+def snippet(content: str | None, query: str, max_chars: int = SNIPPET_CHARS) -> str:
+    """
+    Cut a window of at most `max_chars` around the first query term found in `content`.
+
+    Falls back to the start of the content if no term occurs. Terms are runs of
+    word characters, so a Chinese query without spaces is matched as a whole.
+    """
+    if not content:
+        return ""
+    if len(content) <= max_chars:
+        return content
+    lowered = content.lower()
+    position = -1
+    # Longest terms first: they are the most specific
+    for term in sorted(TERM_PATTERN.findall(query.lower()), key=len, reverse=True):
+        position = lowered.find(term)
+        if position >= 0:
+            break
+    start = max(0, position - max_chars // 3) if position >= 0 else 0
+    end = min(len(content), start + max_chars)
+    start = max(0, end - max_chars)
+    # Don't cut words in half in whitespace-separated text
+    if start > 0:
+        space = content.find(" ", start, start + 20)
+        start = space + 1 if space >= 0 else start
+    if end < len(content):
+        space = content.rfind(" ", end - 20, end)
+        end = space if space > start else end
+    return ("…" if start > 0 else "") + content[start:end].strip() + ("…" if end < len(content) else "")
+
+
+def serialize_result(result: dict, fields: tuple = DEFAULT_FIELDS, query: str = "") -> dict:
+    """Project one `Database.search` result to the requested fields."""
+    obj = result["object"]
+    properties = {}
+    for field in fields:
+        if field == "snippet":
+            properties["snippet"] = snippet(obj.properties.get("content"), query)
+        else:
+            properties[field] = obj.properties.get(field)
+    serialized = {
+        "object": {"uuid": str(obj.uuid), "properties": properties},
+        "combined_score": float(result["combined_score"]),
+        "vote_used": result["vote_used"],
+    }
+    if "chunk" in result:
+        serialized["chunk"] = result["chunk"]
+    return serialized
+
+
+def serialize_results(results: list, fields: tuple = DEFAULT_FIELDS, query: str = "") -> list:
+    return [serialize_result(result, fields, query) for result in results]
+
+
+def dumps(content) -> bytes:
+    """Encode to JSON bytes with orjson if available, compact `json` otherwise."""
+    if orjson is not None:
+        return orjson.dumps(content, default=str, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """JSONResponse using `dumps`; skips FastAPI's jsonable_encoder when returned directly."""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        with metrics.span("serialize"):
+            return dumps(content)
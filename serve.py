@@ -0,0 +1,124 @@
+"""Preforking launcher: load the encoder once, then fork N uvicorn workers that share it.
+
+The parent process loads the model weights before forking, so workers share
+those pages copy-on-write instead of each loading its own copy. `gc.freeze()` keeps the
+garbage collector from touching, and thereby copying, the shared objects.
+Each worker gets `cpu_count // workers` torch threads to avoid
+oversubscribing the CPU.
+
+The parent deliberately does not run inference: OpenMP thread pools and CUDA
+contexts do not survive fork, so warm-up happens in each worker's lifespan.
+On CUDA machines the model is not preloaded and every worker loads its own.
+
+Usage:
+    python serve.py --workers 4 --port 1234
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+
+
+def configure_threads(threads: int):
+    """Limit intra-op threads; must run before torch is imported to affect OpenMP/MKL."""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ.setdefault(var, str(threads))
+    # HF fast tokenizers warn and disable parallelism after fork anyway
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+
+def preload(app_module):
+    """Load shared, read-only state in the parent before forking."""
+    import torch
+    if torch.cuda.is_available():
+        print("CUDA available: skipping model preload, each worker loads its own copy")
+    else:
+        app_module.load_model().eval()
+    gc.collect()
+    gc.freeze()
+
+
+def _run_worker(app, sock: socket.socket, threads: int, log_level: str):
+    import uvicorn
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+    server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+    server.run(sockets=[sock])
+
+
+def serve(app, host: str = "0.0.0.0", port: int = 1234, workers: int = 2, threads: int | None = None,
+          log_level: str = "info"):
+    """
+    Bind once and fork `workers` processes that accept on the shared socket.
+
+    Crashed workers are replaced until the launcher receives SIGINT or SIGTERM,
+    which is forwarded to all workers.
+    """
+    if not hasattr(os, "fork"):
+        raise RuntimeError("Preforking needs os.fork; use `uvicorn app:app` on this platform")
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                _run_worker(app, sock, threads, log_level)
+            finally:
+                os._exit(0)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    print(f"Launcher {os.getpid()} serving on {host}:{port} with {workers} workers x {threads} torch threads")
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            print(f"Worker {pid} exited with status {status}, restarting")
+            spawn()
+    sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads", type=int, help="torch threads per worker, default cpu_count // workers")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    configure_threads(args.threads or max(1, (os.cpu_count() or 1) // args.workers))
+    from dotenv import load_dotenv
+    load_dotenv(dotenv_path=".env")
+    import app as app_module
+    preload(app_module)
+    serve(app_module.app, args.host, args.port, args.workers, args.threads, args.log_level)
@@ -0,0 +1,121 @@
+"""In-memory cache of the frontend's static files.
+
+All files under the static directory are read once (at startup), each with
+a content-hash ETag and precompressed gzip and, if the `brotli` package is
+installed, brotli variants. Each encoding is sent with its own ETag (the hash
+plus "-gzip" / "-br"), a strong validator names exactly one representation. Requests are answered from memory with
+`Cache-Control`, `Vary: Accept-Encoding` and `304 Not Modified` for a
+matching `If-None-Match`. Changes on disk are picked up on restart.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+from dataclasses import dataclass
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+MIN_COMPRESS_BYTES = 256  # smaller bodies don't gain from compression
+# HTML is revalidated on every load (a cheap 304) so pages never go stale; other assets are cached for a while
+HTML_CACHE_CONTROL = "no-cache"
+ASSET_CACHE_CONTROL = f"public, max-age={int(os.getenv('STATIC_MAX_AGE', 3600))}"
+
+
+@dataclass
+class StaticAsset:
+    body: bytes
+    media_type: str
+    etag: str
+    cache_control: str
+    gzip: bytes | None = None
+    br: bytes | None = None
+
+
+def _compress(body: bytes, media_type: str):
+    if len(body) < MIN_COMPRESS_BYTES or not media_type.startswith(COMPRESSIBLE_TYPES):
+        return None, None
+    gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+    gzipped = gzipped if len(gzipped) < len(body) else None
+    compressed = brotli.compress(body, quality=11) if brotli is not None else None
+    compressed = compressed if compressed is not None and len(compressed) < len(body) else None
+    return gzipped, compressed
+
+
+def _accepted_encodings(header: str) -> set:
+    """Codings from an Accept-Encoding header, minus those with q=0."""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticCache:
+    """
+    Serves the files of `directory` from memory.
+
+    Args:
+        directory(str): Root of the static files, keys are paths relative to it with "/" separators
+    """
+
+    def __init__(self, directory: str = "static"):
+        self.directory = directory
+        self.assets = {}
+        self.loaded = False
+
+    def load(self) -> int:
+        """Read, hash and compress every file; return the number of bytes cached."""
+        assets = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                with open(path, "rb") as f:
+                    body = f.read()
+                media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                if media_type.startswith("text/"):
+                    media_type += "; charset=utf-8"
+                gzipped, compressed = _compress(body, media_type)
+                key = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                assets[key] = StaticAsset(
+                    body=body,
+                    media_type=media_type,
+                    etag=f'"{hashlib.sha256(body).hexdigest()[:16]}"',
+                    cache_control=HTML_CACHE_CONTROL if media_type.startswith("text/html") else ASSET_CACHE_CONTROL,
+                    gzip=gzipped,
+                    br=compressed,
+                )
+        self.assets = assets
+        self.loaded = True
+        return sum(len(a.body) + len(a.gzip or b"") + len(a.br or b"") for a in assets.values())
+
+    def response(self, request: Request, path: str) -> Response:
+        """Response for `path` in the best accepted encoding: 404 if unknown, 304 if the client has that encoding's ETag."""
+        if not self.loaded:
+            self.load()
+        asset = self.assets.get(path.lstrip("/"))
+        if asset is None:
+            return Response("File not found", status_code=404, media_type="text/plain")
+
+        body, encoding = asset.body, None
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        if asset.br is not None and "br" in accepted:
+            body, encoding = asset.br, "br"
+        elif asset.gzip is not None and "gzip" in accepted:
+            body, encoding = asset.gzip, "gzip"
+        etag = asset.etag if encoding is None else f'{asset.etag[:-1]}-{encoding}"'
+
+        headers = {"ETag": etag, "Cache-Control": asset.cache_control, "Vary": "Accept-Encoding"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or etag in
+                              (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))):
+            return Response(status_code=304, headers=headers)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return Response(body, media_type=asset.media_type, headers=headers)
@@ -0,0 +1,90 @@
+"""Recall@10 vs QPS of the IVF-PQ index against exact search.
+
+Usage:
+    python testing/benchmark_ann.py                       # synthetic clustered vectors
+    python testing/benchmark_ann.py --parquet Embeddings.parquet
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ann_index import FlatIndex, IVFPQIndex, normalize
+
+
+def synthetic_vectors(n: int, dim: int, n_topics: int = 200, seed: int = 0) -> np.ndarray:
+    """Clustered vectors, closer to real topic-structured embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    labels = rng.integers(0, n_topics, n)
+    return normalize(topics[labels] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32))
+
+
+def run(vectors: np.ndarray, n_queries: int, k: int, n_lists: int, n_subquantizers: int, nprobes: list, refine: int):
+    rng = np.random.default_rng(1)
+    query_rows = rng.choice(len(vectors), n_queries, replace=False)
+    queries = normalize(vectors[query_rows] + 0.1 * rng.standard_normal((n_queries, vectors.shape[1])).astype(np.float32))
+    ids = np.arange(len(vectors))
+
+    exact = FlatIndex()
+    exact.add(vectors, ids)
+    start = time.perf_counter()
+    truth = [set(exact.search(q, k)[0].tolist()) for q in queries]
+    exact_qps = n_queries / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    index = IVFPQIndex(n_lists, n_subquantizers)
+    index.train(vectors)
+    index.add(vectors, ids)
+    build_seconds = time.perf_counter() - start
+
+    rows = [{"method": "exact", "recall@%d" % k: 1.0, "qps": round(exact_qps, 1)}]
+    for nprobe in nprobes:
+        start = time.perf_counter()
+        found = [index.search(q, k, nprobe=nprobe, refine=refine)[0] for q in queries]
+        qps = n_queries / (time.perf_counter() - start)
+        recall = np.mean([len(truth[i].intersection(f.tolist())) / k for i, f in enumerate(found)])
+        rows.append({"method": f"ivfpq nprobe={nprobe}", "recall@%d" % k: round(float(recall), 4), "qps": round(qps, 1)})
+
+    return {
+        "n_vectors": len(vectors),
+        "dim": int(vectors.shape[1]),
+        "n_lists": index.n_lists,
+        "n_subquantizers": n_subquantizers,
+        "refine": refine,
+        "build_seconds": round(build_seconds, 2),
+        "results": rows,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--parquet", help="Use embeddings from this parquet file instead of synthetic data")
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-lists", type=int, default=1024)
+    parser.add_argument("--subquantizers", type=int, default=16)
+    parser.add_argument("--refine", type=int, default=4)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    parser.add_argument("--out", default="testing/results/benchmark_ann.json")
+    args = parser.parse_args()
+
+    if args.parquet:
+        import pandas as pd
+        embeddings = pd.read_parquet(args.parquet, columns=["embeddings"])["embeddings"]
+        vectors = normalize(np.vstack(embeddings.to_numpy()))
+    else:
+        vectors = synthetic_vectors(args.n, args.dim)
+
+    report = run(vectors, args.queries, args.k, args.n_lists, args.subquantizers, args.nprobe, args.refine)
+    for row in report["results"]:
+        print(row)
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved report to {args.out}")
@@ -0,0 +1,80 @@
+"""Import-time budget for the web tier, based on `python -X importtime`.
+
+Imports a module in a fresh interpreter, reports the slowest top-level
+packages and fails (exit code 1) if the total exceeds the budget or if a
+module that should load lazily (torch, sentence_transformers, pandas) was
+imported.
+
+Usage:
+    python testing/benchmark_imports.py                 # checks `import app`
+    python testing/benchmark_imports.py --budget-ms 1500
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAZY_MODULES = ("torch", "sentence_transformers", "pandas")
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def measure(module: str) -> list:
+    """Return (self_us, cumulative_us, depth, name) for every module imported by `import module`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((int(self_us), int(cumulative_us), len(indent) // 2, name))
+    return rows
+
+
+def report(module: str, budget_ms: float, top: int = 15) -> dict:
+    rows = measure(module)
+    total_ms = next(cumulative for _, cumulative, depth, name in rows if name == module and depth == 0) / 1000
+    per_package = defaultdict(int)
+    for self_us, _, _, name in rows:
+        per_package[name.split(".")[0]] += self_us
+    imported = {name for _, _, _, name in rows}
+    eager = [name for name in LAZY_MODULES if name in imported]
+    return {
+        "module": module,
+        "total_ms": round(total_ms, 1),
+        "budget_ms": budget_ms,
+        "modules_imported": len(rows),
+        "eager_heavy_modules": eager,
+        "top_packages_ms": {
+            package: round(us / 1000, 1)
+            for package, us in sorted(per_package.items(), key=lambda x: x[1], reverse=True)[:top]
+        },
+        "passed": total_ms <= budget_ms and not eager,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--budget-ms", type=float, default=2500.0, help="Maximum cumulative import time")
+    parser.add_argument("--out", default="testing/results/benchmark_imports.json")
+    args = parser.parse_args()
+
+    result = report(args.module, args.budget_ms)
+    print(json.dumps(result, indent=2))
+    out = os.path.join(ROOT, args.out)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    if result["eager_heavy_modules"]:
+        print(f"FAIL: {', '.join(result['eager_heavy_modules'])} imported eagerly by {args.module}")
+    if result["total_ms"] > args.budget_ms:
+        print(f"FAIL: import {args.module} took {result['total_ms']} ms, budget {args.budget_ms} ms")
+    sys.exit(0 if result["passed"] else 1)
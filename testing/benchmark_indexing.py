@@ -0,0 +1,162 @@
+"""Offline benchmark of the indexing pipeline: Preprocess.py and Database.ingest_data.
+
+Generates a synthetic scraped corpus (configurable size and en / zh-cn mix),
+then times each phase with a stub encoder (no model download) and a local
+stand-in collection for Weaviate:
+
+    preprocess -> tokenize -> encode -> average -> parquet write -> parquet read -> ingest
+
+Reports wall time, peak RSS and items/sec per phase as JSON.
+
+Usage:
+    python testing/benchmark_indexing.py --documents 2000 --zh-ratio 0.3
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_backend import FakeCollection, FakeEncoder, WORDS
+
+ZH_PHRASES = ("张量", "模型", "训练", "数据集", "神经网络", "梯度", "函数", "教程", "服务器", "向量", "索引", "查询")
+
+
+def synthetic_corpus(n: int, zh_ratio: float, mean_words: int, seed: int = 0) -> pd.DataFrame:
+    """A scraped-style frame (title, url, content, timestamp) with lognormal document lengths."""
+    rng = np.random.default_rng(seed)
+    lengths = np.clip(rng.lognormal(np.log(mean_words), 0.8, n).astype(int), 5, 20 * mean_words)
+    is_zh = rng.random(n) < zh_ratio
+    rows = []
+    for i in range(n):
+        if is_zh[i]:
+            content = "".join(rng.choice(ZH_PHRASES, lengths[i]))
+        else:
+            content = " ".join(rng.choice(WORDS, lengths[i]))
+        rows.append({
+            "title": f"Document {i}",
+            "url": f"https://example.com/{i}",
+            "content": content,
+            "timestamp": "2025-01-01 00:00:00",
+        })
+    return pd.DataFrame(rows), is_zh
+
+
+class RssSampler:
+    """Samples resident set size in a background thread to find the peak within a phase."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def _rss(self) -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * self._page_size
+        except OSError:
+            # Not Linux: fall back to the process-wide high-water mark (KiB on Linux, bytes on macOS)
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._rss())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.peak = self._rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._rss())
+
+
+class Phases:
+    def __init__(self):
+        self.rows = []
+
+    def run(self, name: str, items: int, func, *args, **kwargs):
+        with RssSampler() as rss:
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+        self.rows.append({
+            "phase": name,
+            "seconds": round(elapsed, 3),
+            "peak_rss_mb": round(rss.peak / 2**20, 1),
+            "items": items,
+            "items_per_sec": round(items / elapsed, 1) if elapsed else None,
+        })
+        print(self.rows[-1])
+        return result
+
+
+def run(args) -> dict:
+    import Preprocess
+    from weaviate_db import Database
+
+    Preprocess._model = FakeEncoder(dim=args.dim)  # used by load_model_once instead of downloading weights
+    corpus, is_zh = synthetic_corpus(args.documents, args.zh_ratio, args.mean_words)
+    phases = Phases()
+
+    async def preprocess():
+        parts = await asyncio.gather(
+            Preprocess.preprocess_dataframe(corpus[~is_zh], ["timestamp"]),
+            Preprocess.preprocess_dataframe(corpus[is_zh], ["timestamp"], "zh-cn"),
+        )
+        return pd.concat(parts)
+
+    df = phases.run("preprocess_dataframe", len(corpus), asyncio.run, preprocess())
+    chunk_texts, content_indices, _ = phases.run("tokenize", len(df), Preprocess.chunk_content, df)
+    embeddings = phases.run("encode", len(chunk_texts), Preprocess.encode_chunks, chunk_texts)
+    df["embeddings"] = phases.run("average", len(df), Preprocess.average_embeddings, embeddings, content_indices, len(df))
+    df["embeddings"] = df["embeddings"].apply(lambda x: x.tolist())
+
+    path = os.path.join(tempfile.mkdtemp(), "Embeddings.parquet")
+    phases.run("parquet_write", len(df), df.to_parquet, path, engine="pyarrow")
+    df = phases.run("parquet_read", len(df), pd.read_parquet, path)
+
+    db = Database()
+    db.embeddings = "Embeddings"
+    db.collections[db.embeddings] = FakeCollection()
+    phases.run("ingest_data", len(df), db.ingest_data, df)
+
+    return {
+        "config": vars(args),
+        "documents_after_preprocess": len(df),
+        "chunks": len(chunk_texts),
+        "parquet_mb": round(os.path.getsize(path) / 2**20, 2),
+        "phases": phases.rows,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--zh-ratio", type=float, default=0.3, help="Fraction of zh-cn documents")
+    parser.add_argument("--mean-words", type=int, default=600, help="Median document length in words/phrases")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--out", default="testing/results/benchmark_indexing.json")
+    args = parser.parse_args()
+
+    report = run(args)
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved report to {args.out}")
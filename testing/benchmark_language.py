@@ -0,0 +1,124 @@
+"""Docs/sec and accuracy of language detection on a mixed en / zh-cn corpus.
+
+Generates `--documents` documents with lognormal lengths: English prose,
+Chinese prose, Chinese tutorials with English code blocks and a few empty
+ones, then labels them with:
+
+- `baseline`: `langdetect.detect` on the full text, mapped the way Preprocess.py
+  did (everything not "en" becomes "zh-cn", empty text fails as "unknown")
+- `language`: `language.detect_languages` (sampled windows, CJK fast path,
+  seeded detector) mapped with `index_language`
+
+and reports docs/sec, accuracy against the generated labels and the share
+of documents labelled the same in two runs.
+
+Usage:
+    python testing/benchmark_language.py --documents 2000 --zh-ratio 0.4 --mean-sentences 60
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+from web_scraper.web_scraper import language
+
+EN_SENTENCES = (
+    "This tutorial explains how gradients flow backwards through every layer of the network.",
+    "A tensor is a multi-dimensional array that can live on the CPU or on a GPU.",
+    "Before training, split the dataset into training, validation and test sets.",
+    "The server caches query results so that repeated searches return immediately.",
+    "You can install the package with pip and import it in your own scripts.",
+    "Regularization keeps the model from memorizing the training examples.",
+)
+ZH_SENTENCES = (
+    "本教程介绍梯度如何在神经网络的每一层中反向传播。",
+    "张量是一个多维数组，可以存放在处理器或者显卡上。",
+    "在训练之前，需要把数据集划分为训练集、验证集和测试集。",
+    "服务器会缓存查询结果，因此重复的搜索可以立即返回。",
+    "你可以使用包管理器安装这个库，并在自己的脚本中导入它。",
+    "正则化可以防止模型死记硬背训练样本。",
+)
+CODE = "import torch\nx = torch.randn(3, 4, requires_grad=True)\ny = (x * 2).sum()\ny.backward()\nprint(x.grad)\n"
+
+
+def synthetic_corpus(n: int, zh_ratio: float, mean_sentences: int, seed: int = 0):
+    """Documents and their index language ("unknown" for the empty ones)."""
+    rng = np.random.default_rng(seed)
+    lengths = np.clip(rng.lognormal(np.log(mean_sentences), 1.0, n).astype(int), 1, 50 * mean_sentences)
+    texts, labels = [], []
+    for i in range(n):
+        kind = rng.random()
+        if kind < 0.02:
+            texts.append("")
+            labels.append("unknown")
+        elif kind < 0.02 + zh_ratio:
+            sentences = list(rng.choice(ZH_SENTENCES, lengths[i]))
+            if rng.random() < 0.5:  # a tutorial page with code blocks between the paragraphs
+                for position in range(0, len(sentences), 3):
+                    sentences.insert(position, CODE)
+            texts.append("".join(sentences))
+            labels.append("zh-cn")
+        else:
+            texts.append(" ".join(rng.choice(EN_SENTENCES, lengths[i])))
+            labels.append("en")
+    return texts, labels
+
+
+def baseline(texts: list) -> list:
+    from langdetect import detect
+    from langdetect.lang_detect_exception import LangDetectException
+    labels = []
+    for text in texts:
+        try:
+            code = detect(text)
+        except LangDetectException:
+            labels.append("unknown")
+            continue
+        labels.append("en" if code == "en" else "zh-cn")
+    return labels
+
+
+def sampled(texts: list) -> list:
+    return [code if code == language.UNKNOWN else language.index_language(code)
+            for code in language.detect_languages(texts)]
+
+
+def measure(name: str, detect, texts: list, truth: list) -> dict:
+    start = time.perf_counter()
+    labels = detect(texts)
+    elapsed = time.perf_counter() - start
+    repeat = detect(texts)
+    return {
+        "mode": name,
+        "docs_per_sec": round(len(texts) / elapsed, 1),
+        "seconds": round(elapsed, 2),
+        "accuracy": round(float(np.mean([a == b for a, b in zip(labels, truth)])), 4),
+        "deterministic": round(float(np.mean([a == b for a, b in zip(labels, repeat)])), 4),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--zh-ratio", type=float, default=0.4)
+    parser.add_argument("--mean-sentences", type=int, default=60, help="Median sentences per document")
+    parser.add_argument("--out", default="testing/results/benchmark_language.json")
+    args = parser.parse_args()
+
+    texts, truth = synthetic_corpus(args.documents, args.zh_ratio, args.mean_sentences)
+    baseline(texts[:1])  # load the profiles of both detectors before timing
+    sampled(["warm up the detector"])
+    rows = [measure("baseline", baseline, texts, truth), measure("language", sampled, texts, truth)]
+    for row in rows:
+        print(row)
+    out = os.path.join(ROOT, args.out)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"config": vars(args), "mean_chars": round(float(np.mean([len(t) for t in texts]))),
+                   "results": rows}, f, indent=2)
+    print(f"Saved report to {out}")
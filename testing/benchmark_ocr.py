@@ -0,0 +1,139 @@
+"""Throughput and accuracy of the OCR modes of read_content.py on generated text images.
+
+Renders `--images` images of random words (scanned-slide sizes up to 4000 px,
+`--blank-ratio` of them empty), then OCRs them with:
+
+- `baseline`: full-resolution color `cv2.imread` + `readtext` per image, the previous behaviour
+- `downscaled`: `ImageExtractor.load` (grayscale, downscaled), blank skip and `readtext` per image
+- `batched`: `extract_images` in batches of `--batch-size`
+
+and reports images/sec, p50/p95 latency per image, mean detection confidence
+and word recall against the rendered text. Latency in `batched` mode is each
+OCRed image's share of its batch and excludes decoding and blank images, so
+compare the modes by images/sec, which counts every input image in all modes.
+Needs easyocr and opencv.
+
+Usage:
+    python testing/benchmark_ocr.py --images 48 --batch-size 8 --max-dim 1600
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cv2
+import numpy as np
+import read_content
+from fake_backend import WORDS
+
+
+def generate_images(directory: str, n: int, blank_ratio: float, seed: int = 0) -> dict:
+    """Write PNGs of random words; return {path: words rendered}."""
+    rng = np.random.default_rng(seed)
+    truth = {}
+    for i in range(n):
+        height, width = int(rng.integers(800, 3000)), int(rng.integers(1200, 4000))
+        img = np.full((height, width, 3), int(rng.integers(225, 256)), np.uint8)
+        words = []
+        if rng.random() >= blank_ratio:
+            scale = width / 1200
+            for line in range(int(rng.integers(2, 7))):
+                text = [str(w) for w in rng.choice(WORDS, int(rng.integers(2, 5)))]
+                y = int((line + 1) * 110 * scale)
+                if y >= height - 20:
+                    break
+                cv2.putText(img, " ".join(text), (int(40 * scale), y), cv2.FONT_HERSHEY_SIMPLEX,
+                            1.6 * scale, (20, 20, 20), max(2, int(3 * scale)), cv2.LINE_AA)
+                words.extend(text)
+        path = os.path.join(directory, f"image_{i:04d}.png")
+        cv2.imwrite(path, img)
+        truth[path] = words
+    return truth
+
+
+def recall(text: str, words: list) -> float | None:
+    if not words:
+        return None
+    found = set(text.lower().split())
+    return sum(word in found for word in words) / len(words)
+
+
+def summarize(name: str, images: int, elapsed: float, latencies: list, confidences: list, recalls: list) -> dict:
+    """`images` is every input image, blank ones included, so all modes are compared over the same inputs."""
+    recalls = [r for r in recalls if r is not None]
+    return {
+        "mode": name,
+        "images_per_sec": round(images / elapsed, 2),
+        "p50_seconds": round(float(np.percentile(latencies, 50)), 3) if latencies else None,
+        "p95_seconds": round(float(np.percentile(latencies, 95)), 3) if latencies else None,
+        "mean_confidence": round(float(np.mean(confidences)), 3) if confidences else None,
+        "word_recall": round(float(np.mean(recalls)), 3) if recalls else None,
+    }
+
+
+def run(args) -> list:
+    directory = tempfile.mkdtemp()
+    truth = generate_images(directory, args.images, args.blank_ratio)
+    paths = list(truth)
+    reader = read_content.get_ocr_reader()
+    reader.readtext(np.full((64, 64), 255, np.uint8))  # load weights before timing
+    rows = []
+
+    latencies, confidences, recalls = [], [], []
+    start = time.perf_counter()
+    for path in paths:
+        image_start = time.perf_counter()
+        detections = reader.readtext(cv2.imread(path))
+        latencies.append(time.perf_counter() - image_start)
+        confidences.extend(c for _, _, c in detections)
+        recalls.append(recall(read_content.ImageExtractor.text(detections), truth[path]))
+    rows.append(summarize("baseline", len(paths), time.perf_counter() - start, latencies, confidences, recalls))
+
+    extractor = read_content.EXTRACTORS["png"]
+    latencies, recalls = [], []
+    start = time.perf_counter()
+    for path in paths:
+        image_start = time.perf_counter()
+        img = extractor.load(path, args.max_dim)
+        text = "" if extractor.is_blank(img) else extractor.text(reader.readtext(img))
+        latencies.append(time.perf_counter() - image_start)
+        recalls.append(recall(text, truth[path]))
+    rows.append(summarize("downscaled", len(paths), time.perf_counter() - start, latencies, [], recalls))
+
+    latencies, confidences, recalls = [], [], []
+    start = time.perf_counter()
+    for i in range(0, len(paths), args.batch_size):
+        for record in read_content.extract_images(paths[i:i + args.batch_size], max_dimension=args.max_dim):
+            ocr = record.get("ocr") or {}
+            if "seconds" in ocr:
+                latencies.append(ocr["seconds"])
+            if ocr.get("confidence") is not None:
+                confidences.append(ocr["confidence"])
+            recalls.append(recall(record["content"], truth[record["path"]]))
+    rows.append(summarize("batched", len(paths), time.perf_counter() - start, latencies, confidences, recalls))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=48)
+    parser.add_argument("--blank-ratio", type=float, default=0.2)
+    parser.add_argument("--batch-size", type=int, default=read_content.OCR_BATCH_SIZE)
+    parser.add_argument("--max-dim", type=int, default=read_content.OCR_MAX_DIMENSION)
+    parser.add_argument("--out", default="testing/results/benchmark_ocr.json")
+    args = parser.parse_args()
+
+    rows = run(args)
+    for row in rows:
+        print(row)
+    out = os.path.join(ROOT, args.out)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"config": vars(args), "results": rows}, f, indent=2)
+    print(f"Saved report to {out}")
@@ -0,0 +1,202 @@
+"""Full crawl versus incremental recrawl of a generated site on a local HTTP server.
+
+Writes an index page linking to `--sections` section pages, each linking to
+`--pages` tutorial pages, and serves them from a local server that sends an
+ETag and Last-Modified and answers conditional requests with 304. The site is
+then crawled with the project's settings by a small spider, in a subprocess
+per crawl:
+
+- `full`: no crawl state (`CRAWL_STATE_PATH` empty), every page downloaded
+- `first`: the same with a fresh crawl state, which it fills
+- `unchanged`: recrawl with nothing changed, default settings: every page is
+  downloaded and written, labelled `changed: false`
+- `unchanged-only-changed`: the same with `ONLY_CHANGED_ITEMS=1`, conditional GETs
+- `changed`: recrawl after rewriting `--change-ratio` of the tutorial pages,
+  with `ONLY_CHANGED_ITEMS=1`
+
+and reports per crawl the seconds, 200 and 304 responses and bytes the server
+sent, and the items written to the feed. `unchanged` must write every page and
+`changed` exactly the rewritten pages.
+
+Usage:
+    python testing/benchmark_recrawl.py --sections 20 --pages 25 --change-ratio 0.05
+"""
+import argparse
+import glob
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from email.utils import formatdate
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import scrapy
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT = os.path.join(ROOT, "web_scraper")
+PARAGRAPH = ("Gradients flow backwards through every layer of the network, and the optimizer uses them "
+             "to update the weights after each batch. ")
+
+
+class SiteSpider(scrapy.Spider):
+    """Follows every link from the index, one item per tutorial and section page."""
+    name = "recrawl-benchmark"
+
+    def __init__(self, base: str = "", stats_out: str = "", **kwargs):
+        super().__init__(**kwargs)
+        self.start_urls = [f"{base}/index.html"]
+        self.stats_out = stats_out
+
+    def parse(self, response):
+        from web_scraper.extraction import Rule, parse_page
+        page = parse_page(response, Rule(roots=("main",), separator="\n", strip=True), links="a::attr(href)")
+        if response.url not in self.start_urls:
+            yield {"url": response.url, "title": page.title, "content": page.content}
+        for link in page.links:
+            yield response.follow(link, callback=self.parse)
+
+    def closed(self, reason):
+        with open(self.stats_out, "w") as f:
+            json.dump(self.crawler.stats.get_stats(), f, default=str)
+
+
+class Handler(SimpleHTTPRequestHandler):
+    """Static files with a content ETag; counts responses and bytes per status."""
+    counts = {}
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _count(self, status: int, size: int):
+        with self.lock:
+            entry = self.counts.setdefault(status, [0, 0])
+            entry[0] += 1
+            entry[1] += size
+
+    def do_GET(self):
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self._count(404, 0)
+            return self.send_error(404)
+        with open(path, "rb") as f:
+            body = f.read()
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return self._count(304, 0)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", formatdate(os.path.getmtime(path), usegmt=True))
+        self.end_headers()
+        self.wfile.write(body)
+        self._count(200, len(body))
+
+
+def write_page(path: str, title: str, body: str, links: list = ()):
+    anchors = "".join(f'<li><a href="{link}">{link}</a></li>' for link in links)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"<html><head><title>{title}</title></head><body><nav><ul>{anchors}</ul></nav>"
+                f"<main><h1>{title}</h1><p>{body}</p></main></body></html>")
+
+
+def build_site(directory: str, sections: int, pages: int, paragraphs: int) -> list:
+    """Write the site and return the file names of the tutorial pages."""
+    tutorials = []
+    section_files = [f"s{i}.html" for i in range(sections)]
+    write_page(os.path.join(directory, "index.html"), "Index", "Table of contents", section_files)
+    for i, section in enumerate(section_files):
+        children = [f"p{i}_{j}.html" for j in range(pages)]
+        write_page(os.path.join(directory, section), f"Section {i}", f"Section {i}. " + PARAGRAPH, children)
+        for child in children:
+            write_page(os.path.join(directory, child), child, f"{child}. " + PARAGRAPH * paragraphs)
+        tutorials.extend(children)
+    return tutorials
+
+
+def crawl(name: str, base: str, work: str, state_path: str, only_changed: bool) -> dict:
+    Handler.counts.clear()
+    feed_dir = os.path.join(work, f"feeds-{name}")
+    stats_out = os.path.join(work, f"stats-{name}.json")
+    command = [sys.executable, "-m", "scrapy", "runspider", os.path.abspath(__file__),
+               "-a", f"base={base}", "-a", f"stats_out={stats_out}",
+               "-s", "ROBOTSTXT_OBEY=False", "-s", "LOG_FILE=" + os.path.join(work, f"{name}.log"),
+               "-s", "CONCURRENT_REQUESTS=16", "-s", "DOWNLOAD_DELAY=0", "-s", "AUTOTHROTTLE_ENABLED=False"]
+    env = dict(os.environ, FEED_DIR=feed_dir, CRAWL_STATE_PATH=state_path, ONLY_CHANGED_ITEMS="1" if only_changed else "0")
+    start = time.perf_counter()
+    subprocess.run(command, cwd=PROJECT, env=env, check=True)
+    seconds = time.perf_counter() - start
+    items = []
+    for path in glob.glob(os.path.join(feed_dir, "*", "*.jsonl.gz")):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            items.extend(json.loads(line)["url"] for line in f if line.strip())
+    with open(stats_out) as f:
+        stats = json.load(f)
+    return {
+        "crawl": name,
+        "seconds": round(seconds, 2),
+        "responses_200": Handler.counts.get(200, [0, 0])[0],
+        "responses_304": Handler.counts.get(304, [0, 0])[0],
+        "bytes_sent": Handler.counts.get(200, [0, 0])[1],
+        "items_written": len(items),
+        "not_modified": stats.get("crawl_state/not_modified", 0),
+        "unchanged_items": stats.get("crawl_state/unchanged_items", 0),
+        "urls": sorted(items),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sections", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=25, help="Tutorial pages per section")
+    parser.add_argument("--paragraphs", type=int, default=40, help="Paragraphs per tutorial page")
+    parser.add_argument("--change-ratio", type=float, default=0.05)
+    parser.add_argument("--out", default="testing/results/benchmark_recrawl.json")
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="recrawl-")
+    site = os.path.join(work, "site")
+    os.makedirs(site)
+    tutorials = build_site(site, args.sections, args.pages, args.paragraphs)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(Handler, directory=site))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    state_path = os.path.join(work, "crawl_state.sqlite")
+
+    try:
+        rows = [crawl("full", base, work, "", False), crawl("first", base, work, state_path, False),
+                crawl("unchanged", base, work, state_path, False),
+                crawl("unchanged-only-changed", base, work, state_path, True)]
+        changed = tutorials[::max(1, round(1 / args.change_ratio))] if args.change_ratio > 0 else []
+        for name in changed:
+            write_page(os.path.join(site, name), name, f"{name}, revised. " + PARAGRAPH * args.paragraphs)
+        rows.append(crawl("changed", base, work, state_path, True))
+    finally:
+        server.shutdown()
+
+    expected = sorted(f"{base}/{name}" for name in changed)
+    correct = rows[-1]["urls"] == expected
+    complete = rows[2]["urls"] == rows[0]["urls"]
+    for row in rows:
+        row.pop("urls")
+        print(row)
+    print(f"unchanged crawl wrote every page: {complete}")
+    print(f"changed crawl wrote exactly the {len(expected)} rewritten pages: {correct}")
+    out = os.path.join(ROOT, args.out)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"config": vars(args), "pages": len(tutorials) + args.sections + 1, "results": rows,
+                   "unchanged_feed_complete": complete, "changed_items_correct": correct}, f, indent=2)
+    print(f"Saved report to {out}")
+    shutil.rmtree(work, ignore_errors=True)
@@ -0,0 +1,344 @@
+"""Pages/sec of the spiders' text extraction, BeautifulSoup functions vs. the shared lxml rules.
+
+Generates `--pages` HTML pages per site shaped like the real ones (the
+content element with the junk each rule removes, inside a page with head
+scripts, a navigation menu and a footer), then extracts the text of every
+page with:
+
+- `bs4`: the site's cleaning function as the spiders had it, `BeautifulSoup(html, 'html.parser')`
+  on `response.text` (copied below)
+- `lxml`: `extraction.extract_text` with the site's rule on a parsel Selector, including
+  the lxml parse Scrapy does for the response anyway
+- `lxml_reused`: the same on an already parsed page, which is what the spiders pay
+
+and reports pages/sec per site and the share of pages whose text is
+identical between the two. Two differences are expected: BeautifulSoup
+glued the words on either side of a removed link together (geeksforgeeks),
+and `find_all(text=True)` also returned HTML comments (w3schools).
+
+Usage:
+    python testing/benchmark_scraper_extraction.py --pages 200
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "web_scraper"))
+
+import numpy as np
+from bs4 import BeautifulSoup
+from parsel import Selector
+from web_scraper.extraction import RULES, extract_text
+
+WORDS = ("tensor", "model", "gradient", "layer", "python", "数据", "训练", "server", "query", "index", "function",
+         "array", "模型", "教程", "network", "the", "a", "of", "and", "to")
+
+
+# The spiders' BeautifulSoup cleaning functions before the shared extraction module
+
+def bs4_geeksforgeeks(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    article = soup.find('article', class_='content')
+    if not article:
+        return None
+    for element in article.select('''
+        script, style, p>a, .three_dot_dropdown, .last_updated_parent, .article-title,
+        .three_dot_dropdown_content, .article-pgnavi, .more-info, .improved, #video-tab-content,
+        #AP_G4GR_6, .article_bottom_text, .article_bottom_text ~ *
+    '''):
+        element.decompose()
+    bottom_text = article.find('div', class_='article_bottom_text')
+    if bottom_text:
+        for element in bottom_text.find_all_next():
+            element.decompose()
+    text_content = []
+    for element in article.find_all(['p', 'li', 'pre', 'h3', 'h2', 'h1']):
+        text = element.get_text(strip=True)
+        if text:
+            text_content.append(text)
+    clean_text = '\n'.join(text_content)
+    return '\n'.join([line.strip() for line in clean_text.split('\n') if line.strip()])
+
+
+def bs4_liaoxuefeng(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    for img in soup.find_all('img'):
+        img.decompose()
+    social_domains = ['weibo.com', 'github.com', 'zhihu.com', 'twitter.com']
+    for a in soup.find_all('a', href=True):
+        if any(domain in a['href'] for domain in social_domains):
+            a.decompose()
+    for nav in soup.select('div#gsi-chapter-prev-next'):
+        nav.decompose()
+    for svg in soup.find_all('svg'):
+        svg.decompose()
+    return '\n'.join(line.strip() for line in soup.get_text().split('\n') if line.strip())
+
+
+def bs4_pytorch(html):
+    soup = BeautifulSoup(html, "html.parser")
+    article = soup.find("article", class_="pytorch-article")
+    if not article:
+        return ""
+    if (download_note := article.find("div", class_="sphx-glr-download-link-note")):
+        download_note.decompose()
+    if (nav_bar := article.find("p", class_="sphx-glr-example-title")):
+        nav_bar.decompose()
+    for element in article.find_all(class_=["sphx-glr-timing", "sphx-glr-footer"]):
+        element.decompose()
+    for pre in article.find_all("pre"):
+        pre.string = pre.get_text().strip()
+    return article.get_text(separator="\n", strip=False).strip()
+
+
+def bs4_pytorch_extra(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    main_div = soup.find('div', {'role': 'main'})
+    if not main_div:
+        return ""
+    text_content = main_div.get_text(separator='\n', strip=True)
+    return re.sub(r'\n\s*\n', '\n\n', text_content).strip()
+
+
+def bs4_runoob(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    content_div = soup.find('div', {'class': 'article-intro', 'id': 'content'})
+    for img in content_div.find_all('img'):
+        img.decompose()
+    for trybtn in content_div.find_all('a', {'class': 'tryitbtn'}):
+        trybtn.decompose()
+    for br in content_div.find_all('br'):
+        br.decompose()
+    for tag in content_div.find_all(style=True):
+        del tag['style']
+    return str(content_div.get_text()).strip()
+
+
+def bs4_scikit(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    for link in soup.find_all('a', class_='headerlink'):
+        link.decompose()
+    for img in soup.find_all('img'):
+        img.decompose()
+    for link in soup.find_all('a'):
+        if len(link.contents) == 0 and not link.text.strip():
+            link.decompose()
+    text = soup.get_text(separator='\n', strip=False)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    text = re.sub(r'[ \t]{2,}', ' ', text)
+    return text.strip()
+
+
+def bs4_tensorflow(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    content_div = soup.find('div', class_='devsite-article-body')
+    if not content_div:
+        return ''
+    top_div = content_div.find('div', id='top')
+    if top_div:
+        top_div.decompose()
+    table_wrapper = content_div.find("div", _class="devsite-table-wrapper")
+    if table_wrapper:
+        table_wrapper.decompose()
+    return content_div.get_text(separator='\n', strip=True)
+
+
+def bs4_w3cschools(html, is_index=False):
+    soup = BeautifulSoup(html, 'html.parser')
+    content = ""
+    if is_index:
+        for intro in soup.find_all('div', class_='content-intro'):
+            content += intro.get_text(strip=True)
+    else:
+        content_div = soup.find('div', class_='content-intro') or soup.find('div', class_='view-box')
+        if content_div:
+            content = content_div.get_text(strip=True)
+    return content
+
+
+def bs4_w3schools(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    main_content = soup.find('div', id='main')
+    if not main_content:
+        return ""
+    for element in main_content.select('#mainLeaderboard, #midcontentadcontainer, #user-profile-bottom-wrapper, script, style'):
+        element.decompose()
+    text_content = []
+    for element in main_content.find_all(text=True):
+        if element.parent.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'li', 'td', 'th']:
+            text = element.strip()
+            if text:
+                text_content.append(text)
+    full_text = '\n'.join(text_content)
+    return '\n'.join([line.strip() for line in full_text.split('\n') if line.strip()])
+
+
+# Synthetic pages
+
+class Page:
+    def __init__(self, rng):
+        self.rng = rng
+
+    def words(self, n=12):
+        return " ".join(self.rng.choice(WORDS, n))
+
+    def paragraphs(self, n):
+        parts = []
+        for i in range(n):
+            kind = i % 5
+            if kind == 0:
+                parts.append(f"<h2>{self.words(4)}</h2>")
+            elif kind == 1:
+                parts.append(f'<p>{self.words()} <a href="/x/{i}">{self.words(2)}</a> {self.words()}</p>')
+            elif kind == 2:
+                items = "".join(f"<li>{self.words(6)}</li>" for _ in range(4))
+                parts.append(f"<ul>\n{items}\n</ul>")
+            elif kind == 3:
+                lines = "\n".join(f'<span class="k">def</span> <span class="n">f{j}</span>(x): return x'
+                                  for j in range(5))
+                parts.append(f"<pre>\n{lines}\n</pre>")
+            else:
+                parts.append(f"<p>{self.words(20)}<!-- ad slot --></p>")
+        return "\n".join(parts)
+
+    def wrap(self, title, body):
+        menu = "".join(f'<li><a href="/menu/{i}">{self.words(2)}</a></li>' for i in range(150))
+        return f"""<!DOCTYPE html>
+<html>
+<head>
+<title>{title}</title>
+<script>window.dataLayer = window.dataLayer || []; function gtag(){{dataLayer.push(arguments);}}</script>
+<style>body {{ margin: 0 }} .nav li {{ display: inline }}</style>
+</head>
+<body>
+<div class="nav"><ul>{menu}</ul></div>
+{body}
+<footer><p>Copyright {self.words(3)}</p></footer>
+<script>console.log("loaded")</script>
+</body>
+</html>"""
+
+
+def fixtures(site: str, n: int, paragraphs: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    page = Page(rng)
+    pages = []
+    for _ in range(n):
+        title = page.words(4)
+        content = page.paragraphs(paragraphs)
+        if site == "geeksforgeeks":
+            body = f"""<article class="content"><div class="article-title"><h1>{title}</h1></div>
+<div class="last_updated_parent"><span>Last Updated : 01 Jan, 2025</span></div>
+<div class="three_dot_dropdown"><div class="three_dot_dropdown_content"><p>Share</p></div></div>
+{content}
+<div class="improved"><p>Improve</p></div>
+<div class="article_bottom_text"><p>Comment</p></div><div><p>Related {page.words(3)}</p></div>
+</article>"""
+        elif site == "liaoxuefeng":
+            body = f"""<div id="gsi-chapter-prev-next"><a href="/prev">Prev</a><a href="/next">Next</a></div>
+<div class="x-content"><h1>{title}</h1><img src="/a.png"><svg><text>icon</text></svg>
+{content}
+<p><a href="https://weibo.com/x">weibo</a> <a href="https://github.com/x">github</a> {page.words(3)}</p></div>"""
+        elif site == "pytorch":
+            body = f"""<article class="pytorch-article">
+<div class="sphx-glr-download-link-note"><p>Click here to download the full example code</p></div>
+<p class="sphx-glr-example-title"><a href="/a">Learn the Basics</a> || <a href="/b">Tensors</a></p>
+<h1>{title}</h1>
+{content}
+<p class="sphx-glr-timing"><strong>Total running time of the script:</strong> (0 minutes 1.234 seconds)</p>
+<div class="sphx-glr-footer"><p>Download Python source code</p></div>
+</article>"""
+        elif site == "pytorch-extra":
+            body = f"""<div role="main"><div class="section"><h1>{title}</h1>
+
+{content}
+
+</div></div>"""
+        elif site == "runoob":
+            body = f"""<div class="article-intro" id="content"><h1>{title}</h1><img src="/a.png">
+<p style="color: red">{page.words()}<br>{page.words()}</p>
+{content}
+<a class="tryitbtn" href="/try">Try it</a></div>"""
+        elif site == "scikit":
+            body = f"""<div class="section"><h1>{title}<a class="headerlink" href="#t">¶</a></h1>
+<a href="/img"><img src="/a.png"></a>
+{content}
+</div>"""
+        elif site == "tensorflow":
+            body = f"""<div class="devsite-article-body"><div id="top"></div><h1>{title}</h1>
+{content}
+<div class="devsite-table-wrapper"><table><tr><th>Op</th><td>{page.words(3)}</td></tr></table></div></div>"""
+        elif site in ("w3cschools", "w3cschools-index"):
+            intros = 3 if site == "w3cschools-index" else 1
+            body = "".join(f'<div class="content-intro"><h1>{title}</h1>{content}</div>' for _ in range(intros))
+        elif site == "w3schools":
+            body = f"""<div id="main"><h1>{title} <span class="color_h1">Tutorial</span></h1>
+<div id="mainLeaderboard"><p>Advertisement</p></div>
+{content}
+<table><tr><th>Method</th><td>{page.words(3)}</td></tr></table>
+<div id="midcontentadcontainer"><p>Ad</p></div><div id="user-profile-bottom-wrapper"><p>Log in</p></div></div>"""
+        pages.append(page.wrap(title, body))
+    return pages
+
+
+BASELINES = {
+    "geeksforgeeks": bs4_geeksforgeeks,
+    "liaoxuefeng": bs4_liaoxuefeng,
+    "pytorch": bs4_pytorch,
+    "pytorch-extra": bs4_pytorch_extra,
+    "runoob": bs4_runoob,
+    "scikit": bs4_scikit,
+    "tensorflow": bs4_tensorflow,
+    "w3cschools": bs4_w3cschools,
+    "w3cschools-index": lambda html: bs4_w3cschools(html, is_index=True),
+    "w3schools": bs4_w3schools,
+}
+
+
+def pages_per_sec(func, pages: list) -> tuple:
+    start = time.perf_counter()
+    outputs = [func(page) for page in pages]
+    return len(pages) / (time.perf_counter() - start), outputs
+
+
+def run(args) -> list:
+    warnings.filterwarnings("ignore", module="bs4")  # the tensorflow baseline's `_class=` filter
+    rows = []
+    for site, baseline in BASELINES.items():
+        pages = fixtures(site, args.pages, args.paragraphs)
+        rule = RULES[site]
+        bs4_rate, expected = pages_per_sec(baseline, pages)
+        lxml_rate, actual = pages_per_sec(lambda html: extract_text(Selector(text=html), rule), pages)
+        parsed = [Selector(text=html) for html in pages]
+        reused_rate, _ = pages_per_sec(lambda selector: extract_text(selector, rule), parsed)
+        rows.append({
+            "site": site,
+            "kb_per_page": round(sum(map(len, pages)) / len(pages) / 1024, 1),
+            "bs4_pages_per_sec": round(bs4_rate, 1),
+            "lxml_pages_per_sec": round(lxml_rate, 1),
+            "lxml_reused_pages_per_sec": round(reused_rate, 1),
+            "identical": round(float(np.mean([a == b for a, b in zip(expected, actual)])), 3),
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=200, help="Pages per site")
+    parser.add_argument("--paragraphs", type=int, default=60, help="Content blocks per page")
+    parser.add_argument("--out", default="testing/results/benchmark_scraper_extraction.json")
+    args = parser.parse_args()
+
+    rows = run(args)
+    for row in rows:
+        print(row)
+    out = os.path.join(ROOT, args.out)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"config": vars(args), "results": rows}, f, indent=2, ensure_ascii=False)
+    print(f"Saved report to {out}")
@@ -0,0 +1,85 @@
+"""Payload size and serialization time of /recommendation responses, before and after field projection.
+
+Builds search results from the fake backend (documents with `--content-words`
+words of content) and serializes a response of `k` results three ways:
+
+- `full_jsonable`: what FastAPI did for the raw result objects, jsonable_encoder + json.dumps
+- `projected_json`: serialization.serialize_results + the standard library encoder
+- `projected_orjson`: the same with orjson (skipped if it is not installed)
+
+Usage:
+    python testing/benchmark_serialization.py --content-words 3000 --k 5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+import serialization
+from fake_backend import FakeDatabase, FakeEncoder, WORDS
+
+
+def time_per_call(func, repeats: int) -> float:
+    """Median wall time of `func()` in microseconds."""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(samples)
+
+
+def run(args) -> dict:
+    db = FakeDatabase(n_documents=200, dim=64).__enter__()
+    rng = np.random.default_rng(0)
+    for obj in db.objects:
+        obj.properties["content"] = " ".join(rng.choice(WORDS, args.content_words))
+    query = "python tensor"
+    embedding = FakeEncoder(dim=64).encode(query)
+    results = db.search(query, embedding, {"language": "en", "file_type": "html"}, k=args.k)
+    timings = {"first_stage": 1.0, "rerank": 1.0, "scoring": 1.0}
+
+    def full_jsonable():
+        return json.dumps(jsonable_encoder({"message": query, "results": results, "timings": timings})).encode("utf-8")
+
+    def projected(dumps):
+        return lambda: dumps({"message": query, "results": serialization.serialize_results(results, query=query),
+                              "timings": timings})
+
+    def stdlib_dumps(content):
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+    variants = {"full_jsonable": full_jsonable, "projected_json": projected(stdlib_dumps)}
+    if serialization.orjson is not None:
+        variants["projected_orjson"] = projected(serialization.dumps)
+
+    rows = []
+    for name, func in variants.items():
+        rows.append({"variant": name, "bytes": len(func()), "us_per_response": round(time_per_call(func, args.repeats), 1)})
+    return {"config": vars(args), "results": rows}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--content-words", type=int, default=3000, help="Words of content per document")
+    parser.add_argument("--k", type=int, default=5, help="Results per response")
+    parser.add_argument("--repeats", type=int, default=500)
+    parser.add_argument("--out", default="testing/results/benchmark_serialization.json")
+    args = parser.parse_args()
+
+    report = run(args)
+    for row in report["results"]:
+        print(row)
+    out = os.path.join(ROOT, args.out)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved report to {out}")
@@ -0,0 +1,186 @@
+"""Load benchmark of the serving path with the in-process FastAPI app and a fake backend.
+
+Runs app.py's lifespan with `FakeDatabase`/`FakeEncoder` swapped in and a
+throwaway SQLite database, signs up users, then drives /login,
+/recommendation and /vote with a concurrent async load generator. Reports
+throughput and p50/p95/p99 per endpoint as JSON; pass `--compare` with a
+previous report to print the change.
+
+Usage:
+    python testing/benchmark_serving.py --requests 500 --concurrency 16 --hybrid-ms 20 --rerank-ms 80
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)  # app.py serves static/ relative to the working directory
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from fake_backend import FakeDatabase, FakeEncoder, WORDS
+
+QUERIES = ["Python Tutorial", "Machine Learning Tutorial"] + [f"{a} {b}" for a in WORDS[:10] for b in WORDS[10:]]
+
+
+def setup_app(args):
+    """Import app.py and point it at the fake backend and a temporary SQLite file."""
+    import app as app_module
+    import models
+
+    app_module.Database = lambda: FakeDatabase(args.documents, args.hybrid_ms, args.rerank_ms, args.vote_ms)
+    app_module._model = FakeEncoder(latency_ms=args.encode_ms)
+
+    engine = create_engine(f"sqlite:///{tempfile.mkdtemp()}/benchmark.db", connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(bind=engine)
+    TestSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def get_test_db():
+        db = TestSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app_module.app.dependency_overrides[app_module.get_db] = get_test_db
+    return app_module.app
+
+
+def percentile(values: list, q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+async def drive(client: httpx.AsyncClient, name: str, make_request, total: int, concurrency: int) -> dict:
+    """Issue `total` requests from `concurrency` workers and summarize latencies."""
+    latencies, errors = [], 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            response = await make_request(client, i)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "endpoint": name,
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+async def run(args) -> dict:
+    app = setup_app(args)
+    rng = random.Random(args.seed)
+    users = [(f"bench_user_{i}", f"password_{i}") for i in range(args.users)]
+    results = []
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            tokens = []
+            for username, password in users:
+                response = await client.post("/signup", json={"username": username, "password": password})
+                tokens.append(response.json()["token"])
+
+            async def login(client, i):
+                username, password = users[i % len(users)]
+                response = await client.post("/login", json={"username": username, "password": password})
+                if response.status_code == 200:
+                    tokens[i % len(users)] = response.json()["token"]
+                return response
+
+            result_ids = []
+
+            async def recommend(client, i):
+                response = await client.post(
+                    "/recommendation", json={"input": rng.choice(QUERIES)},
+                    headers={"Cookie": f"session_token={tokens[i % len(tokens)]}"})
+                if response.status_code == 200 and len(result_ids) < 1000:
+                    result_ids.extend(r["object"]["uuid"] for r in response.json()["results"])
+                return response
+
+            async def vote(client, i):
+                return await client.post(
+                    f"/vote/{rng.choice(result_ids)}", params={"vote": rng.choice(("up", "down"))},
+                    headers={"Cookie": f"session_token={tokens[i % len(tokens)]}"})
+
+            results.append(await drive(client, "/login", login, args.login_requests, args.concurrency))
+            results.append(await drive(client, "/recommendation", recommend, args.requests, args.concurrency))
+            if args.batch_size:
+                async def recommend_batch(client, i):
+                    return await client.post(
+                        "/recommendation/batch", json={"queries": rng.sample(QUERIES, args.batch_size)},
+                        headers={"Cookie": f"session_token={tokens[i % len(tokens)]}"})
+
+                # Same number of queries as the /recommendation run, so throughput_rps * batch_size compares directly
+                results.append(await drive(client, "/recommendation/batch", recommend_batch,
+                                           max(1, args.requests // args.batch_size), args.concurrency))
+            if result_ids:
+                results.append(await drive(client, "/vote", vote, args.requests, args.concurrency))
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {"commit": commit, "config": vars(args), "results": results}
+
+
+def compare(report: dict, previous_path: str):
+    with open(previous_path, encoding="utf-8") as f:
+        previous = {r["endpoint"]: r for r in json.load(f)["results"]}
+    for row in report["results"]:
+        old = previous.get(row["endpoint"])
+        if not old:
+            continue
+        changes = ", ".join(
+            f"{key} {old[key]} -> {row[key]} ({(row[key] - old[key]) / old[key] * 100:+.1f}%)"
+            for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms") if old[key])
+        print(f"{row['endpoint']}: {changes}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500, help="Requests per endpoint for /recommendation and /vote")
+    parser.add_argument("--login-requests", type=int, default=50, help="/login is dominated by bcrypt, keep it small")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=0, help="Also drive /recommendation/batch with this many queries")
+    parser.add_argument("--documents", type=int, default=5000)
+    parser.add_argument("--encode-ms", type=float, default=0.0, help="Simulated encoder latency")
+    parser.add_argument("--hybrid-ms", type=float, default=0.0, help="Simulated hybrid query latency")
+    parser.add_argument("--rerank-ms", type=float, default=0.0, help="Simulated rerank latency per 10 documents")
+    parser.add_argument("--vote-ms", type=float, default=0.0, help="Simulated vote write latency")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="testing/results/benchmark_serving.json")
+    parser.add_argument("--compare", help="Previous report to compare against")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    for row in report["results"]:
+        print(row)
+    if args.compare:
+        compare(report, args.compare)
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved report to {args.out}")
@@ -0,0 +1,103 @@
+"""Requests/sec and bytes per response for static pages and assets, before and after the in-memory cache.
+
+All variants go through app.py with its middlewares and session dependency.
+`before` puts the previous serving path in front of the app's routes
+(StaticFiles mount for /static, FileResponse from disk for /login); the
+other variants use its StaticCache:
+
+- `cached`: no compression accepted
+- `cached_compressed`: `Accept-Encoding: gzip, br` like a browser
+- `cached_revalidate`: repeat visits sending `If-None-Match`, answered with 304
+
+Usage:
+    python testing/benchmark_static.py --requests 3000 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from typing import Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+
+import httpx
+from fastapi import APIRouter, Depends
+from fastapi.responses import FileResponse
+from starlette.routing import Mount
+from fastapi.staticfiles import StaticFiles
+from benchmark_serving import drive, setup_app
+
+PATHS = ("/static/home.html", "/static/css/style.css", "/login")
+
+
+def install_previous_routes(app_module) -> list:
+    """Route /static and /login the way app.py did before StaticCache; returns the routes to remove later."""
+    router = APIRouter()
+
+    @router.get("/login")
+    async def get_login_page(user_id: Optional[int] = Depends(app_module.get_current_user)):
+        return FileResponse("static/login.html")
+
+    routes = [Mount("/static", StaticFiles(directory="static"), name="static")] + router.routes
+    app_module.app.router.routes[0:0] = routes  # matched before the app's own routes
+    return routes
+
+
+async def run_variant(app, name: str, headers: dict, revalidate: bool, args) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    sizes = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        etags = {}
+        if revalidate:
+            for path in PATHS:
+                etags[path] = (await client.get(path, headers=headers)).headers.get("etag")
+
+        async def request(client, i):
+            path = PATHS[i % len(PATHS)]
+            request_headers = dict(headers)
+            if revalidate and etags.get(path):
+                request_headers["If-None-Match"] = etags[path]
+            response = await client.get(path, headers=request_headers)
+            sizes.append(int(response.headers.get("content-length", len(response.content))))
+            return response
+
+        result = await drive(client, name, request, args.requests, args.concurrency)
+    result["mean_bytes"] = round(sum(sizes) / len(sizes), 1)
+    return result
+
+
+async def run(args) -> list:
+    args.documents, args.hybrid_ms, args.rerank_ms, args.vote_ms, args.encode_ms = 10, 0, 0, 0, 0
+    app = setup_app(args)  # only for the get_db override; /login and /static need no backend
+    import app as app_module
+    app_module.static_files.load()
+    identity = {"Accept-Encoding": "identity"}
+    previous_routes = install_previous_routes(app_module)
+    rows = [await run_variant(app, "before", identity, False, args)]
+    for route in previous_routes:
+        app.router.routes.remove(route)
+    return rows + [
+        await run_variant(app, "cached", identity, False, args),
+        await run_variant(app, "cached_compressed", {"Accept-Encoding": "gzip, br"}, False, args),
+        await run_variant(app, "cached_revalidate", {"Accept-Encoding": "gzip, br"}, True, args),
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--out", default="testing/results/benchmark_static.json")
+    args = parser.parse_args()
+
+    rows = asyncio.run(run(args))
+    for row in rows:
+        print(row)
+    os.makedirs(os.path.dirname(args.out), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"config": vars(args), "results": rows}, f, indent=2)
+    print(f"Saved report to {args.out}")
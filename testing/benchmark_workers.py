@@ -0,0 +1,164 @@
+"""Memory and throughput of the preforking launcher (serve.py) for different worker counts.
+
+For each worker count, starts serve.py's launcher in a subprocess with the
+fake Weaviate backend, drives /recommendation over real TCP connections and
+then reads RSS and PSS of every worker from /proc/<pid>/smaps_rollup. PSS
+splits shared pages between the processes sharing them, so it shows how much
+of the preloaded model each worker actually costs.
+
+By default the real sentence encoder is loaded (that is what is being
+shared); pass `--fake-encoder` where the weights are unavailable, in which
+case the memory numbers only reflect the interpreter and app.
+
+Linux only (fork, /proc).
+
+Usage:
+    python testing/benchmark_workers.py --workers 1,2,4 --requests 2000 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+
+def run_server(args):
+    """Entry point of the server subprocess: fake backend, optionally the real encoder, then prefork."""
+    import serve
+    serve.configure_threads(max(1, (os.cpu_count() or 1) // args.serve))
+    from benchmark_serving import setup_app
+    import app as app_module
+
+    app = setup_app(args)
+    if not args.fake_encoder:
+        app_module._model = None  # let preload() load the real weights
+        serve.preload(app_module)
+    serve.serve(app, "127.0.0.1", args.port, args.serve, log_level="warning")
+
+
+def _children(pid: int) -> list:
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # the process name may contain spaces, the ppid is the second field after it
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return sorted(children)
+
+
+def memory(pid: int) -> dict:
+    """RSS and PSS of a process in MiB."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss", "Shared_Clean", "Private_Dirty"):
+                values[key.lower() + "_mb"] = round(int(rest.split()[0]) / 1024, 1)
+    return values
+
+
+async def wait_ready(base_url: str, workers: int, timeout: float):
+    """Poll /ready until enough consecutive requests succeed that every worker has most likely started."""
+    deadline = time.monotonic() + timeout
+    streak = 0
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while streak < 4 * workers:
+            if time.monotonic() > deadline:
+                raise TimeoutError("Server did not become ready")
+            try:
+                ok = (await client.get("/ready")).status_code == 200
+            except httpx.TransportError:
+                ok = False
+            streak = streak + 1 if ok else 0
+            if not ok:
+                await asyncio.sleep(0.2)
+
+
+async def load(base_url: str, args) -> dict:
+    from benchmark_serving import QUERIES, drive
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        response = await client.post("/signup", json={"username": "bench_workers", "password": "bench_workers"})
+        token = response.json()["token"]
+
+        async def recommend(client, i):
+            return await client.post("/recommendation", json={"input": QUERIES[i % len(QUERIES)]},
+                                     headers={"Cookie": f"session_token={token}"})
+
+        return await drive(client, "/recommendation", recommend, args.requests, args.concurrency)
+
+
+def measure(workers: int, args) -> dict:
+    command = [sys.executable, os.path.abspath(__file__), "--serve", str(workers), "--port", str(args.port),
+               "--documents", str(args.documents), "--encode-ms", str(args.encode_ms),
+               "--hybrid-ms", str(args.hybrid_ms), "--rerank-ms", str(args.rerank_ms)]
+    if args.fake_encoder:
+        command.append("--fake-encoder")
+    server = subprocess.Popen(command, cwd=ROOT)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        asyncio.run(wait_ready(base_url, workers, args.startup_timeout))
+        result = asyncio.run(load(base_url, args))
+        pids = _children(server.pid)
+        per_worker = [{"pid": pid, **memory(pid)} for pid in pids]
+        return {
+            "workers": workers,
+            "throughput_rps": result["throughput_rps"],
+            "p50_ms": result["p50_ms"],
+            "p95_ms": result["p95_ms"],
+            "p99_ms": result["p99_ms"],
+            "errors": result["errors"],
+            "launcher": memory(server.pid),
+            "per_worker": per_worker,
+            "total_pss_mb": round(sum(w["pss_mb"] for w in per_worker) + memory(server.pid)["pss_mb"], 1),
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts to compare")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=18234)
+    parser.add_argument("--documents", type=int, default=5000)
+    parser.add_argument("--encode-ms", type=float, default=0.0, help="Simulated encoder latency (--fake-encoder only)")
+    parser.add_argument("--hybrid-ms", type=float, default=0.0, help="Simulated hybrid query latency")
+    parser.add_argument("--rerank-ms", type=float, default=0.0, help="Simulated rerank latency per 10 documents")
+    parser.add_argument("--fake-encoder", action="store_true", help="Use the stub encoder instead of the real model")
+    parser.add_argument("--startup-timeout", type=float, default=300.0)
+    parser.add_argument("--out", default="testing/results/benchmark_workers.json")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)  # internal: run the server with N workers
+    args = parser.parse_args()
+    args.vote_ms = 0.0
+
+    if args.serve:
+        run_server(args)
+        sys.exit(0)
+
+    rows = []
+    for workers in (int(w) for w in args.workers.split(",")):
+        rows.append(measure(workers, args))
+        print({key: value for key, value in rows[-1].items() if key != "per_worker"})
+    report = {"config": vars(args), "cpu_count": os.cpu_count(), "results": rows}
+    out = os.path.join(ROOT, args.out)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved report to {out}")
@@ -0,0 +1,239 @@
+"""Deterministic local stand-ins for the Weaviate `Database` and the sentence encoder.
+
+Used by the benchmarks to drive app.py in-process without a Weaviate server,
+a Cohere key or model weights. Latencies of the real dependencies are
+simulated with blocking sleeps, since the real client calls block too.
+"""
+import hashlib
+import os
+import re
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ann_index import FlatIndex, normalize
+from ranking import mmr
+import metrics
+
+DIM = 768
+LANGUAGES = ("en", "zh-cn")
+FILE_TYPES = ("html", "pdf", "pptx")
+WORDS = ("python", "tensor", "model", "gradient", "layer", "server", "query", "index", "vector", "kernel",
+         "dataset", "training", "network", "tutorial", "function", "array", "docker", "redis", "sql", "react")
+
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+
+
+@dataclass
+class FakeMetadata:
+    score: float = 0.0
+    rerank_score: float | None = None
+
+
+@dataclass
+class FakeObject:
+    """Mirrors the fields of a Weaviate query result object that the app uses."""
+    uuid: uuid.UUID
+    properties: dict
+    metadata: FakeMetadata = field(default_factory=FakeMetadata)
+    vector: dict = field(default_factory=dict)
+
+
+class FakeTokenizer:
+    """Word-level tokenizer for Latin text, character-level for CJK, with a vocabulary grown on the fly."""
+    TOKEN_PATTERN = re.compile(r"[\u4e00-\u9fff]|[^\W\u4e00-\u9fff]+|[^\w\s]")
+
+    def __init__(self):
+        self.vocab = {}
+        self.tokens = []
+
+    def encode(self, text: str, add_special_tokens: bool = True) -> list:
+        ids = []
+        for token in self.TOKEN_PATTERN.findall(text):
+            token_id = self.vocab.get(token)
+            if token_id is None:
+                token_id = self.vocab[token] = len(self.tokens)
+                self.tokens.append(token)
+            ids.append(token_id)
+        return ids
+
+    def decode(self, token_ids: list) -> str:
+        return " ".join(self.tokens[i] for i in token_ids)
+
+
+class FakeEncoder:
+    """Stand-in for SentenceTransformer.encode: a unit vector seeded by the text."""
+
+    def __init__(self, dim: int = DIM, latency_ms: float = 0.0):
+        self.dim = dim
+        self.latency_ms = latency_ms
+        self.tokenizer = FakeTokenizer()
+
+    def _vector(self, text: str) -> np.ndarray:
+        return normalize(np.random.default_rng(_seed(text)).standard_normal(self.dim))
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        if isinstance(sentences, str):
+            return self._vector(sentences)
+        if not len(sentences):
+            return np.empty((0, self.dim), dtype=np.float32)
+        return np.vstack([self._vector(s) for s in sentences])
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+
+class FakeBatch:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def add_object(self, properties: dict, uuid=None, vector=None):
+        self.collection.objects.append((uuid, properties, vector))
+
+
+class FakeCollection:
+    """Records objects added through `collection.batch.fixed_size(...)`, like Database.ingest_data does."""
+
+    def __init__(self):
+        self.objects = []
+        self.batch = self
+
+    def fixed_size(self, batch_size: int = 100):
+        return FakeBatch(self)
+
+
+class FakeDatabase:
+    """
+    Drop-in for `weaviate_db.Database` backed by a synthetic in-memory corpus.
+
+    Args:
+        n_documents(int): Size of the synthetic corpus
+        hybrid_ms, rerank_ms, vote_ms(float): Simulated latency of the hybrid query, the reranker and vote writes
+        seed(int): Seed for the corpus; the same seed always yields the same corpus and rankings
+    """
+
+    def __init__(self, n_documents: int = 5000, hybrid_ms: float = 0.0, rerank_ms: float = 0.0,
+                 vote_ms: float = 0.0, seed: int = 0, dim: int = DIM):
+        self.n_documents = n_documents
+        self.hybrid_ms = hybrid_ms
+        self.rerank_ms = rerank_ms
+        self.vote_ms = vote_ms
+        self.seed = seed
+        self.dim = dim
+        self.chunks = None
+        self.k1, self.k2, self.k = 10, 10, 5
+        self.objects = []
+        self.indexes = {}
+
+    def __enter__(self):
+        rng = np.random.default_rng(self.seed)
+        vectors = normalize(rng.standard_normal((self.n_documents, self.dim)).astype(np.float32))
+        languages = rng.choice(LANGUAGES, self.n_documents)
+        file_types = rng.choice(FILE_TYPES, self.n_documents, p=(0.8, 0.1, 0.1))
+        for i in range(self.n_documents):
+            words = rng.choice(WORDS, 6)
+            self.objects.append(FakeObject(
+                uuid=uuid.UUID(int=int(rng.integers(0, 2**63)) << 64 | i),
+                properties={
+                    "name": " ".join(words[:3]).title(),
+                    "content": " ".join(rng.choice(WORDS, 400)),
+                    "language": str(languages[i]),
+                    "file_type": str(file_types[i]),
+                    "url": f"https://example.com/{'-'.join(words[:3])}/{i}",
+                    "upvote": 0,
+                    "downvote": 0,
+                },
+                vector={"default": vectors[i].tolist()},
+            ))
+        for language in LANGUAGES:
+            for file_type in FILE_TYPES:
+                mask = (languages == language) & (file_types == file_type)
+                index = FlatIndex()
+                index.add(vectors[mask], np.flatnonzero(mask))
+                self.indexes[(language, file_type)] = index
+        self.by_uuid = {str(obj.uuid): obj for obj in self.objects}
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        pass
+
+    def search(self, query: str, query_embedding: list, property: dict | None, alpha: int = 0.7,
+               mmr_lambda: float = 1.0, mode: str | None = None, k1: int | None = None,
+               k2: int | None = None, k: int | None = None, timings: dict | None = None):
+        for _, results in self.search_stages(query, query_embedding, property, alpha, mmr_lambda, mode,
+                                             k1, k2, k, timings):
+            pass
+        return results
+
+    def search_stages(self, query: str, query_embedding: list, property: dict | None, alpha: int = 0.7,
+                      mmr_lambda: float = 1.0, mode: str | None = None, k1: int | None = None,
+                      k2: int | None = None, k: int | None = None, timings: dict | None = None,
+                      early: bool = False):
+        if not query or not query.strip():
+            raise ValueError("Query cannot be empty or whitespace.")
+        k1 = k1 or self.k1
+        k2 = min(k2 or self.k2, k1)
+        k = k or self.k
+        timings = {} if timings is None else timings
+
+        with metrics.span("first_stage", timings):
+            if self.hybrid_ms:
+                time.sleep(self.hybrid_ms / 1000)
+            index = self.indexes[(property["language"], property["file_type"])]
+            ids, scores = index.search(np.asarray(query_embedding, dtype=np.float32), k1)
+        if early:
+            yield "first_stage", [
+                {"object": self._result_object(self.objects[i], score), "combined_score": score, "vote_used": False}
+                for i, score in zip(ids[:k].tolist(), scores[:k].tolist())
+            ]
+        ids, scores = ids[:k2], scores[:k2]
+
+        with metrics.span("rerank", timings):
+            if self.rerank_ms:
+                # Cohere latency grows with the number of documents sent
+                time.sleep(self.rerank_ms * len(ids) / 10 / 1000)
+            # Canned rerank scores: deterministic in (query, document)
+            rerank_scores = [(_seed(f"{query}|{i}") % 1000) / 1000 for i in ids.tolist()]
+
+        with metrics.span("scoring", timings):
+            results = [
+                {"object": self.objects[i], "combined_score": score, "vote_used": False}
+                for i, score in zip(ids.tolist(), rerank_scores)
+            ]
+            results.sort(key=lambda x: x["combined_score"], reverse=True)
+        if mmr_lambda < 1 and len(results) > k:
+            with metrics.span("mmr", timings):
+                selected = mmr([r["combined_score"] for r in results],
+                               [r["object"].vector["default"] for r in results], k, mmr_lambda)
+                results = [results[i] for i in selected]
+        yield "ranked", [{**r, "object": self._result_object(r["object"], r["combined_score"])} for r in results[:k]]
+
+    @staticmethod
+    def _result_object(obj: FakeObject, score: float) -> FakeObject:
+        """Copy without the vector, like the results of the real search."""
+        return FakeObject(obj.uuid, obj.properties, FakeMetadata(rerank_score=score))
+
+    def update_vote(self, obj_uuid, user_id, vote: str):
+        if self.vote_ms:
+            time.sleep(self.vote_ms / 1000)
+        obj = self.by_uuid.get(str(obj_uuid))
+        if obj is None:
+            raise LookupError(f"No object found with UUID {obj_uuid}")
+        obj.properties["upvote" if vote == "up" else "downvote"] += 1
+        return (obj.properties["upvote"], obj.properties["downvote"])
@@ -4,12 +4,50 @@ from weaviate.classes.config import Configure, Property, DataType
 from weaviate.util import generate_uuid5
 import weaviate.classes as wvc
 from os import getenv
-import pandas as pd
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
 from datetime import datetime
 from pytz import timezone
 import math
+import numpy as np
 from collections import defaultdict
+from ann_index import aggregate_chunks
+from ranking import mmr
+import metrics
+
+if TYPE_CHECKING:
+    import pandas as pd  # only the ingestion paths receive DataFrames
+
+CHUNK_CANDIDATES = 100  # chunks retrieved before aggregating to documents in chunk mode
+VOTE_THRESHOLD = 5  # votes are ignored below this many interactions
+FRESHNESS_WEIGHT = 0.1  # share of the prescore given to freshness
+FRESHNESS_HALF_LIFE_DAYS = 30  # a document last ingested or voted on this long ago is half as fresh
+
+def _object_vector(obj) -> list:
+    """Return the vector of a query result fetched with include_vector=True."""
+    vector = obj.vector
+    # Collections without named vectors return {"default": [...]}
+    if isinstance(vector, dict):
+        vector = vector.get("default") or next(iter(vector.values()))
+    return vector
+
+def _combine(obj, relevance: float, decayed_scores: dict) -> float:
+    """Blend a relevance score with the object's decayed net votes."""
+    total_votes = obj.properties["upvote"] + obj.properties["downvote"]
+    # Only consider votes if they pass threshold
+    if total_votes > VOTE_THRESHOLD:
+        vote_score = decayed_scores.get(obj.uuid, {"up": 0, "down": 0})
+        net_votes = vote_score["up"] - vote_score["down"]
+        return 0.7 * relevance + 0.3 * net_votes
+    return relevance  # Full weight to search relevance
+
+def _freshness(obj, now: datetime) -> float:
+    """1.0 for a document ingested or voted on just now, halving every FRESHNESS_HALF_LIFE_DAYS; 0.0 if unknown."""
+    last_interaction = obj.properties.get("last_interaction")
+    if not last_interaction:
+        return 0.0
+    age_days = max((now - last_interaction).total_seconds(), 0) / 86400
+    return 0.5 ** (age_days / FRESHNESS_HALF_LIFE_DAYS)
 
 class Database:
     def __init__(self):
@@ -19,6 +57,14 @@ class Database:
         self.collections = {} # Name-to-collection mapping
         self.embeddings = getenv("WEAVIATE_EMBEDDINGS")
         self.vote = getenv("WEAVIATE_VOTE")
+        self.chunks = getenv("WEAVIATE_CHUNKS") # Optional chunk-level collection
+        self.search_mode = getenv("SEARCH_MODE", "document") # "document" or "chunk"
+        self.chunk_aggregation = getenv("CHUNK_AGGREGATION", "max") # "max" or "sum"
+        self.chunk_top_m = int(getenv("CHUNK_TOP_M", 3)) # chunks summed per document with "sum"
+        # Retrieval budget: first-stage candidates, candidates sent to the reranker, results returned
+        self.k1 = int(getenv("SEARCH_K1", 10))
+        self.k2 = int(getenv("SEARCH_K2", 10))
+        self.k = int(getenv("SEARCH_K", 5))
 
     def __enter__(self):
         """Establish connection to Weaviate when entering the context."""
@@ -30,6 +76,8 @@ class Database:
         
         self.collections[self.embeddings] = self._create_or_get_embedding_collections(getenv("WEAVIATE_EMBEDDINGS"))
         self.collections[self.vote] = self._create_or_get_vote_collections(getenv("WEAVIATE_VOTE"))
+        if self.chunks:
+            self.collections[self.chunks] = self._create_or_get_chunk_collections(self.chunks)
 
         return self
 
@@ -61,6 +109,24 @@ class Database:
             collection = self.client.collections.get(collection_name)
         return collection
 
+    def _create_or_get_chunk_collections(self, collection_name: str):
+        """Create or retrieve chunk collection in Weaviate."""
+        if not self.client.collections.exists(collection_name):
+            collection = self.client.collections.create(
+                collection_name,
+                reranker_config=Configure.Reranker.cohere(),
+                properties=[
+                        Property(name='doc_uuid', data_type=DataType.UUID),
+                        Property(name='doc_id', data_type=DataType.INT),
+                        Property(name='chunk_no', data_type=DataType.INT),
+                        Property(name='text', data_type=DataType.TEXT),
+                        Property(name='language', data_type=DataType.TEXT),
+                        Property(name='file_type', data_type=DataType.TEXT),
+                ])
+        else:
+            collection = self.client.collections.get(collection_name)
+        return collection
+
     def _delete_auth(self, collection):
         auth = input(f"Are you sure you want to delete {collection}? (Y or N)")
         if auth.lower() == 'y':
@@ -72,7 +138,7 @@ class Database:
             self.client.collections.delete(collection)
             print(f"{collection} deleted.")
 
-    def ingest_data(self, Dataframe: pd.DataFrame):
+    def ingest_data(self, Dataframe: "pd.DataFrame"):
         """Ingest data into the current collection."""
         counter = 0
         interval = 1000  # print progress every this many records; should be bigger than the batch_size
@@ -97,6 +163,42 @@ class Database:
                 if counter % interval == 0:
                     print(f"Imported {counter} articles...")
 
+    def ingest_chunks(self, Dataframe: "pd.DataFrame", Chunks: "pd.DataFrame"):
+        """
+        Ingest chunk vectors into the chunk collection.
+
+        Args:
+            Dataframe(pd.Dataframe): The document dataframe given to `ingest_data`, used to derive document UUIDs
+            Chunks(pd.Dataframe): Chunk table from `Preprocess.get_chunk_embeddings` (doc_id, chunk_no, text, embeddings)
+        """
+        if not self.chunks:
+            raise ValueError("WEAVIATE_CHUNKS is not set")
+        # Same derivation as ingest_data so chunks point at the ingested documents
+        doc_uuids = [generate_uuid5(row) for _, row in Dataframe.iterrows()]
+        languages = Dataframe["lang"].to_numpy()
+        file_types = Dataframe["file_type"].to_numpy()
+
+        counter = 0
+        interval = 1000
+        with self.collections.get(self.chunks).batch.fixed_size(batch_size=100) as batch:
+            for chunk in Chunks.itertuples(index=False):
+                doc_uuid = doc_uuids[chunk.doc_id]
+                batch.add_object(
+                    properties={
+                        "doc_uuid": doc_uuid,
+                        "doc_id": int(chunk.doc_id),
+                        "chunk_no": int(chunk.chunk_no),
+                        "text": chunk.text,
+                        "language": languages[chunk.doc_id],
+                        "file_type": file_types[chunk.doc_id],
+                    },
+                    uuid = generate_uuid5(f"{doc_uuid}-{chunk.chunk_no}"),
+                    vector=chunk.embeddings
+                )
+                counter += 1
+                if counter % interval == 0:
+                    print(f"Imported {counter} chunks...")
+
     def update_vote(self, obj_uuid, user_id, vote:str):
         """Update the number of vote and last_interaction"""
 
@@ -168,56 +270,202 @@ class Database:
         return (upvote, downvote)
             
 
-    def search(self, query: str, query_embedding: list, property: dict | None, alpha: int = 0.7):
-        """Search the current collection with a hybrid query."""
+    def search(self, query: str, query_embedding: list, property: dict | None, alpha: int = 0.7,
+               mmr_lambda: float = 1.0, mode: str | None = None, k1: int | None = None,
+               k2: int | None = None, k: int | None = None, timings: dict | None = None):
+        """Search the current collection with a multi-stage pipeline.
+
+        1. A hybrid query fetches `k1` candidates (in "chunk" mode, chunk hits aggregated to `k1` documents).
+        2. If `k2 < k1`, a cheap re-score of the hybrid score with vote decay and freshness prunes them to `k2`.
+        3. Only those `k2` go to the reranker (in "chunk" mode, only each document's best chunk text).
+        4. Rerank and vote scores are combined, optionally diversified with MMR (`mmr_lambda` < 1), and the top `k` returned.
+
+        Args:
+            k1, k2, k(int): Per-request overrides of the stage budgets configured by SEARCH_K1/SEARCH_K2/SEARCH_K
+            timings(dict): If given, filled with the latency of each stage in milliseconds
+        """
+        for _, results in self.search_stages(query, query_embedding, property, alpha, mmr_lambda, mode,
+                                             k1, k2, k, timings):
+            pass
+        return results
+
+    def search_stages(self, query: str, query_embedding: list, property: dict | None, alpha: int = 0.7,
+                      mmr_lambda: float = 1.0, mode: str | None = None, k1: int | None = None,
+                      k2: int | None = None, k: int | None = None, timings: dict | None = None,
+                      early: bool = False):
+        """Run the `search` pipeline as a generator of (stage, results) pairs.
+
+        The last pair is always ("ranked", final results). With `early=True` the
+        hybrid results are yielded first as ("first_stage", top k by hybrid
+        score) and the rerank always runs as its own query, so callers can show
+        something before the reranker answers. Objects yielded early are the
+        same instances as in the final results and still carry their vectors.
+        """
         if not query or not query.strip():
             raise ValueError("Query cannot be empty or whitespace.")
-        result = self.collections.get(self.embeddings).query.hybrid(
-            query= query, vector=query_embedding, limit=10
-            , filters = (
-                wvc.query.Filter.all_of([
-                    wvc.query.Filter.by_property("file_type").equal(property["file_type"]),
-                    wvc.query.Filter.by_property("language").equal(property['language'])
-                    ]))
-            , rerank = Rerank(prop='content', query=query)
+        k1 = k1 or self.k1
+        k2 = min(k2 or self.k2, k1)
+        k = k or self.k
+        timings = {} if timings is None else timings
+        diversify = mmr_lambda < 1
+        chunk_mode = (mode or self.search_mode) == "chunk"
+        # Without pruning, the reranker can run inside the first query (one round trip)
+        rerank_inline = not chunk_mode and k2 >= k1 and not early
+
+        with metrics.span("first_stage", timings):
+            if chunk_mode:
+                candidates = self._chunk_first_stage(query, query_embedding, property, alpha, k1, diversify)
+            else:
+                result = self.collections.get(self.embeddings).query.hybrid(
+                    query= query, vector=query_embedding, limit=k1
+                    , filters = self._preference_filter(property)
+                    , rerank = Rerank(prop='content', query=query) if rerank_inline else None
+                    , alpha=alpha
+                    , return_metadata=MetadataQuery(score=True)
+                    , include_vector=diversify
+                    )
+                candidates = [
+                    (obj, obj.metadata.rerank_score if rerank_inline else obj.metadata.score, None)
+                    for obj in result.objects
+                ]
+        if early:
+            yield "first_stage", [
+                {"object": obj, "combined_score": score, "vote_used": False} for obj, score, _ in candidates[:k]
+            ]
+
+        with metrics.span("votes", timings):
+            decayed_scores = self._candidate_decayed_scores(candidates)
+
+        if len(candidates) > k2:
+            with metrics.span("prescore", timings):
+                candidates = self._prescore(candidates, decayed_scores)[:k2]
+
+        if not rerank_inline and candidates:
+            with metrics.span("rerank", timings):
+                candidates = self._rerank(query, query_embedding, alpha, candidates, chunk_mode)
+
+        with metrics.span("scoring", timings):
+            ranked_results = self._rank(candidates, decayed_scores)
+
+        if diversify and len(ranked_results) > k:
+            with metrics.span("mmr", timings):
+                selected = mmr(
+                    [result["combined_score"] for result in ranked_results],
+                    [_object_vector(result["object"]) for result in ranked_results],
+                    k, mmr_lambda)
+                ranked_results = [ranked_results[i] for i in selected]
+        for result in ranked_results:
+            result["object"].vector = {}  # only needed for MMR, don't serialize it
+        yield "ranked", ranked_results[:k]
+
+    def _preference_filter(self, property: dict):
+        return wvc.query.Filter.all_of([
+            wvc.query.Filter.by_property("file_type").equal(property["file_type"]),
+            wvc.query.Filter.by_property("language").equal(property['language'])
+            ])
+
+    def _chunk_first_stage(self, query: str, query_embedding: list, property: dict, alpha: float,
+                           limit: int, include_vector: bool = False) -> list:
+        """Retrieve chunks and aggregate them to `limit` documents, each paired with its best chunk."""
+        hits = self.collections.get(self.chunks).query.hybrid(
+            query=query, vector=query_embedding, limit=max(CHUNK_CANDIDATES, limit)
+            , filters=self._preference_filter(property)
             , alpha=alpha
+            , return_properties=["doc_uuid", "doc_id"]
             , return_metadata=MetadataQuery(score=True)
-            )
-            
-        # Identify objects needing decay processing
-        threshold = 5
+            ).objects
+        if not hits:
+            return []
+
+        doc_ids = np.array([hit.properties["doc_id"] for hit in hits], dtype=np.int64)
+        scores = np.array([hit.metadata.score for hit in hits], dtype=np.float32)
+        top_doc_ids, top_scores = aggregate_chunks(doc_ids, scores, limit, self.chunk_aggregation, self.chunk_top_m)
+
+        # Hits are ordered best first, so the first hit of each document is its best chunk
+        best_chunk = {}
+        for hit in hits:
+            best_chunk.setdefault(hit.properties["doc_id"], hit)
+        best_chunks = [best_chunk[doc_id] for doc_id in top_doc_ids.tolist()]
+
+        doc_uuids = [chunk.properties["doc_uuid"] for chunk in best_chunks]
+        documents = {
+            obj.uuid: obj for obj in self.collections.get(self.embeddings).query.fetch_objects(
+                filters=wvc.query.Filter.by_id().contains_any(doc_uuids), limit=len(doc_uuids)
+                , include_vector=include_vector
+                ).objects
+        }
+        return [
+            (documents[chunk.properties["doc_uuid"]], float(score), chunk)
+            for chunk, score in zip(best_chunks, top_scores.tolist())
+            if chunk.properties["doc_uuid"] in documents
+        ]
+
+    def _rerank(self, query: str, query_embedding: list, alpha: float, candidates: list, chunk_mode: bool) -> list:
+        """Rerank the surviving candidates with a second hybrid query restricted to their ids."""
+        if chunk_mode:
+            # Rerank only the matching chunk text instead of the full document content
+            documents = {chunk.uuid: obj for obj, _, chunk in candidates}
+            reranked = self.collections.get(self.chunks).query.hybrid(
+                query=query, vector=query_embedding, limit=len(candidates)
+                , filters=wvc.query.Filter.by_id().contains_any(list(documents))
+                , rerank=Rerank(prop='text', query=query)
+                , alpha=alpha
+                , return_properties=["text"]
+                , return_metadata=MetadataQuery(score=True)
+                ).objects
+            return [(documents[chunk.uuid], chunk.metadata.rerank_score, chunk) for chunk in reranked]
+
+        include_vector = bool(candidates[0][0].vector)
+        reranked = self.collections.get(self.embeddings).query.hybrid(
+            query=query, vector=query_embedding, limit=len(candidates)
+            , filters=wvc.query.Filter.by_id().contains_any([obj.uuid for obj, _, _ in candidates])
+            , rerank=Rerank(prop='content', query=query)
+            , alpha=alpha
+            , return_metadata=MetadataQuery(score=True)
+            , include_vector=include_vector
+            ).objects
+        return [(obj, obj.metadata.rerank_score, None) for obj in reranked]
+
+    def _candidate_decayed_scores(self, candidates: list) -> dict:
+        """Batch fetch decayed vote scores for candidates with enough votes."""
         decay_candidates = [
-            obj.uuid for obj in result.objects
-            if (obj.properties["upvote"] + obj.properties["downvote"]) > threshold
+            obj.uuid for obj, _, _ in candidates
+            if (obj.properties["upvote"] + obj.properties["downvote"]) > VOTE_THRESHOLD
         ]
+        return self._batch_get_decayed_scores(decay_candidates) if decay_candidates else {}
+
+    def _prescore(self, candidates: list, decayed_scores: dict) -> list:
+        """Cheap re-score of first-stage candidates: min-max normalized hybrid score combined with votes,
+        blended with freshness (FRESHNESS_WEIGHT)."""
+        scores = [score for _, score, _ in candidates]
+        low, spread = min(scores), (max(scores) - min(scores)) or 1.0
+        now = datetime.now(timezone("Asia/Chongqing"))
+        return sorted(
+            candidates,
+            key=lambda c: (1 - FRESHNESS_WEIGHT) * _combine(c[0], (c[1] - low) / spread, decayed_scores)
+                          + FRESHNESS_WEIGHT * _freshness(c[0], now),
+            reverse=True)
 
-        # Batch fetch decayed scores for qualifying objects
-        decayed_scores = self._batch_get_decayed_scores(decay_candidates) if decay_candidates else {}
+    def _rank(self, candidates: list, decayed_scores: dict) -> list:
+        """Combine rerank scores with decayed vote scores, best first.
 
-        # Calculate final scores
+        Args:
+            candidates(list): (object, rerank_score, chunk) tuples; chunk is None in document mode
+            decayed_scores(dict): Output of `_batch_get_decayed_scores` for the candidates
+        """
         ranked_results = []
-        for obj in result.objects:
+        for obj, rerank_score, chunk in candidates:
             total_votes = obj.properties["upvote"] + obj.properties["downvote"]
-            
-            # Only consider votes if they pass threshold
-            if total_votes > threshold:
-                vote_score = decayed_scores.get(obj.uuid, {"up": 0, "down": 0})
-                net_votes = vote_score["up"] - vote_score["down"]
-            else:
-                net_votes = 0  # Ignore votes below threshold
-
-            if total_votes > 5:
-                combined_score = 0.7 * obj.metadata.rerank_score + 0.3 * net_votes
-            else:
-                combined_score = obj.metadata.rerank_score  # Full weight to search relevance
-            
-            ranked_results.append({
+            result = {
                 "object": obj,
-                "combined_score": combined_score,
-                "vote_used": total_votes > threshold
-            })
+                "combined_score": _combine(obj, rerank_score, decayed_scores),
+                "vote_used": total_votes > VOTE_THRESHOLD
+            }
+            if chunk is not None:
+                result["chunk"] = chunk.properties["text"]
+            ranked_results.append(result)
 
-        return sorted(ranked_results, key=lambda x: x["combined_score"], reverse=True)[:5]
+        return sorted(ranked_results, key=lambda x: x["combined_score"], reverse=True)
 
     def _batch_get_decayed_scores(self, uuids: list) -> dict:
         """Batch process decayed scores for multiple objects"""
@@ -229,11 +477,12 @@ class Database:
         now = datetime.now(timezone("Asia/Chongqing"))
 
         # Fetch all votes for target objects
-        votes = self.collections.get(self.vote).query.fetch_objects(
-            filters=wvc.query.Filter.by_property("obj_uuid").contains_any(uuids),
-            return_properties=["obj_uuid", "vote_type", "vote_time"],
-            limit=10000
-        ).objects
+        with metrics.span("vote_fetch"):
+            votes = self.collections.get(self.vote).query.fetch_objects(
+                filters=wvc.query.Filter.by_property("obj_uuid").contains_any(uuids),
+                return_properties=["obj_uuid", "vote_type", "vote_time"],
+                limit=10000
+            ).objects
 
         # Calculate decayed scores
         scores = defaultdict(lambda: {"up": 0.0, "down": 0.0})
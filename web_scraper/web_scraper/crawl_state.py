@@ -0,0 +1,105 @@
+"""Crawl state kept between runs, for incremental recrawls.
+
+One SQLite row per URL: the ETag and Last-Modified of its last 200 response,
+the page it was found on (`referer`), the hash of its content and when that
+last changed. `ChangedItemsPipeline` compares content hashes to label items
+as changed or not. With `ONLY_CHANGED_ITEMS`, `ConditionalGetMiddleware` also
+sends the validators back so unchanged pages come back as an empty 304, and
+only new or changed items are written.
+
+A page is only recorded once its item was exported (`item_scraped`), and the
+crawl's rows are committed only after the feeds are stored, never ahead of
+them: a page that was dropped, or that a killed or failed crawl did not get
+into a stored feed, is still unknown to the next crawl and written by it.
+
+The downloader middleware and the item pipeline share one `CrawlState` per
+crawler, opened by whichever asks first (see `crawl_state`).
+"""
+import sqlite3
+from datetime import datetime, timezone
+from scrapy import signals
+
+
+class CrawlState:
+    def __init__(self, path: str, stats=None):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                referer TEXT,
+                content_hash TEXT,
+                fetched_at TEXT,
+                changed_at TEXT
+            )""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS pages_referer ON pages (referer)")
+        self.db.commit()
+        self.stats = stats
+        self.pending = 0  # pages recorded in this crawl, committed when it closes
+
+    def validators(self, url: str) -> tuple:
+        """(etag, last_modified) of the last 200 response of `url`, (None, None) if it was never recorded."""
+        row = self.db.execute("SELECT etag, last_modified FROM pages WHERE url = ?", (url,)).fetchone()
+        return row or (None, None)
+
+    def children(self, url: str) -> list:
+        """URLs last found on `url`, to visit again when `url` itself has not changed."""
+        return [row[0] for row in self.db.execute("SELECT url FROM pages WHERE referer = ?", (url,))]
+
+    def content_hash(self, url: str) -> str | None:
+        """Hash of the content last recorded for `url`, None if it was never recorded."""
+        row = self.db.execute("SELECT content_hash FROM pages WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def record_page(self, url: str, etag: str | None, last_modified: str | None, referer: str | None,
+                    content_hash: str, changed: bool):
+        """
+        Args:
+            url(str): Page URL
+            etag(str): ETag of its response, or None
+            last_modified(str): Last-Modified of its response, or None
+            referer(str): Page it was found on, or None to keep the recorded one
+            content_hash(str): Hash of the page's cleaned content
+            changed(bool): Whether the content differs from the recorded one, which moves `changed_at`
+        """
+        now = _now()
+        self.db.execute("""
+            INSERT INTO pages (url, etag, last_modified, referer, content_hash, fetched_at, changed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (url) DO UPDATE SET etag = excluded.etag, last_modified = excluded.last_modified,
+                referer = COALESCE(excluded.referer, referer), content_hash = excluded.content_hash,
+                fetched_at = excluded.fetched_at, changed_at = COALESCE(excluded.changed_at, changed_at)""",
+            (url, etag, last_modified, referer, content_hash, now, now if changed else None))
+        self.pending += 1
+
+    def close(self):
+        """Commit this crawl's pages, unless a feed failed to store, and close the database."""
+        stats = self.stats.get_stats() if self.stats else {}
+        if any(key.startswith("feedexport/failed_count/") for key in stats):
+            self.db.rollback()
+            self.stats.set_value("crawl_state/discarded_pages", self.pending)
+        else:
+            self.db.commit()
+            if self.stats:
+                self.stats.set_value("crawl_state/recorded_pages", self.pending)
+        self.db.close()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def crawl_state(crawler) -> CrawlState | None:
+    """The crawler's shared `CrawlState`, or None if `CRAWL_STATE_PATH` is empty."""
+    path = crawler.settings.get("CRAWL_STATE_PATH")
+    if not path:
+        return None
+    state = getattr(crawler, "crawl_state", None)
+    if state is None:
+        state = crawler.crawl_state = CrawlState(path, crawler.stats)
+        # With feeds, close (and commit) only once they are stored: spider_closed handlers run alongside the exporter
+        closed = signals.feed_exporter_closed if crawler.settings.getdict("FEEDS") else signals.spider_closed
+        crawler.signals.connect(state.close, signal=closed)
+    return state
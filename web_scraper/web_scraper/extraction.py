@@ -0,0 +1,249 @@
+"""Text extraction for the spiders, on the lxml tree Scrapy already parsed.
+
+Each site's cleaning is a `Rule`: where the title is, which element holds
+the article, what to remove from it and how its text is joined.
+`extract_text` applies a rule to a response (or a parsel Selector) without
+parsing the HTML again, and `parse_page` reads a response's title, content
+and links from that one tree in a single pass. The
+text comes out the way the BeautifulSoup functions the spiders used to call
+produced it: comments, scripts and styles are skipped, and removed elements
+keep their tail text like `decompose` does.
+
+Usage:
+    page = parse_page(response, RULES["geeksforgeeks"], links="article.content a::attr(href)")
+"""
+import copy
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from lxml import etree
+from lxml.cssselect import CSSSelector
+
+# Text nodes BeautifulSoup's get_text returns: no comments, no script, style or template contents
+_TEXT = etree.XPath(".//text()[not(ancestor::script or ancestor::style or ancestor::template)]", smart_strings=False)
+
+
+@dataclass(frozen=True)
+class Rule:
+    """
+    How to turn one site's pages into text.
+
+    Args:
+        title(str): CSS selector of the title's text nodes, joined with spaces
+        roots(tuple): CSS selectors of the content element, the first that matches wins; empty for the whole page
+        all_roots(bool): Concatenate the text of every element the root selector matches instead of the first
+        remove(str): CSS selector of elements to drop (their tail text is kept)
+        remove_following(str): CSS selector of elements after which everything in the content is dropped
+        flatten(str): CSS selector of elements replaced by their stripped text, so code blocks stay one string
+        blocks(tuple): Tag names whose stripped text becomes one line each, instead of joining all text
+        text_parents(tuple): Keep only text nodes directly inside these tags, one line each
+        separator(str): Joins text nodes when neither `blocks` nor `text_parents` is set, as in get_text
+        strip(bool): Strip every text node and skip empty ones, as in get_text
+        drop_empty_lines(bool): Strip lines of the result and drop the empty ones
+        substitutions(tuple): (pattern, replacement) regexes applied to the result in order, before it is stripped
+        missing(str | None): Returned when no root matches
+    """
+    title: str = "title::text"
+    roots: tuple = ()
+    all_roots: bool = False
+    remove: str = ""
+    remove_following: str = ""
+    flatten: str = ""
+    blocks: tuple = ()
+    text_parents: tuple = ()
+    separator: str = ""
+    strip: bool = False
+    drop_empty_lines: bool = False
+    substitutions: tuple = ()
+    missing: str | None = ""
+
+
+RULES = {
+    "geeksforgeeks": Rule(
+        title="div.article-title>h1::text",
+        roots=("article.content",),
+        remove="""script, style, p>a, .three_dot_dropdown, .last_updated_parent, .article-title,
+                  .three_dot_dropdown_content, .article-pgnavi, .more-info, .improved, #video-tab-content,
+                  #AP_G4GR_6, .article_bottom_text, .article_bottom_text ~ *""",
+        remove_following="div.article_bottom_text",
+        blocks=("p", "li", "pre", "h3", "h2", "h1"),
+        drop_empty_lines=True,
+        missing=None,
+    ),
+    "liaoxuefeng": Rule(
+        remove="""img, svg, div#gsi-chapter-prev-next, a[href*="weibo.com"], a[href*="github.com"],
+                  a[href*="zhihu.com"], a[href*="twitter.com"]""",
+        drop_empty_lines=True,
+    ),
+    "pytorch": Rule(
+        roots=("article.pytorch-article",),
+        remove="div.sphx-glr-download-link-note, p.sphx-glr-example-title, .sphx-glr-timing, .sphx-glr-footer",
+        flatten="pre",
+        separator="\n",
+    ),
+    "pytorch-extra": Rule(
+        roots=("div[role=main]",),
+        separator="\n",
+        strip=True,
+        substitutions=((r"\n\s*\n", "\n\n"),),
+    ),
+    "runoob": Rule(
+        roots=("div.article-intro#content",),
+        remove="img, a.tryitbtn, br",
+        missing=None,
+    ),
+    "scikit": Rule(
+        remove="a.headerlink, img",
+        separator="\n",
+        substitutions=((r"\n{3,}", "\n\n"), (r"[ \t]{2,}", " ")),
+    ),
+    # The BeautifulSoup version also meant to drop div.devsite-table-wrapper but its
+    # `_class=` filter never matched, so tables have always been part of the text
+    "tensorflow": Rule(
+        roots=("div.devsite-article-body",),
+        remove="div#top",
+        separator="\n",
+        strip=True,
+    ),
+    "w3cschools": Rule(roots=("div.content-intro", "div.view-box"), strip=True),
+    "w3cschools-index": Rule(roots=("div.content-intro",), all_roots=True, strip=True),
+    "w3schools": Rule(
+        title="h1 ::text",
+        roots=("div#main",),
+        remove="#mainLeaderboard, #midcontentadcontainer, #user-profile-bottom-wrapper, script, style",
+        text_parents=("h1", "h2", "h3", "h4", "h5", "h6", "p", "li", "td", "th"),
+        drop_empty_lines=True,
+    ),
+}
+
+
+@lru_cache(maxsize=None)
+def _css(selector: str) -> CSSSelector:
+    return CSSSelector(" ".join(selector.split()))
+
+
+@lru_cache(maxsize=None)
+def _text_in(parents: tuple) -> etree.XPath:
+    condition = " or ".join(f"parent::{tag}" for tag in parents)
+    return etree.XPath(f".//text()[{condition}]", smart_strings=False)
+
+
+def _drop(element):
+    """Remove `element` but keep its tail text, like BeautifulSoup's decompose."""
+    parent = element.getparent()
+    if parent is None:
+        return
+    if element.tail:
+        previous = element.getprevious()
+        if previous is not None:
+            previous.tail = (previous.tail or "") + element.tail
+        else:
+            parent.text = (parent.text or "") + element.tail
+    parent.remove(element)
+
+
+def _strings(element, strip: bool) -> list:
+    strings = _TEXT(element)
+    if strip:
+        strings = [s for s in (s.strip() for s in strings) if s]
+    return strings
+
+
+def _clean(root, rule: Rule):
+    if rule.remove:
+        for element in _css(rule.remove)(root):
+            if element is not root:
+                _drop(element)
+    if rule.remove_following:
+        for marker in _css(rule.remove_following)(root):
+            for element in marker.xpath("following::*"):
+                _drop(element)
+    if rule.flatten:
+        for element in _css(rule.flatten)(root):
+            text, tail = "".join(_TEXT(element)).strip(), element.tail
+            for child in list(element):
+                element.remove(child)
+            element.text, element.tail = text, tail
+
+
+def _text(root, rule: Rule) -> str:
+    if rule.blocks:
+        lines = ("".join(_strings(block, True)) for block in root.iter(*rule.blocks))
+        text = "\n".join(line for line in lines if line)
+    elif rule.text_parents:
+        text = "\n".join(s.strip() for s in _text_in(rule.text_parents)(root) if s.strip())
+    else:
+        text = rule.separator.join(_strings(root, rule.strip))
+    if rule.drop_empty_lines:
+        text = "\n".join(line.strip() for line in text.split("\n") if line.strip())
+    for pattern, replacement in rule.substitutions:
+        text = re.sub(pattern, replacement, text)
+    return text.strip()
+
+
+def page_root(page):
+    """The lxml root element of a Scrapy response, a parsel Selector or an lxml element."""
+    if hasattr(page, "selector"):
+        return page.selector.root
+    return getattr(page, "root", page)
+
+
+def extract_text(page, rule: Rule, in_place: bool = False) -> str | None:
+    """
+    Apply `rule` to a parsed page.
+
+    Args:
+        page: Scrapy response, parsel Selector or lxml element
+        rule(Rule): The site's rule, usually from `RULES`
+        in_place(bool): Clean the page's own tree instead of a copy of the content; only when
+            nothing else will read the response afterwards
+
+    Return:
+        text(str | None): The cleaned text, or `rule.missing` if the page has no content element
+    """
+    root = page_root(page)
+    contents = [root]
+    for selector in rule.roots:
+        contents = _css(selector)(root)
+        if contents:
+            break
+    if not contents:
+        return rule.missing
+    if not rule.all_roots:
+        contents = contents[:1]
+
+    texts = []
+    for content in contents:
+        if not in_place:
+            content = copy.deepcopy(content)
+        _clean(content, rule)
+        texts.append(_text(content, rule))
+    return "".join(texts)
+
+
+@dataclass
+class Page:
+    title: str | None
+    content: str | None
+    links: list
+
+
+def parse_page(response, rule: Rule, links: str = "") -> Page:
+    """
+    Title, cleaned content and outgoing links of a response, all from the tree Scrapy parsed once.
+
+    The title and links are read before the content is cleaned in place, so the
+    response's selector must not be used afterwards.
+
+    Args:
+        response: Scrapy response or parsel Selector
+        rule(Rule): The site's rule, usually from `RULES`
+        links(str): CSS selector of the hrefs to follow, e.g. "article.content a::attr(href)"; empty for none
+    """
+    selector = getattr(response, "selector", response)
+    titles = selector.css(rule.title).getall()
+    return Page(
+        title=" ".join(titles) if titles else None,
+        links=selector.css(links).getall() if links else [],
+        content=extract_text(selector, rule, in_place=True),
+    )
@@ -11,6 +11,10 @@ class WebPageItem(scrapy.Item):
     timestamp = scrapy.Field()
     title = scrapy.Field()
     source= scrapy.Field()
+    hash = scrapy.Field()  # set by ContentPipeline
+    lang = scrapy.Field()
+    file_type = scrapy.Field()
+    changed = scrapy.Field()  # set by ChangedItemsPipeline
 
     def __repr__(self):
         # Exclude 'content' from the logged output
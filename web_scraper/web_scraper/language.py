@@ -0,0 +1,105 @@
+"""Language identification of dataset records.
+
+Only a bounded sample of each text is looked at: `SAMPLE_WINDOWS` windows of
+`WINDOW_CHARS` characters spread over the document (the whole text if it is
+shorter). A sample where CJK ideographs make up at least `CJK_RATIO` of the
+ideographs and Latin words is labelled "zh-cn" without running langdetect;
+counting words rather than letters keeps Chinese tutorials full of English
+code Chinese. The rest go through one langdetect factory, loaded once per
+process and seeded so the same text always gets the same label. Text without
+letters is "unknown".
+
+`index_language` maps a detected label onto the languages the index is
+filtered by ("en" and "zh-cn").
+
+It lives in the Scrapy package so the crawler's ContentPipeline labels items
+the same way; the scripts at the repository root import it as
+`web_scraper.web_scraper.language`.
+"""
+import os
+import re
+
+WINDOW_CHARS = int(os.getenv("LANG_WINDOW_CHARS", 1000))  # characters per sample window
+SAMPLE_WINDOWS = 3  # windows taken from the start, middle and end of long texts
+CJK_RATIO = 0.3  # share of ideographs among ideographs + Latin words above which a text is Chinese
+SEED = 0  # langdetect draws random n-gram samples; a fixed seed makes it deterministic
+UNKNOWN = "unknown"
+
+_IDEOGRAPHS = re.compile("[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+_LATIN_WORDS = re.compile("[A-Za-z\u00c0-\u024f]+")
+_KANA_HANGUL = re.compile("[\u3040-\u30ff\uac00-\ud7af]")  # Japanese and Korean also use ideographs
+_factory = None
+
+
+def _get_factory():
+    global _factory
+    if _factory is None:
+        from langdetect.detector_factory import PROFILES_DIRECTORY, DetectorFactory
+        factory = DetectorFactory()
+        factory.load_profile(PROFILES_DIRECTORY)
+        factory.set_seed(SEED)
+        _factory = factory
+    return _factory
+
+
+def sample(text: str, window: int = WINDOW_CHARS, windows: int = SAMPLE_WINDOWS) -> str:
+    """Up to `windows` evenly spaced windows of `window` characters, joined by spaces."""
+    if len(text) <= window * windows:
+        return text
+    step = (len(text) - window) / (windows - 1)
+    return " ".join(text[int(i * step):int(i * step) + window] for i in range(windows))
+
+
+def normalize(code: str) -> str:
+    """langdetect's label with the Chinese variants folded into "zh-cn"."""
+    code = code.lower()
+    return "zh-cn" if code.startswith("zh") else code
+
+
+def _detect_sample(text: str) -> str:
+    if not any(char.isalpha() for char in text):
+        return UNKNOWN
+    ideographs = len(_IDEOGRAPHS.findall(text))
+    if ideographs and ideographs / (ideographs + len(_LATIN_WORDS.findall(text))) >= CJK_RATIO \
+            and not _KANA_HANGUL.search(text):
+        return "zh-cn"
+    from langdetect.lang_detect_exception import LangDetectException
+    detector = _get_factory().create()
+    detector.append(text)
+    try:
+        return normalize(detector.detect())
+    except LangDetectException:  # no features, e.g. only digits and symbols
+        return UNKNOWN
+
+
+def detect_language(text: str) -> str:
+    """
+    Args:
+        text(str): Document text, of any length
+
+    Return:
+        lang(str): langdetect's code ("en", "zh-cn", ...) or "unknown" for empty or letterless text
+    """
+    if not isinstance(text, str) or not text.strip():
+        return UNKNOWN
+    return _detect_sample(sample(text))
+
+
+def detect_languages(texts) -> list:
+    """Detect the language of many texts; identical samples (e.g. boilerplate pages) are detected once."""
+    cache = {}
+    languages = []
+    for text in texts:
+        if not isinstance(text, str) or not text.strip():
+            languages.append(UNKNOWN)
+            continue
+        text_sample = sample(text)
+        if text_sample not in cache:
+            cache[text_sample] = _detect_sample(text_sample)
+        languages.append(cache[text_sample])
+    return languages
+
+
+def index_language(code: str) -> str:
+    """The index language of a detected label: "zh-cn" for Chinese, "en" for everything else."""
+    return "zh-cn" if normalize(code) == "zh-cn" else "en"
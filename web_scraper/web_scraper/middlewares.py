@@ -3,7 +3,10 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import time
 from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from web_scraper.crawl_state import crawl_state
 
 # useful for handling different item types with a single interface
 from itemadapter import is_item, ItemAdapter
@@ -58,6 +61,140 @@ class WebScraperSpiderMiddleware:
         spider.logger.info("Spider opened: %s" % spider.name)
 
 
+class ParseCpuTimeMiddleware:
+    """
+    Records the CPU time spent in spider callbacks in the stats.
+
+    `parse/pages` and `parse/cpu_seconds` add up over the crawl,
+    `parse/cpu_seconds_max` is the slowest page and `parse/cpu_ms_per_page`
+    is set when the spider closes. Only the time spent producing the
+    callback's output counts, not what other middlewares or the engine do
+    with it, so this should be the spider middleware closest to the spider.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        middleware = cls(crawler.stats)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def _record(self, cpu_seconds):
+        self.stats.inc_value("parse/pages")
+        self.stats.inc_value("parse/cpu_seconds", cpu_seconds)
+        self.stats.max_value("parse/cpu_seconds_max", cpu_seconds)
+
+    def process_spider_output(self, response, result, spider=None):
+        cpu_seconds = 0.0
+        iterator = iter(result)
+        while True:
+            start = time.process_time()
+            try:
+                output = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                cpu_seconds += time.process_time() - start
+            yield output
+        if "not_modified" not in response.meta:  # a 304 handled by ConditionalGetMiddleware, not the spider
+            self._record(cpu_seconds)
+
+    async def process_spider_output_async(self, response, result, spider=None):
+        cpu_seconds = 0.0
+        iterator = result.__aiter__()
+        while True:
+            start = time.process_time()
+            try:
+                output = await iterator.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                cpu_seconds += time.process_time() - start
+            yield output
+        if "not_modified" not in response.meta:  # a 304 handled by ConditionalGetMiddleware, not the spider
+            self._record(cpu_seconds)
+
+    def spider_closed(self, spider):
+        pages = self.stats.get_value("parse/pages", 0)
+        if pages:
+            cpu_seconds = self.stats.get_value("parse/cpu_seconds", 0.0)
+            self.stats.set_value("parse/cpu_ms_per_page", round(1000 * cpu_seconds / pages, 3))
+
+
+# Meta and headers that belong to one download of a request, not to the requests built from it
+_DOWNLOAD_META = ("depth", "conditional_get", "not_modified", "download_slot", "download_latency", "retry_times",
+                  "redirect_times", "redirect_ttl", "redirect_urls", "redirect_reasons", "playwright_page")
+_DOWNLOAD_HEADERS = ("If-None-Match", "If-Modified-Since", "Referer", "Cookie")
+
+
+class ConditionalGetMiddleware:
+    """
+    Revalidates pages an earlier crawl wrote instead of downloading them again.
+
+    Only with `ONLY_CHANGED_ITEMS`: requests for URLs in the crawl state
+    (`CRAWL_STATE_PATH`) carry their recorded ETag / Last-Modified as
+    If-None-Match / If-Modified-Since. A 304 does not reach the spider's
+    callback, so the page is left out of the feed; `follow_children` is its
+    callback instead and requests the pages it linked to last time, so pages
+    below an unchanged page are still revalidated. Those requests are built
+    from the 304's own request (callback, errback, meta such as RETRY_TIMES)
+    and go through the spider middlewares like any followed link, which set
+    their depth and Referer. Start URLs are always fetched in full, the
+    spiders read their tables of contents from them. Without
+    `ONLY_CHANGED_ITEMS` every page is downloaded and the feed is a complete
+    snapshot.
+    """
+
+    def __init__(self, crawler, state, conditional: bool):
+        self.crawler = crawler
+        self.state = state
+        self.conditional = conditional
+        self.stats = crawler.stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        state = crawl_state(crawler)
+        if state is None:
+            raise NotConfigured("CRAWL_STATE_PATH is empty")
+        return cls(crawler, state, crawler.settings.getbool("ONLY_CHANGED_ITEMS"))
+
+    def _is_start_url(self, request):
+        return request.meta.get("is_start_url") or request.url in getattr(self.crawler.spider, "start_urls", ())
+
+    def process_request(self, request, spider=None):
+        if not self.conditional or self._is_start_url(request):
+            return None
+        etag, last_modified = self.state.validators(request.url)
+        if etag:
+            request.headers.setdefault("If-None-Match", etag)
+        if last_modified:
+            request.headers.setdefault("If-Modified-Since", last_modified)
+        if etag or last_modified:
+            request.meta["conditional_get"] = True
+            self.stats.inc_value("crawl_state/conditional_requests")
+        return None
+
+    def process_response(self, request, response, spider=None):
+        if response.status == 304 and request.meta.get("conditional_get"):
+            self.stats.inc_value("crawl_state/not_modified")
+            meta = {key: value for key, value in request.meta.items() if key not in _DOWNLOAD_META}
+            request.meta["not_modified"] = (request.callback, meta)
+            request.meta["handle_httpstatus_list"] = [304]  # past HttpErrorMiddleware
+            request.callback = self.follow_children
+        return response
+
+    def follow_children(self, response):
+        """Callback of a 304: the pages it linked to last time, requested like the 304 itself was."""
+        callback, meta = response.meta["not_modified"]
+        headers = response.request.headers.copy()
+        for name in _DOWNLOAD_HEADERS:
+            headers.pop(name, None)
+        for url in self.state.children(response.url):
+            yield response.request.replace(url=url, callback=callback, headers=headers, meta=meta)
+
+
 class WebScraperDownloaderMiddleware:
     # Not all methods need to be defined. If a method is not defined,
     # scrapy acts as if the downloader middleware does not modify the
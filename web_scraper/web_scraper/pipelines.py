@@ -3,3 +3,185 @@
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
+import hashlib
+import re
+import sqlite3
+import unicodedata
+from scrapy import signals
+from scrapy.exceptions import DropItem, NotConfigured
+from web_scraper.crawl_state import crawl_state
+from web_scraper.language import detect_language, index_language
+
+_INVISIBLE = re.compile("[\u200b-\u200d\u2060\ufeff]")
+_WIDE_SPACES = re.compile("[\u00a0\u3000]")
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    NFC, no zero-width characters, plain spaces, no trailing whitespace and at most one empty line in a row.
+    Leading whitespace is kept, it is the indentation of code blocks.
+    """
+    text = _INVISIBLE.sub("", unicodedata.normalize("NFC", text)).replace("\r\n", "\n").replace("\r", "\n")
+    text = "\n".join(line.rstrip() for line in _WIDE_SPACES.sub(" ", text).split("\n"))
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+class SeenHashes:
+    """
+    Content digests seen in this crawl, at most `max_memory` of them in memory.
+
+    When the memory set is full it is written to the SQLite file `spill_path` and
+    emptied, so the check stays exact however long the crawl is. Without a spill
+    file the oldest digests are forgotten instead; a duplicate of a forgotten page
+    then gets through and is dropped by the hash in Preprocess.
+    """
+
+    def __init__(self, max_memory: int, spill_path: str = ""):
+        self.max_memory = max_memory
+        self.memory = {}  # insertion ordered, so the oldest digest is first
+        self.db = None
+        self.spilled = 0
+        if spill_path:
+            self.db = sqlite3.connect(spill_path)
+            self.db.execute("CREATE TABLE IF NOT EXISTS seen (digest BLOB PRIMARY KEY) WITHOUT ROWID")
+            self.db.execute("DELETE FROM seen")  # digests of an earlier crawl are not duplicates of this one
+
+    def add(self, digest: bytes) -> bool:
+        """Record `digest`; False if it was already seen."""
+        if digest in self.memory:
+            return False
+        if self.spilled and self.db.execute("SELECT 1 FROM seen WHERE digest = ?", (digest,)).fetchone():
+            return False
+        self.memory[digest] = None
+        if len(self.memory) > self.max_memory:
+            if self.db is not None:
+                self.db.executemany("INSERT OR IGNORE INTO seen VALUES (?)", ((d,) for d in self.memory))
+                self.db.commit()
+                self.spilled += len(self.memory)
+                self.memory.clear()
+            else:
+                del self.memory[next(iter(self.memory))]
+        return True
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+
+
+class ContentPipeline:
+    """
+    Cleans items once at crawl time so Preprocess.py does not have to.
+
+    Normalizes the content's whitespace, drops items with no or too little text
+    (`CONTENT_MIN_CHARS`) and exact duplicates of an earlier item, and adds the
+    content's sha256 `hash`, `lang` ("en" or "zh-cn") and `file_type`. Drops are
+    counted in the stats as `content/dropped/<reason>`.
+
+    Settings:
+        CONTENT_MIN_CHARS(int): Shortest content kept, in characters after normalizing
+        DEDUPE_MEMORY_HASHES(int): Content digests kept in memory
+        DEDUPE_SPILL_PATH(str): SQLite file the digests are moved to when memory is full; empty to forget the oldest
+    """
+
+    def __init__(self, stats, min_chars: int, max_memory: int, spill_path: str):
+        self.stats = stats
+        self.min_chars = min_chars
+        self.seen = SeenHashes(max_memory, spill_path)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            crawler.stats,
+            settings.getint("CONTENT_MIN_CHARS", 50),
+            settings.getint("DEDUPE_MEMORY_HASHES", 500000),
+            settings.get("DEDUPE_SPILL_PATH", ""),
+        )
+
+    def _drop(self, reason: str, url):
+        self.stats.inc_value(f"content/dropped/{reason}")
+        raise DropItem(f"{reason} content: {url}")
+
+    def process_item(self, item, spider=None):
+        content = item.get("content")
+        content = normalize_text(content) if isinstance(content, str) else ""
+        if not content:
+            self._drop("empty", item.get("url"))
+        if len(content) < self.min_chars:
+            self._drop("too_short", item.get("url"))
+
+        digest = hashlib.sha256(content.encode("utf-8")).digest()
+        if not self.seen.add(digest):
+            self._drop("duplicate", item.get("url"))
+
+        item["content"] = content
+        item["hash"] = digest.hex()  # the same hex digest as Preprocess.generate_hash
+        item["lang"] = index_language(detect_language(content))
+        item["file_type"] = "html"
+        self.stats.inc_value("content/items")
+        return item
+
+    def close_spider(self, spider=None):
+        self.stats.set_value("content/spilled_hashes", self.seen.spilled)
+        self.seen.close()
+
+
+class ChangedItemsPipeline:
+    """
+    Labels items with `changed`: False if the content hash is the same as in
+    the crawl state (`CRAWL_STATE_PATH`).
+
+    By default every item is kept. With `ONLY_CHANGED_ITEMS`, unchanged items
+    are dropped instead, so the feed only holds the new and changed pages that
+    need to be embedded again. Counted in the stats as
+    `crawl_state/changed_items` and `crawl_state/unchanged_items`.
+
+    The page's hash and validators are recorded once its item was exported
+    (`item_scraped`), or dropped as unchanged, since an earlier feed holds that
+    content; never for an item that did not reach the feed.
+    """
+
+    def __init__(self, stats, state, only_changed: bool):
+        self.stats = stats
+        self.state = state
+        self.only_changed = only_changed
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        state = crawl_state(crawler)
+        if state is None:
+            raise NotConfigured("CRAWL_STATE_PATH is empty")
+        pipeline = cls(crawler.stats, state, crawler.settings.getbool("ONLY_CHANGED_ITEMS"))
+        crawler.signals.connect(pipeline.item_scraped, signal=signals.item_scraped)
+        crawler.signals.connect(pipeline.item_dropped, signal=signals.item_dropped)
+        return pipeline
+
+    def process_item(self, item, spider=None):
+        item["hash"] = item.get("hash") or hashlib.sha256(item["content"].encode("utf-8")).hexdigest()
+        item["changed"] = self.state.content_hash(item["url"]) != item["hash"]
+        if item["changed"]:
+            self.stats.inc_value("crawl_state/changed_items")
+            return item
+        self.stats.inc_value("crawl_state/unchanged_items")
+        if self.only_changed:
+            raise DropItem(f"unchanged content: {item['url']}")
+        return item
+
+    def _record(self, item, response):
+        request = response.request
+        self.state.record_page(item["url"], _header(response.headers, "ETag"), _header(response.headers, "Last-Modified"),
+                               _header(request.headers, "Referer") if request else None, item["hash"], item["changed"])
+
+    def item_scraped(self, item, response):
+        if "changed" in item:
+            self._record(item, response)
+
+    def item_dropped(self, item, response):
+        if item.get("changed") is False:
+            self._record(item, response)
+
+
+def _header(headers, name: str) -> str | None:
+    value = headers.get(name)
+    return value.decode("latin-1") if value else None
@@ -7,6 +7,7 @@
 #     https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
 #     https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
+import os
 
 BOT_NAME = "web_scraper"
 
@@ -45,15 +46,25 @@ ROBOTSTXT_OBEY = True
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
-#    "web_scraper.middlewares.WebScraperSpiderMiddleware": 543,
-#}
+SPIDER_MIDDLEWARES = {
+    # "web_scraper.middlewares.WebScraperSpiderMiddleware": 543,
+    "web_scraper.middlewares.ParseCpuTimeMiddleware": 1000,  # after DepthMiddleware (900), closest to the spider
+}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
-#    "web_scraper.middlewares.WebScraperDownloaderMiddleware": 543,
-#}
+DOWNLOADER_MIDDLEWARES = {
+    # "web_scraper.middlewares.WebScraperDownloaderMiddleware": 543,
+    "web_scraper.middlewares.ConditionalGetMiddleware": 543,
+}
+
+# Crawl state kept between runs: URL, ETag/Last-Modified and content hash of every page written to a feed, committed
+# once the feeds are stored (a killed crawl records nothing); empty to record nothing.
+# By default every page is downloaded and written, items only get `changed` (False if the content is the same as last crawl).
+# ONLY_CHANGED_ITEMS=1 sends conditional GETs and writes only new and changed pages, so its feed is a delta on top of
+# the earlier feeds: keep those (Preprocess.load_jsonl merges them by URL), or delete the state file for a full crawl.
+CRAWL_STATE_PATH = os.getenv("CRAWL_STATE_PATH", "crawl_state.sqlite")
+ONLY_CHANGED_ITEMS = os.getenv("ONLY_CHANGED_ITEMS", "0") == "1"
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
@@ -63,9 +74,14 @@ ROBOTSTXT_OBEY = True
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
-#ITEM_PIPELINES = {
-#    "web_scraper.pipelines.WebScraperPipeline": 300,
-#}
+ITEM_PIPELINES = {
+    "web_scraper.pipelines.ContentPipeline": 300,
+    "web_scraper.pipelines.ChangedItemsPipeline": 400,
+}
+CONTENT_MIN_CHARS = int(os.getenv("CONTENT_MIN_CHARS", 50))  # shorter pages are dropped
+DEDUPE_MEMORY_HASHES = int(os.getenv("DEDUPE_MEMORY_HASHES", 500000))  # ~100 bytes each
+DEDUPE_SPILL_PATH = os.getenv("DEDUPE_SPILL_PATH", "")  # SQLite file for digests beyond that; empty to forget the oldest
+DEFAULT_DROPITEM_LOG_LEVEL = "DEBUG"  # duplicates are common, don't log each one as a warning
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
@@ -91,10 +107,22 @@ ROBOTSTXT_OBEY = True
 # Set settings whose default value is deprecated to a future-proof value
 REQUEST_FINGERPRINTER_IMPLEMENTATION = "2.7"
 TWISTED_REACTOR = "twisted.internet.asyncioreactor.AsyncioSelectorReactor"
-FEED_FORMAT = "json"
-FEED_URI = "liaoxuefeng.json"  # Output filename
-FEED_EXPORT_ENCODING = "utf-8"  # For non-ASCII characters
-FEED_EXPORT_INDENT = 4  # Optional: Makes JSON human-readable
+# One gzipped JSON Lines file per batch of items, per spider: feeds/<spider>/<spider>-<batch start time>-00001.jsonl.gz, ...
+# The start time keeps a second crawl from appending to the files of the first.
+# Items are written as they are scraped, so a killed crawl keeps every finished batch and
+# the lines of the open one that reached the disk (Preprocess.load_jsonl reads up to the cut).
+# Scrapy rotates feeds by item count, not size; at a few KB of text per page 20000 items is ~100 MB before compression.
+FEED_DIR = os.getenv("FEED_DIR", "feeds")
+FEEDS = {
+    f"{FEED_DIR}/%(name)s/%(name)s-%(batch_time)s-%(batch_id)05d.jsonl.gz": {
+        "format": "jsonlines",
+        "encoding": "utf-8",  # For non-ASCII characters
+        "postprocessing": ["scrapy.extensions.postprocessing.GzipPlugin"],
+        "gzip_compresslevel": 6,
+    },
+}
+FEED_EXPORT_BATCH_ITEM_COUNT = int(os.getenv("FEED_BATCH_ITEMS", 20000))
+FEED_EXPORT_ENCODING = "utf-8"
 DUPEFILTER_CLASS = 'scrapy.dupefilters.RFPDupeFilter'
 
 # DOWNLOAD_HANDLERS = {
@@ -1,33 +1,9 @@
 import scrapy
 from web_scraper.items import WebPageItem
-from bs4 import BeautifulSoup
+from web_scraper.extraction import RULES, parse_page
 from datetime import datetime 
 from pytz import timezone
 
-def clean_html(html):
-    soup = BeautifulSoup(html, 'html.parser')
-    
-    for img in soup.find_all('img'):
-        img.decompose()
-    
-    social_domains = ['weibo.com', 'github.com', 'zhihu.com', 'twitter.com']
-    for a in soup.find_all('a', href=True):
-        if any(domain in a['href'] for domain in social_domains):
-            a.decompose()
-    
-    for nav in soup.select('div#gsi-chapter-prev-next'):
-        nav.decompose()
-    
-    for svg in soup.find_all('svg'):
-        svg.decompose()
-    
-    cleaned_text = '\n'.join(
-        line.strip() for line in soup.get_text().split('\n') 
-        if line.strip()
-    )
-    return cleaned_text
-
-
 class LiaoxuefengSpider(scrapy.Spider):
     name = "liaoxuefeng"
     allowed_domains = ["liaoxuefeng.com"]
@@ -42,20 +18,18 @@ class LiaoxuefengSpider(scrapy.Spider):
         if '/blogs' in response.url or '.zip' in response.url:
             self.logger.debug(f"Skipping {response.url}")
             return
-        article_title = response.css("title::text").get()
-        content = clean_html(response.text)
+        page = parse_page(response, RULES["liaoxuefeng"], links="a::attr(href)")
 
         item = WebPageItem()
-        item['title'] = article_title
+        item['title'] = page.title
         item['url'] = response.url
-        item['content'] = content
+        item['content'] = page.content
         item['timestamp'] = datetime.now(timezone("Asia/Chongqing")).strftime("%Y-%m-%d %H:%M:%S")
         item['source'] = 'liaoxuefeng.com'
 
         yield item
 
-        links = response.css("a::attr(href)").getall()
-        for link in links:
+        for link in page.links:
             if '/blogs' not in link:
                 yield response.follow(link, callback = self.parse)
 
@@ -1,35 +1,8 @@
 import scrapy
-from scrapy import Selector
 from web_scraper.items import WebPageItem
+from web_scraper.extraction import RULES, parse_page
 from datetime import datetime
-from bs4 import BeautifulSoup
-
-def clean_pytorch_article(html_content: str) -> str:
-    """Extracts cleaned content from PyTorch tutorial HTML."""
-    soup = BeautifulSoup(html_content, "html.parser")
-    article = soup.find("article", class_="pytorch-article")
-    
-    if not article:
-        return ""
-    
-    # Remove download note box
-    if (download_note := article.find("div", class_="sphx-glr-download-link-note")):
-        download_note.decompose()
-    
-    # Remove navigation links bar
-    if (nav_bar := article.find("p", class_="sphx-glr-example-title")):
-        nav_bar.decompose()
-    
-    # Remove script execution timestamps and footer
-    for element in article.find_all(class_=["sphx-glr-timing", "sphx-glr-footer"]):
-        element.decompose()
-    
-    # Clean preserved code blocks
-    for pre in article.find_all("pre"):
-        pre.string = pre.get_text().strip()  # Remove HTML entities but keep code formatting
-    
-    # Get final text with structured newlines
-    return article.get_text(separator="\n", strip=False).strip()
+from pytz import timezone
 
 class PytorchSpider(scrapy.Spider):
     name = "pytorch"
@@ -64,14 +37,13 @@ class PytorchSpider(scrapy.Spider):
                 yield response.follow(link, callback = self.parse)            
 
         else: # Not in start urls
-            article_title = response.css("title::text").get()
-            content = clean_pytorch_article(response.text)
+            page = parse_page(response, RULES["pytorch"])
 
             item = WebPageItem()
-            item['title'] = article_title
-            item['content'] = content
+            item['title'] = page.title
+            item['content'] = page.content
             item['url'] = response.url
-            item['timestamp'] = datetime.now("Asia/Chongqing").strftime("%Y-%m-%d %H:%M:%S")
+            item['timestamp'] = datetime.now(timezone("Asia/Chongqing")).strftime("%Y-%m-%d %H:%M:%S")
 
             yield item
         
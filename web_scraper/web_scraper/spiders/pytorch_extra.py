@@ -1,25 +1,8 @@
 import scrapy
 from web_scraper.items import WebPageItem
+from web_scraper.extraction import RULES, parse_page
 from datetime import datetime
-from bs4 import BeautifulSoup
-import re
-
-def clean_html(html):
-     # Parse the HTML using BeautifulSoup
-    soup = BeautifulSoup(html, 'html.parser')
-    
-    # Find the main content section
-    main_div = soup.find('div', {'role': 'main'})
-    if not main_div:
-        return ""
-    
-    # Get all text content
-    text_content = main_div.get_text(separator='\n', strip=True)
-    
-    # Clean up excessive whitespace and newlines
-    cleaned_content = re.sub(r'\n\s*\n', '\n\n', text_content)
-    
-    return cleaned_content.strip()
+from pytz import timezone
 
 class PytorchExtraSpider(scrapy.Spider):
     name = "pytorch-extra"
@@ -43,20 +26,17 @@ class PytorchExtraSpider(scrapy.Spider):
 
     def parse(self, response):
 
-        if response.meta.get("is_start_url"):
-            section = response.css("div.section")
-            links = section.css("li>a::attr(href)").getall()
-            for link in links:
-                yield response.follow(link, callback = self.parse)
-
-        article_title = response.css("title::text").get()
-        content = clean_html(response.text)
+        # The start page links to every chapter and is itself an item
+        links = "div.section li>a::attr(href)" if response.meta.get("is_start_url") else ""
+        page = parse_page(response, RULES["pytorch-extra"], links=links)
+        for link in page.links:
+            yield response.follow(link, callback = self.parse)
 
         item = WebPageItem()
-        item['title'] = article_title
-        item['content'] = content
+        item['title'] = page.title
+        item['content'] = page.content
         item['url'] = response.url
-        item['timestamp'] = datetime.now("Asia/Chongqing").strftime("%Y-%m-%d %H:%M:%S")
+        item['timestamp'] = datetime.now(timezone("Asia/Chongqing")).strftime("%Y-%m-%d %H:%M:%S")
 
         yield item
 
@@ -1,27 +1,9 @@
 import scrapy
 from web_scraper.items import WebPageItem
-from bs4 import BeautifulSoup
+from web_scraper.extraction import RULES, parse_page
 from datetime import datetime 
 from pytz import timezone
 
-def extract_content(html):
-    soup = BeautifulSoup(html, 'html.parser')
-    content_div = soup.find('div', {'class': 'article-intro', 'id': 'content'})
-    
-    for img in content_div.find_all('img'):
-        img.decompose()
-    
-    for trybtn in content_div.find_all('a', {'class': 'tryitbtn'}):
-        trybtn.decompose()
-    
-    for br in content_div.find_all('br'):
-        br.decompose()
-    
-    for tag in content_div.find_all(style=True):
-        del tag['style']
-    
-    return str(content_div.get_text()).strip()
-
 class RunoobSpider(scrapy.Spider):
     name = "runoob"
     allowed_domains = ["runoob.com"]
@@ -63,25 +45,23 @@ class RunoobSpider(scrapy.Spider):
 
     def parse(self, response):
 
-        article_title = response.css("title::text").get()
-        content = extract_content(response.text)
-        if content == None:
+        links = "div#leftcolumn>a::attr(href)" if response.meta.get("is_start_url") else ""
+        page = parse_page(response, RULES["runoob"], links=links)
+        if page.content == None:
             self.logger.debug(f"Skipping {response.url} - Missing required data")
             return
         
         item = WebPageItem()
-        item['title'] = article_title
+        item['title'] = page.title
         item['url'] = response.url
-        item['content'] = content
+        item['content'] = page.content
         item['timestamp'] = datetime.now(timezone("Asia/Chongqing")).strftime("%Y-%m-%d %H:%M:%S")
         item['source'] = 'runoob.com'
 
         yield item
 
-        if response.meta.get("is_start_url"):
-            links = response.css("div#leftcolumn>a::attr(href)").getall()
-            for link in links:
-                yield response.follow(link, callback = self.parse)  
+        for link in page.links:
+            yield response.follow(link, callback = self.parse)  
 
 
         
@@ -1,35 +1,8 @@
 import scrapy
 from web_scraper.items import WebPageItem
-from bs4 import BeautifulSoup
-import re
+from web_scraper.extraction import RULES, parse_page
 from datetime import datetime 
-
-def clean_html_content(html_content):
-    """
-    Extracts and cleans text content from HTML, removing images, hyperlink markers, 
-    and unnecessary whitespace.
-    """
-    # Parse HTML content
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    # Remove header navigation links (e.g., the '#' symbols)
-    for link in soup.find_all('a', class_='headerlink'):
-        link.decompose()
-        
-    # Remove images and their parent links (if links only contain images)
-    for img in soup.find_all('img'):
-        img.decompose()
-    for link in soup.find_all('a'):
-        if len(link.contents) == 0 and not link.text.strip():
-            link.decompose()
-    
-    # Extract text and clean formatting
-    text = soup.get_text(separator='\n', strip=False)
-    
-    # Clean excessive whitespace and newlines
-    text = re.sub(r'\n{3,}', '\n\n', text)  # Replace 3+ newlines with two
-    text = re.sub(r'[ \t]{2,}', ' ', text)  # Replace multiple spaces/tabs with one
-    return text.strip()
+from pytz import timezone
 
 class ScikitSpider(scrapy.Spider):
     name = "scikit"
@@ -50,14 +23,13 @@ class ScikitSpider(scrapy.Spider):
                 #     link = "https://scikit-learn.org/stable/" + link
                 yield response.follow(link, callback= self.parse)
         else:
-            article_title = response.css("title::text").get()
-            content = clean_html_content(response.text)
+            page = parse_page(response, RULES["scikit"])
 
             item = WebPageItem()
             item['url'] = response.url
-            item['content'] = content
-            item['timestamp'] = datetime.now("Asia/Chongqing").strftime("%Y-%m-%d %H:%M:%S")
-            item['title'] = article_title
+            item['content'] = page.content
+            item['timestamp'] = datetime.now(timezone("Asia/Chongqing")).strftime("%Y-%m-%d %H:%M:%S")
+            item['title'] = page.title
 
             self.logger.info(f"Processed {response.url}, queue size: {len(self.crawler.engine.slot.scheduler)}")
 
@@ -1,35 +1,8 @@
 import scrapy
 from web_scraper.items import WebPageItem
+from web_scraper.extraction import RULES, parse_page
 from datetime import datetime
-from bs4 import BeautifulSoup
-
-def extract_content(html: str):
-    """
-    Extracts content from the given HTML, handling content pages.
-
-    Args:
-        html(str) : The HTML content as a string
-    Returns:
-        content(str): The clean content of the HTML
-
-    """
-    soup = BeautifulSoup(html, 'html.parser')
-    content_div = soup.find('div', class_='devsite-article-body')
-    if not content_div:
-        return ''
-    
-    # Remove the empty div with id 'top' if present
-    top_div = content_div.find('div', id='top')
-    if top_div:
-        top_div.decompose()
-
-    table_wrapper = content_div.find("div", _class = "devsite-table-wrapper")
-    if table_wrapper:
-        table_wrapper.decompose()
-    
-    # Extract text content (without HTML tags)
-    text_content = content_div.get_text(separator='\n', strip=True)
-    return text_content
+from pytz import timezone
 
 class TensorflowSpider(scrapy.Spider):
     name = "tensorflow"
@@ -82,12 +55,11 @@ class TensorflowSpider(scrapy.Spider):
         else:
             self.logger.info(f"Processed {response.url}, queue size: {len(self.crawler.engine.slot.scheduler)}")
             
-            article_title = response.css("title::text").get()
-            content = extract_content(response.text)
+            page = parse_page(response, RULES["tensorflow"])
             item = WebPageItem()
             item['url'] = response.url
-            item['timestamp'] = datetime.now("Asia/Chongqing").strftime("%Y-%m-%d %H:%M:%S")
-            item['content'] = extract_content(response.text)
-            item['title'] = article_title
+            item['timestamp'] = datetime.now(timezone("Asia/Chongqing")).strftime("%Y-%m-%d %H:%M:%S")
+            item['content'] = page.content
+            item['title'] = page.title
 
             yield item
\ No newline at end of file
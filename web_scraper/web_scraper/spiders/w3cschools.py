@@ -1,37 +1,9 @@
 import scrapy
 from web_scraper.items import WebPageItem
+from web_scraper.extraction import RULES, parse_page
 from datetime import datetime
-from bs4 import BeautifulSoup
 from pytz import timezone
 
-def extract_content(html, is_index=False):
-    """
-    Extracts content and section titles from the given HTML, handling both index and content pages.
-
-    Args:
-        html (str): The HTML content as a string.
-        is_index (bool): True if the page is the index page, False otherwise.
-
-    Returns:
-        str: Extracted content in markdown, or empty string if no content found.
-    """
-    soup = BeautifulSoup(html, 'html.parser')
-    content = ""
-
-    if is_index:
-        # Index page extraction: Concatenate all matching intros
-        intro_divs = soup.find_all('div', class_='content-intro')
-        for intro in intro_divs:
-            if intro:  # Check if element exists (defensive)
-                content += intro.get_text(strip=True)
-    else:
-        # Non-index: Try 'content-intro' first, fall back to 'view-box'
-        content_div = soup.find('div', class_='content-intro') or soup.find('div', class_='view-box')
-        if content_div:
-            content = content_div.get_text(strip=True)
-
-    return content  # Returns "" if nothing found
-
 class W3cschoolsSpider(scrapy.Spider):
     name = "w3cschools"
     allowed_domains = ["w3cschool.cn"]
@@ -84,35 +56,33 @@ class W3cschoolsSpider(scrapy.Spider):
             )
 
     async def parse(self, response):
-        page = response.meta.get("playwright_page")
+        playwright_page = response.meta.get("playwright_page")
         try:
             self.logger.info(f"Status {response.status} for {response.url}")
             if response.status != 200:
                 self.logger.warning(f"Non-200 response: {response.text[:200]}")
                 return
 
-            article_title = response.css("title::text").get()
-            
             # Determine if this is the index page
             is_index = response.url in self.start_urls
-            content = extract_content(response.text, is_index)
+            parsed = parse_page(response, RULES["w3cschools-index" if is_index else "w3cschools"],
+                                links=".dd-content a::attr(href)")
             item = WebPageItem()
             item['url'] = response.url
-            item['content'] = content
+            item['content'] = parsed.content
             item['timestamp'] = datetime.now(timezone("Asia/Chongqing")).strftime("%Y-%m-%d %H:%M:%S")
-            item['title'] = article_title
+            item['title'] = parsed.title
             yield item
 
         finally:
             # # Close the Playwright page to free resources
-            if page:
-                await page.close()
+            if playwright_page:
+                await playwright_page.close()
                 self.logger.info(f"Closed Playwright page for {response.url}") # Add info log
         
         self.logger.info(f"Processed {response.url}, queue size: {len(self.crawler.engine.slot.scheduler)}")
 
-        links = response.css(".dd-content a::attr(href)").getall()
-        for link in links:
+        for link in parsed.links:
             absolute_url = response.urljoin(link)
             if any(sub in absolute_url for sub in ('play/', 'minicourse/')) or absolute_url == response.url or absolute_url in self.start_urls:
                 continue
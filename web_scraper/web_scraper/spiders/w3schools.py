@@ -1,37 +1,9 @@
 import scrapy
 from web_scraper.items import WebPageItem
+from web_scraper.extraction import RULES, parse_page
 from datetime import datetime
-from bs4 import BeautifulSoup
 from pytz import timezone
 
-def extract_content_text(html):
-    soup = BeautifulSoup(html, 'html.parser')
-    main_content = soup.find('div', id='main')
-    
-    if not main_content:
-        return ""
-    
-    # Remove unwanted elements
-    for element in main_content.select('#mainLeaderboard, #midcontentadcontainer, #user-profile-bottom-wrapper, script, style'):
-        element.decompose()
-    
-    # Get all text content with proper spacing
-    text_content = []
-    
-    for element in main_content.find_all(text=True):
-        if element.parent.name in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'li', 'td', 'th']:
-            text = element.strip()
-            if text:
-                text_content.append(text)
-    
-    # Combine and clean text
-    full_text = '\n'.join(text_content)
-    
-    # Remove excessive empty lines
-    full_text = '\n'.join([line.strip() for line in full_text.split('\n') if line.strip()])
-    
-    return full_text
-
 class W3schoolsSpider(scrapy.Spider):
     name = "w3schools"
     allowed_domains = ["w3schools.com"]
@@ -72,28 +44,25 @@ class W3schoolsSpider(scrapy.Spider):
 
     def parse(self, response):
 
-        article_title = response.css("h1 ::text").getall()
-        article_title = ' '.join(article_title)
+        has_left_menu = bool(response.css("div#leftmenuinnerinner"))
+        page = parse_page(response, RULES["w3schools"], links="div#leftmenuinnerinner a::attr(href)")
+        article_title = page.title or ''
         if '/' in article_title:
             article_title = article_title.replace("/", "_")
 
-        content = extract_content_text(response.text)
-
         item = WebPageItem()
         item['url'] = response.url
-        item['content'] = content
+        item['content'] = page.content
         item['timestamp'] = datetime.now(timezone("Asia/Chongqing")).strftime("%Y-%m-%d %H:%M:%S")
         item['title'] = article_title
         
         yield item
 
         url = response.url.split("/")[-1]
-        left_menu = response.css("div#leftmenuinnerinner")
-        if left_menu:
-            links = left_menu.css('a::attr(href)').getall()
-            if not links:
+        if has_left_menu:
+            if not page.links:
                 self.logger.info("No links found in the left menu.")
-            for link in links:
+            for link in page.links:
                 if link == url:
                     continue
                 # self.log(f'Link to another page: {link}')